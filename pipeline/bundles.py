@@ -0,0 +1,121 @@
+"""Per-case zip bundles in GCS.
+
+A stage that produces many small files per case (the scraped PDFs and text
+files, the OCR output) can store them as one ``<prefix>/<stage>/<case_id>.zip``
+object instead. The zip central directory is the index: readers fetch it with a
+range read from the end of the object and then range-read only the members they
+need, so a stage costs one object per case to write and no listing to read.
+PDFs are stored as they are; text is deflated.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import io
+import zipfile
+from pathlib import Path
+from typing import Callable
+
+from google.api_core.exceptions import NotFound
+from google.cloud import storage
+
+from settings import CASE_BUNDLE_PREFIX
+
+# Bytes fetched per range read; members smaller than this cost a single request
+READ_CHUNK_SIZE = 256 * 1024
+# Already-compressed formats are stored rather than deflated again
+STORED_SUFFIXES = frozenset({".pdf", ".png", ".jpg", ".jpeg", ".gz", ".zip"})
+
+
+def bundle_name(stage: str, case_id: str, prefix: str = CASE_BUNDLE_PREFIX) -> str:
+    return f"{prefix.strip('/')}/{stage}/{case_id}.zip"
+
+
+def _compression(name: str) -> int:
+    return zipfile.ZIP_STORED if Path(name).suffix.lower() in STORED_SUFFIXES else zipfile.ZIP_DEFLATED
+
+
+def build_bundle(members: dict[str, bytes | Path]) -> bytes:
+    """Zip *members* (member name -> bytes or file path) in name order."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name in sorted(members):
+            data = members[name]
+            if isinstance(data, Path):
+                data = data.read_bytes()
+            archive.writestr(name, data, compress_type=_compression(name))
+    return buffer.getvalue()
+
+
+def write_bundle(bucket: storage.Bucket, name: str, members: dict[str, bytes | Path]) -> list[str]:
+    """Upload *members* as the bundle *name*; returns the member names."""
+    bucket.blob(name).upload_from_string(build_bundle(members), content_type="application/zip")
+    return sorted(members)
+
+
+def bundle_directory(
+    bucket: storage.Bucket, name: str, directory: Path, pattern: str = "*"
+) -> list[str]:
+    """Upload the files in *directory* matching *pattern* as the bundle *name*."""
+    members = {path.name: path for path in sorted(directory.glob(pattern)) if path.is_file()}
+    return write_bundle(bucket, name, members)
+
+
+class CaseBundle:
+    """Read access to one bundle through range reads; use as a context manager."""
+
+    def __init__(self, blob: storage.Blob, chunk_size: int = READ_CHUNK_SIZE) -> None:
+        self.blob = blob
+        self._reader = blob.open("rb", chunk_size=chunk_size)
+        try:
+            self._archive = zipfile.ZipFile(self._reader)
+        except BaseException:
+            self._reader.close()
+            raise
+
+    def names(self) -> list[str]:
+        return self._archive.namelist()
+
+    def read(self, name: str) -> bytes:
+        return self._archive.read(name)
+
+    def extract(self, destination: Path, match: str | Callable[[str], bool] = "*") -> list[Path]:
+        """Write the members matching *match* (a glob or predicate) into *destination*."""
+        if isinstance(match, str):
+            pattern = match
+            match = lambda name: fnmatch.fnmatch(name, pattern)
+        destination.mkdir(parents=True, exist_ok=True)
+        written = []
+        for name in filter(match, self.names()):
+            path = destination / Path(name).name
+            path.write_bytes(self.read(name))
+            written.append(path)
+        return written
+
+    def close(self) -> None:
+        self._archive.close()
+        self._reader.close()
+
+    def __enter__(self) -> "CaseBundle":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def open_bundle(bucket: storage.Bucket, name: str) -> CaseBundle | None:
+    """Open the bundle *name*, or return None when it does not exist."""
+    try:
+        return CaseBundle(bucket.blob(name))
+    except NotFound:
+        return None
+
+
+__all__ = [
+    "bundle_name",
+    "build_bundle",
+    "write_bundle",
+    "bundle_directory",
+    "CaseBundle",
+    "open_bundle",
+]
@@ -1,124 +1,126 @@
-"""Enrich case records with county appraiser data."""
+"""Enrich case records with county appraiser data.
+
+Only summaries that are new or changed since the last run are enriched; the
+processed generations are kept in PROCESSED_MANIFEST_BLOB. Pass ``--full`` to
+enrich every summary again. With SERVE_EVENTS=1 the service instead enriches
+each summary as it is written (see ``events.py``).
+"""
 
 from __future__ import annotations
 
-import json
+import argparse
 import os
 import sys
-from typing import List
+from typing import Iterator, List
 from pathlib import Path
 
-import requests
 from google.cloud import storage
 
 REPO_ROOT = Path(__file__).resolve().parents[3]
 TESTING_DIR = REPO_ROOT / "testing"
-if str(TESTING_DIR) not in sys.path:
-    sys.path.insert(0, str(TESTING_DIR))
-
-from get_appraiser_data import generate_headers, parcel_id_to_tax_id  # type: ignore
+for path in (REPO_ROOT, TESTING_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+import http_client  # type: ignore
+from events import SERVE_EVENTS, serve  # type: ignore
+from appraiser import OCPA_HEADERS, enrich_entries, enrich_entry  # type: ignore
+from gcs_io import ProcessedManifest, Uploader, batched, decode_json, iter_downloads, list_objects  # type: ignore
+from payloads import GcsRawStore, configure_raw_store  # type: ignore
+from settings import GCS_STREAM_BATCH_SIZE  # type: ignore
+from sharding import shard_state_name, take_shard  # type: ignore
 
 SUMMARY_BUCKET = os.environ["SUMMARY_BUCKET"]
 ENRICHED_BUCKET = os.environ.get("ENRICHED_BUCKET", SUMMARY_BUCKET)
 OUTPUT_PREFIX = os.environ.get("OUTPUT_PREFIX", "enriched")
 BATCH_SIZE = int(os.environ.get("BATCH_SIZE", "0"))
-
-SEARCH_BASE_URL = "https://ocpa-mainsite-afd-standard.azurefd.net/api/QuickSearch/GetSearchInfoByAddress"
-LEGAL_DESC_BASE_URL = "https://ocpa-mainsite-afd-standard.azurefd.net/api/PRC/GetPRCPropFeatLegal"
-GENERAL_INFO_BASE_URL = "https://ocpa-mainsite-afd-standard.azurefd.net/api/PRC/GetPRCGeneralInfo"
+# Full OCPA responses are stored gzip-compressed under this prefix
+RAW_PREFIX = os.environ.get("RAW_PREFIX", "raw")
+PROCESSED_MANIFEST_BLOB = shard_state_name(
+    os.environ.get("PROCESSED_MANIFEST_BLOB", "state/appraiser_processed.json")
+)
+
+
+def iter_cases(
+    client: storage.Client, manifest: ProcessedManifest | None = None
+) -> Iterator[tuple[storage.Blob, dict]]:
+    """Stream ``(blob, case)`` for this task's summaries not yet in *manifest*, at most BATCH_SIZE when set."""
+    blobs = list_objects(client.bucket(SUMMARY_BUCKET), "summaries/", ".json")
+    blobs = take_shard(blobs, key=lambda blob: Path(blob.name).stem)
+    if manifest is not None:
+        blobs = manifest.pending(blobs)
+    if BATCH_SIZE:
+        blobs = blobs[:BATCH_SIZE]
+    return iter_downloads(blobs, decode_json)
 
 
 def load_cases(client: storage.Client) -> List[dict]:
-    bucket = client.bucket(SUMMARY_BUCKET)
-    cases: List[dict] = []
-    for blob in bucket.list_blobs(prefix="summaries/"):
-        if blob.name.endswith(".json"):
-            cases.append(json.loads(blob.download_as_text()))
-            if BATCH_SIZE and len(cases) >= BATCH_SIZE:
-                break
-    return cases
-
-
-def fetch_search_results(address: str, headers: dict) -> dict | None:
-    encoded_address = requests.utils.quote(address)
-    search_url = (
-        f"{SEARCH_BASE_URL}?address={encoded_address}&page=1&size=5&sortBy=ParcelID&sortDir=ASC"
-    )
-    response = requests.get(search_url, headers=headers, timeout=30)
-    if response.status_code == 200:
-        data = response.json()
-        if data and isinstance(data, list):
-            return data[0]
-    else:
-        print(f"Search API failed for address '{address}' (status {response.status_code})")
-    return None
-
+    return [case for _, case in iter_cases(client)]
 
-def fetch_general_info(parcel_id: str, headers: dict) -> dict | None:
-    url = f"{GENERAL_INFO_BASE_URL}?pid={parcel_id}"
-    response = requests.get(url, headers=headers, timeout=30)
-    if response.status_code == 200:
-        return response.json()
-    print(f"General info API failed for parcel {parcel_id} (status {response.status_code})")
-    return None
 
+def enrich_case(entry: dict) -> dict:
+    return enrich_entry(entry, OCPA_HEADERS)
 
-def fetch_legal_description(parcel_id: str, headers: dict) -> dict | None:
-    url = f"{LEGAL_DESC_BASE_URL}?pid={parcel_id}"
-    response = requests.get(url, headers=headers, timeout=30)
-    if response.status_code == 200:
-        return response.json()
-    print(f"Legal description API failed for parcel {parcel_id} (status {response.status_code})")
-    return None
 
+def upload_cases(
+    uploader: Uploader, cases: list[tuple[storage.Blob, dict]], manifest: ProcessedManifest | None
+) -> None:
+    """Upload enriched *cases*; a summary is marked processed once its upload succeeds.
 
-def enrich_case(entry: dict) -> dict:
-    address = entry.get("Address_PRISM")
-    if not address:
-        entry.setdefault("AppraiserStatus", "SKIPPED_MISSING_ADDRESS")
-        return entry
-
-    headers = generate_headers()
-    search_data = fetch_search_results(address, headers)
-    if not search_data:
-        entry.setdefault("AppraiserStatus", "NO_SEARCH_RESULT")
-        return entry
-
-    owner_name = search_data.get("ownerName")
-    parcel_id = search_data.get("parcelId")
-    if owner_name:
-        entry["CountyDBName_PRISM"] = owner_name.strip()
-    if parcel_id:
-        entry["ParcelLink_PRISM"] = f"https://ocpaweb.ocpafl.org/parcelsearch/Parcel%20ID/{parcel_id}"
-        entry["TaxID_PRISM"] = parcel_id_to_tax_id(parcel_id)
-
-        general_info = fetch_general_info(parcel_id, headers)
-        if general_info and "dorCode" in general_info and "dorDescription" in general_info:
-            entry["PropertyType_PRISM"] = f"{general_info['dorCode']} - {general_info['dorDescription']}".strip()
-
-        legal_info = fetch_legal_description(parcel_id, headers)
-        if legal_info and "propertyDescription" in legal_info:
-            entry["LegalDescription_PRISM"] = legal_info["propertyDescription"].strip()
-
-    entry.setdefault("AppraiserStatus", "SUCCESS")
-    return entry
-
-
-def upload_cases(client: storage.Client, cases: list[dict]) -> None:
-    bucket = client.bucket(ENRICHED_BUCKET)
-    for entry in cases:
+    Cases deferred by an open circuit stay pending for the next run.
+    """
+    for source, entry in cases:
         case_number = entry.get("CaseNumber_Foreclosure", "unknown")
-        blob = bucket.blob(f"{OUTPUT_PREFIX}/{case_number}.json")
-        blob.upload_from_string(json.dumps(entry, indent=2), content_type="application/json")
+        done = None
+        if manifest is not None and entry.get("AppraiserStatus") != http_client.PENDING_UPSTREAM:
+            done = lambda source=source: manifest.mark(source)
+        uploader.put_json(f"{OUTPUT_PREFIX}/{case_number}.json", entry, on_done=done)
         print(f"Uploaded enriched record for {case_number}")
 
 
-def run() -> None:
+def handle_event(bucket: str, name: str) -> str | None:
+    """Enrich the case whose summary was just written; other objects are ignored."""
+    if bucket != SUMMARY_BUCKET or not name.startswith("summaries/") or not name.endswith(".json"):
+        return None
     client = storage.Client()
-    cases = load_cases(client)
-    enriched = [enrich_case(entry) for entry in cases]
-    upload_cases(client, enriched)
+    configure_raw_store(GcsRawStore(ENRICHED_BUCKET, RAW_PREFIX))
+    source = client.bucket(bucket).blob(name)
+    entry = decode_json(source.download_as_bytes())
+    enrich_case(entry)
+    if entry.get("AppraiserStatus") == http_client.PENDING_UPSTREAM:
+        # Fail the request so the event is redelivered once OCPA recovers
+        raise RuntimeError(f"OCPA unavailable for {entry.get('CaseNumber_Foreclosure')}")
+    with Uploader(client.bucket(ENRICHED_BUCKET)) as uploader:
+        upload_cases(uploader, [(source, entry)], None)
+    return f"Enriched {entry.get('CaseNumber_Foreclosure')}: {entry.get('AppraiserStatus')}"
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Enrich case summaries with appraiser data.")
+    parser.add_argument("--full", action="store_true", help="Enrich every summary, not just new or changed ones.")
+    return parser.parse_args(argv)
+
+
+def run(argv: list[str] | None = None) -> None:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    client = storage.Client()
+    configure_raw_store(GcsRawStore(ENRICHED_BUCKET, RAW_PREFIX))
+    manifest = ProcessedManifest(client.bucket(ENRICHED_BUCKET).blob(PROCESSED_MANIFEST_BLOB))
+    if args.full:
+        manifest.reset()
+    try:
+        with Uploader(client.bucket(ENRICHED_BUCKET)) as uploader:
+            # Cases sharing a property are de-duplicated within each batch; the
+            # parcel cache covers repeats across batches.
+            for batch in batched(iter_cases(client, manifest), GCS_STREAM_BATCH_SIZE):
+                enrich_entries([entry for _, entry in batch])
+                upload_cases(uploader, batch, manifest)
+    finally:
+        manifest.save()
 
 
 if __name__ == "__main__":
-    run()
+    if SERVE_EVENTS:
+        serve(handle_event)
+    else:
+        run()
@@ -3,9 +3,6 @@
 from __future__ import annotations
 
 import os
-
-import requests
-
 import sys
 from pathlib import Path
 
@@ -13,6 +10,7 @@ REPO_ROOT = Path(__file__).resolve().parents[3]
 if str(REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(REPO_ROOT))
 
+import http_client
 from settings import FILEMAKER_COUNTY_ID
 
 FILEMAKER_BEARER = os.environ.get("FILEMAKER_BEARER_TOKEN") or os.environ.get("FILEMAKER_BEARER")
@@ -37,7 +35,7 @@ def run() -> None:
         )
     }
     headers = {"Authorization": f"Bearer {FILEMAKER_BEARER}", "Content-Type": "application/json"}
-    resp = requests.get(build_url(), params=params, headers=headers, timeout=60)
+    resp = http_client.get(build_url(), params=params, headers=headers, timeout=60)
     resp.raise_for_status()
     print(resp.text)
 
@@ -1,39 +1,197 @@
-"""Upload final case records from GCS into Firestore."""
+"""Upload final case records from GCS into Firestore.
+
+Only objects that are new or rewritten since the last run are read (tracked in
+PROCESSED_MANIFEST_BLOB), and of those only records whose content changed are
+written; the sync index is kept in the Zillow bucket between runs. Pass
+``--full`` or set DELTA_SYNC=0 to read and rewrite every record. With
+SERVE_EVENTS=1 the service instead syncs each record as it is written (see
+``events.py``). Batch runs and event instances merge the hashes they wrote into
+the stored index under a generation precondition, so neither loses the other's.
+"""
 
 from __future__ import annotations
 
+import argparse
 import json
 import os
+import sys
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator
 
+from google.api_core.exceptions import NotFound, PreconditionFailed
 from google.cloud import firestore, storage
 
+REPO_ROOT = Path(__file__).resolve().parents[3]
+TESTING_DIR = REPO_ROOT / "testing"
+for path in (REPO_ROOT, TESTING_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+from events import SERVE_EVENTS, serve  # type: ignore
+from firestore_sync import SyncIndex, delta_sync  # type: ignore
+from gcs_io import ProcessedManifest, batched, decode_json, iter_downloads, list_objects  # type: ignore
+from settings import FIRESTORE_SYNC_INDEX_PATH, GCS_STREAM_BATCH_SIZE  # type: ignore
+from sharding import shard_state_name, take_shard  # type: ignore
+
 FIRESTORE_COLLECTION = os.environ.get("FIRESTORE_COLLECTION", "data_from_oc_records_search")
 ZILLOW_BUCKET = os.environ["ZILLOW_BUCKET"]
 PREFIX = os.environ.get("ZILLOW_PREFIX", "zillow/")
+DELTA_SYNC = os.environ.get("DELTA_SYNC", "1") == "1"
+# Each task syncs a fixed share of the documents and keeps its own index
+SYNC_INDEX_BLOB = shard_state_name(os.environ.get("SYNC_INDEX_BLOB", "state/firestore_sync_index.json"))
+SYNC_INDEX_PATH = Path(shard_state_name(str(FIRESTORE_SYNC_INDEX_PATH)))
+PROCESSED_MANIFEST_BLOB = shard_state_name(
+    os.environ.get("PROCESSED_MANIFEST_BLOB", "state/firestore_processed.json")
+)
+# Attempts at merging into the stored sync index while others keep rewriting it
+INDEX_MERGE_ATTEMPTS = 5
+
+
+def iter_records(
+    client: storage.Client, manifest: ProcessedManifest | None = None
+) -> Iterator[tuple[storage.Blob, dict]]:
+    """Stream ``(blob, record)`` for this task's objects not yet in *manifest*."""
+    blobs = list_objects(client.bucket(ZILLOW_BUCKET), PREFIX, ".json")
+    blobs = take_shard(blobs, key=lambda blob: Path(blob.name).stem)
+    if manifest is not None:
+        blobs = manifest.pending(blobs)
+    return iter_downloads(blobs, decode_json)
 
 
 def load_records(client: storage.Client) -> list[dict]:
+    return [record for _, record in iter_records(client)]
+
+
+def download_index(client: storage.Client) -> None:
+    blob = client.bucket(ZILLOW_BUCKET).blob(SYNC_INDEX_BLOB)
+    SYNC_INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+    if blob.exists():
+        blob.download_to_filename(str(SYNC_INDEX_PATH))
+    else:
+        SYNC_INDEX_PATH.unlink(missing_ok=True)
+
+
+def index_changes(before: dict[str, dict], after: dict[str, dict]) -> dict[str, dict | None]:
+    """Index entries that differ between *before* and *after*; None marks a removal."""
+    changes: dict[str, dict | None] = {doc_id: entry for doc_id, entry in after.items() if before.get(doc_id) != entry}
+    changes.update(dict.fromkeys(before.keys() - after.keys()))
+    return changes
+
+
+def merge_index(client: storage.Client, changes: dict[str, dict | None]) -> None:
+    """Apply *changes* to the stored sync index.
+
+    The read-modify-write is guarded by the object's generation and retried on
+    conflict, so the batch run and event instances keep each other's hashes.
+    """
+    if not changes:
+        return
     bucket = client.bucket(ZILLOW_BUCKET)
-    return [
-        json.loads(blob.download_as_text())
-        for blob in bucket.list_blobs(prefix=PREFIX)
-        if blob.name.endswith(".json")
-    ]
+    for _ in range(INDEX_MERGE_ATTEMPTS):
+        stored = bucket.get_blob(SYNC_INDEX_BLOB)
+        try:
+            entries = decode_json(stored.download_as_bytes()) if stored is not None else {}
+        except NotFound:
+            continue
+        for doc_id, entry in changes.items():
+            if entry is None:
+                entries.pop(doc_id, None)
+            else:
+                entries[doc_id] = entry
+        try:
+            bucket.blob(SYNC_INDEX_BLOB).upload_from_string(
+                json.dumps(entries, separators=(",", ":")),
+                content_type="application/json",
+                if_generation_match=stored.generation if stored is not None else 0,
+            )
+            return
+        except PreconditionFailed:
+            print("Sync index changed while merging; retrying")
+    raise RuntimeError(f"Could not merge {len(changes)} entries into {SYNC_INDEX_BLOB}")
+
 
+def upload(records: Iterable[tuple[storage.Blob, dict]], manifest: ProcessedManifest, *, full: bool = False) -> None:
+    """Sync *records* batch by batch as they are downloaded.
 
-def upload(records: list[dict]) -> None:
+    An object is marked processed once its document is in sync.
+    """
     db = firestore.Client()
-    for entry in records:
-        case_number = entry["CaseNumber_Foreclosure"]
-        db.collection(FIRESTORE_COLLECTION).document(case_number).set(entry)
-        print(f"Uploaded {case_number}")
+    index = SyncIndex(SYNC_INDEX_PATH)
+    if full:
+        index.entries = {}
+    failed = total = 0
+    for batch in batched(records, GCS_STREAM_BATCH_SIZE):
+        report = delta_sync(
+            db,
+            FIRESTORE_COLLECTION,
+            {entry["CaseNumber_Foreclosure"]: entry for _, entry in batch},
+            index,
+        )
+        print(report.format())
+        for blob, entry in batch:
+            if entry["CaseNumber_Foreclosure"] not in report.failed:
+                manifest.mark(blob)
+        failed += len(report.failed)
+        total += len(batch)
+    if failed:
+        raise RuntimeError(f"{failed} of {total} documents failed to upload")
+
+
+_event_lock = threading.Lock()
+
+
+def handle_event(bucket: str, name: str) -> str | None:
+    """Sync the record that was just written; other objects are ignored.
+
+    Each event compares against the latest stored sync index and merges the
+    hash it wrote back into it, so later events and batch runs see it.
+    """
+    if bucket != ZILLOW_BUCKET or not name.startswith(PREFIX) or not name.endswith(".json"):
+        return None
+    storage_client = storage.Client()
+    record = decode_json(storage_client.bucket(bucket).blob(name).download_as_bytes())
+    with _event_lock:
+        download_index(storage_client)
+        index = SyncIndex(SYNC_INDEX_PATH)
+        before = dict(index.entries)
+        report = delta_sync(
+            firestore.Client(),
+            FIRESTORE_COLLECTION,
+            {record["CaseNumber_Foreclosure"]: record},
+            index,
+        )
+        merge_index(storage_client, index_changes(before, index.entries))
+    if report.failed:
+        raise RuntimeError(report.format())
+    return report.format()
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Sync case records from GCS to Firestore.")
+    parser.add_argument("--full", action="store_true", help="Read and rewrite every record.")
+    return parser.parse_args(argv)
 
 
-def run() -> None:
+def run(argv: list[str] | None = None) -> None:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    full = args.full or not DELTA_SYNC
     storage_client = storage.Client()
-    records = load_records(storage_client)
-    upload(records)
+    manifest = ProcessedManifest(storage_client.bucket(ZILLOW_BUCKET).blob(PROCESSED_MANIFEST_BLOB))
+    if full:
+        manifest.reset()
+    download_index(storage_client)
+    before = SyncIndex(SYNC_INDEX_PATH).entries
+    try:
+        upload(iter_records(storage_client, manifest), manifest, full=full)
+    finally:
+        # delta_sync saves the local index after every batch
+        merge_index(storage_client, index_changes(before, SyncIndex(SYNC_INDEX_PATH).entries))
+        manifest.save()
 
 
 if __name__ == "__main__":
-    run()
+    if SERVE_EVENTS:
+        serve(handle_event)
+    else:
+        run()
@@ -1,26 +1,41 @@
-"""Cloud Run entrypoint for OCR processing."""
+"""Cloud Run entrypoint for OCR processing.
+
+With PIPELINE_CASE_BUNDLES=1 only the PDF members of each case's raw bundle are
+read, and the extracted text is written as one OCR bundle per case. Cases
+without a raw bundle fall back to the per-file objects. With SERVE_EVENTS=1 the
+service instead OCRs each raw bundle (or, without bundles, each PDF) as it is
+written (see ``events.py``).
+"""
 
 from __future__ import annotations
 
 import json
 import os
 import sys
-from pathlib import Path
+import tempfile
+from pathlib import Path, PurePosixPath
 from typing import Dict
 
 from google.cloud import storage
 
 REPO_ROOT = Path(__file__).resolve().parents[3]
 TESTING_DIR = REPO_ROOT / "testing"
-if str(TESTING_DIR) not in sys.path:
-    sys.path.insert(0, str(TESTING_DIR))
+for path in (REPO_ROOT, TESTING_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
 
 from vision_docs import process_all_pdfs_in_directory
+from events import SERVE_EVENTS, serve  # type: ignore
+from bundles import bundle_directory, bundle_name, open_bundle  # type: ignore
+from gcs_io import upload_file  # type: ignore
+from settings import CASE_BUNDLES  # type: ignore
+from sharding import shard_state_name, take_shard  # type: ignore
 
 RAW_BUCKET = os.environ["RAW_BUCKET"]
 OCR_BUCKET = os.environ.get("OCR_BUCKET", RAW_BUCKET)
 MANIFEST_PATH = os.environ["MANIFEST_PATH"]  # e.g., gs://bucket/raw_cases/manifest.json
-WORKDIR = Path("/tmp/ocr")
+# Per task, so local simulated tasks do not OCR each other's files
+WORKDIR = Path(shard_state_name("/tmp/ocr"))
 
 
 def download_manifest(client: storage.Client) -> Dict:
@@ -34,26 +49,60 @@ def download_manifest(client: storage.Client) -> Dict:
     return data
 
 
-def sync_case_data(client: storage.Client, manifest: Dict) -> Path:
-    WORKDIR.mkdir(parents=True, exist_ok=True)
-    for case_id in manifest.get("cases", []):
-        case_dir = WORKDIR / case_id
+def sync_case_data(client: storage.Client, manifest: Dict, workdir: Path = WORKDIR) -> Path:
+    workdir.mkdir(parents=True, exist_ok=True)
+    for case_id in take_shard(manifest.get("cases", []), key=str):
+        case_dir = workdir / case_id
         case_dir.mkdir(exist_ok=True)
         bucket = client.bucket(RAW_BUCKET)
+        bundle = open_bundle(bucket, bundle_name("raw", case_id)) if CASE_BUNDLES else None
+        if bundle is not None:
+            with bundle:
+                bundle.extract(case_dir, "*.pdf")
+            continue
         prefix = f"cases/{case_id}/"
         for blob in bucket.list_blobs(prefix=prefix):
             if blob.name.endswith(".pdf"):
                 destination = case_dir / Path(blob.name).name
                 destination.parent.mkdir(parents=True, exist_ok=True)
                 blob.download_to_filename(destination)
-    return WORKDIR
+    return workdir
 
 
-def upload_outputs(client: storage.Client) -> None:
+def upload_outputs(client: storage.Client, workdir: Path = WORKDIR) -> None:
     dest_bucket = client.bucket(OCR_BUCKET)
-    for file_path in WORKDIR.rglob("*_extracted_text.txt"):
-        blob = dest_bucket.blob(f"ocr/{file_path.relative_to(WORKDIR)}")
-        blob.upload_from_filename(file_path)
+    if CASE_BUNDLES:
+        for case_dir in sorted(path for path in workdir.iterdir() if path.is_dir()):
+            if any(case_dir.glob("*_extracted_text.txt")):
+                bundle_directory(dest_bucket, bundle_name("ocr", case_dir.name), case_dir, "*_extracted_text.txt")
+        return
+    for file_path in workdir.rglob("*_extracted_text.txt"):
+        upload_file(dest_bucket, f"ocr/{file_path.relative_to(workdir)}", file_path)
+
+
+def handle_event(bucket: str, name: str) -> str | None:
+    """OCR the case a newly written raw bundle or PDF belongs to; other objects are ignored.
+
+    Each event works in its own directory, since the OCR appends to its outputs.
+    """
+    path = PurePosixPath(name)
+    if bucket != RAW_BUCKET:
+        return None
+    client = storage.Client()
+    with tempfile.TemporaryDirectory(prefix="ocr-") as tmp:
+        workdir = Path(tmp)
+        if CASE_BUNDLES and name == bundle_name("raw", path.stem):
+            case_id = path.stem
+            sync_case_data(client, {"cases": [case_id]}, workdir)
+        elif not CASE_BUNDLES and len(path.parts) == 3 and path.parts[0] == "cases" and path.suffix == ".pdf":
+            case_id = path.parts[1]
+            (workdir / case_id).mkdir()
+            client.bucket(bucket).blob(name).download_to_filename(workdir / case_id / path.name)
+        else:
+            return None
+        process_all_pdfs_in_directory(workdir, workdir)
+        upload_outputs(client, workdir)
+    return f"OCR done for {name}"
 
 
 def run() -> None:
@@ -65,4 +114,7 @@ def run() -> None:
 
 
 if __name__ == "__main__":
-    run()
+    if SERVE_EVENTS:
+        serve(handle_event)
+    else:
+        run()
@@ -1,25 +1,41 @@
-"""Cloud entrypoint for building prompt files."""
+"""Cloud entrypoint for building prompt files.
+
+With PIPELINE_CASE_BUNDLES=1 the OCR text of each case is read from its OCR
+bundle, falling back to the per-file objects when there is none. With
+SERVE_EVENTS=1 the service instead rebuilds a case's prompt as its OCR text is
+written (see ``events.py``), once the text of every Complaint and Value PDF of
+the case is there and newer than its PDF.
+"""
 
 from __future__ import annotations
 
 import json
 import os
 import sys
-from pathlib import Path
+import tempfile
+from pathlib import Path, PurePosixPath
 
 from google.cloud import storage
 
 REPO_ROOT = Path(__file__).resolve().parents[3]
 TESTING_DIR = REPO_ROOT / "testing"
-if str(TESTING_DIR) not in sys.path:
-    sys.path.insert(0, str(TESTING_DIR))
-
-from prompt_builder import create_combination_text
+for path in (REPO_ROOT, TESTING_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+from bundles import bundle_name, open_bundle
+from events import SERVE_EVENTS, serve
+from gcs_io import list_objects, upload_file
+from prompt_builder import FINGERPRINT_FILENAME, TEMPLATE_VERSION, create_combination_text
+from settings import CASE_BUNDLES
+from sharding import shard_state_name, take_shard
+from utils import write_json
 
 OCR_BUCKET = os.environ["OCR_BUCKET"]
 PROMPT_BUCKET = os.environ.get("PROMPT_BUCKET", OCR_BUCKET)
+RAW_BUCKET = os.environ.get("RAW_BUCKET", OCR_BUCKET)
 CASE_LIST_PATH = os.environ["CASE_LIST_PATH"]
-WORKDIR = Path("/tmp/prompts")
+WORKDIR = Path(shard_state_name("/tmp/prompts"))
 
 
 def fetch_case_list(client: storage.Client) -> list[str]:
@@ -32,34 +48,135 @@ def fetch_case_list(client: storage.Client) -> list[str]:
     raise ValueError("CASE_LIST_PATH must be a gs:// URI")
 
 
-def sync_ocr_files(client: storage.Client, case_ids: list[str]) -> Path:
-    WORKDIR.mkdir(parents=True, exist_ok=True)
+def sync_ocr_files(client: storage.Client, case_ids: list[str], workdir: Path = WORKDIR) -> Path:
+    workdir.mkdir(parents=True, exist_ok=True)
     source_bucket = client.bucket(OCR_BUCKET)
     for case_id in case_ids:
-        dest_case_dir = WORKDIR / case_id
+        dest_case_dir = workdir / case_id
         dest_case_dir.mkdir(exist_ok=True)
+        bundle = open_bundle(source_bucket, bundle_name("ocr", case_id)) if CASE_BUNDLES else None
+        if bundle is not None:
+            with bundle:
+                bundle.extract(dest_case_dir, "*_extracted_text.txt")
+            continue
         prefix = f"ocr/{case_id}/"
         for blob in source_bucket.list_blobs(prefix=prefix):
             if blob.name.endswith("_extracted_text.txt"):
                 destination = dest_case_dir / Path(blob.name).name
                 blob.download_to_filename(destination)
-    return WORKDIR
-
-
-def upload_prompts(client: storage.Client) -> None:
+    return workdir
+
+
+def seed_fingerprint(blob: storage.Blob, workdir: Path = WORKDIR) -> None:
+    """Restore the fingerprint of the uploaded prompt *blob* into *workdir*."""
+    fingerprint = (blob.metadata or {}).get("prompt_fingerprint")
+    if not fingerprint:
+        return
+    case_dir = workdir / Path(blob.name).parent.name
+    case_dir.mkdir(parents=True, exist_ok=True)
+    # The builder only trusts a fingerprint that sits next to an existing prompt
+    (case_dir / "combination_text.txt").touch()
+    write_json(
+        case_dir / FINGERPRINT_FILENAME,
+        {"fingerprint": fingerprint, "template_version": TEMPLATE_VERSION},
+        indent=2,
+    )
+
+
+def seed_fingerprints(client: storage.Client, case_ids: list[str]) -> None:
+    """Restore the fingerprints of already-uploaded prompts into WORKDIR.
+
+    The fingerprint travels as object metadata on ``prompts/{case_id}/combination_text.txt``;
+    writing it back lets the builder skip cases whose OCR text has not changed.
+    """
+    wanted = set(case_ids)
+    for blob in client.bucket(PROMPT_BUCKET).list_blobs(prefix="prompts/"):
+        case_id = Path(blob.name).parent.name
+        if blob.name.endswith("combination_text.txt") and case_id in wanted:
+            seed_fingerprint(blob)
+
+
+def upload_prompts(client: storage.Client, case_ids: list[str], workdir: Path = WORKDIR) -> None:
     dest_bucket = client.bucket(PROMPT_BUCKET)
-    for file_path in WORKDIR.rglob("combination_text.txt"):
-        blob = dest_bucket.blob(f"prompts/{file_path.relative_to(WORKDIR)}")
-        blob.upload_from_filename(file_path)
+    for case_id in case_ids:
+        file_path = workdir / case_id / "combination_text.txt"
+        fingerprint = json.loads((workdir / case_id / FINGERPRINT_FILENAME).read_text())["fingerprint"]
+        upload_file(
+            dest_bucket,
+            f"prompts/{file_path.relative_to(workdir)}",
+            file_path,
+            metadata={"prompt_fingerprint": fingerprint},
+        )
+
+
+def case_for_object(name: str) -> str | None:
+    """The case whose OCR text *name* is, or None for other objects."""
+    path = PurePosixPath(name)
+    if CASE_BUNDLES:
+        return path.stem if name == bundle_name("ocr", path.stem) else None
+    if len(path.parts) == 3 and path.parts[0] == "ocr" and name.endswith("_extracted_text.txt"):
+        return path.parts[1]
+    return None
+
+
+def pending_ocr(client: storage.Client, case_id: str) -> list[str]:
+    """OCR texts of *case_id* not yet written, or older than the PDF they come from.
+
+    Only the Complaint and Value PDFs are OCRed; each gives ``<stem>_extracted_text.txt``.
+    """
+    texts = {
+        PurePosixPath(blob.name).name: blob.updated
+        for blob in list_objects(client.bucket(OCR_BUCKET), f"ocr/{case_id}/", "_extracted_text.txt")
+    }
+    pending = []
+    for pdf in list_objects(client.bucket(RAW_BUCKET), f"cases/{case_id}/", ".pdf"):
+        path = PurePosixPath(pdf.name)
+        if "Complaint" not in path.name and "Value" not in path.name:
+            continue
+        text_name = f"{path.stem}_extracted_text.txt"
+        if text_name not in texts or texts[text_name] < pdf.updated:
+            pending.append(text_name)
+    return pending
+
+
+def handle_event(bucket: str, name: str) -> str | None:
+    """Rebuild the prompt of the case whose OCR text was just written; other objects are ignored.
+
+    Until every OCR text of the case is current the event is acknowledged without a
+    build; the event for the last text builds the prompt. An unchanged fingerprint
+    still skips the rebuild, so repeated events are cheap.
+    """
+    case_id = case_for_object(name) if bucket == OCR_BUCKET else None
+    if case_id is None:
+        return None
+    client = storage.Client()
+    # A bundle holds the whole case's OCR output, written at once
+    pending = [] if CASE_BUNDLES else pending_ocr(client, case_id)
+    if pending:
+        return f"Prompt for {case_id} waits for {', '.join(sorted(pending))}"
+    with tempfile.TemporaryDirectory(prefix="prompts-") as tmp:
+        workdir = Path(tmp)
+        sync_ocr_files(client, [case_id], workdir)
+        prompt = client.bucket(PROMPT_BUCKET).get_blob(f"prompts/{case_id}/combination_text.txt")
+        if prompt is not None:
+            seed_fingerprint(prompt, workdir)
+        delta, _ = create_combination_text(workdir)
+        changed = delta["new"] + delta["changed"]
+        upload_prompts(client, changed, workdir)
+    return f"Prompt for {case_id} {'rebuilt' if changed else 'unchanged'}"
 
 
 def run() -> None:
     client = storage.Client()
-    case_ids = fetch_case_list(client)
+    case_ids = take_shard(fetch_case_list(client), key=str)
     sync_ocr_files(client, case_ids)
-    create_combination_text(WORKDIR)
-    upload_prompts(client)
+    seed_fingerprints(client, case_ids)
+    delta, _ = create_combination_text(WORKDIR)
+    upload_prompts(client, delta["new"] + delta["changed"])
 
 
 if __name__ == "__main__":
-    run()
+    if SERVE_EVENTS:
+        serve(handle_event)
+    else:
+        run()
@@ -1,4 +1,8 @@
-"""Cloud Run entrypoint for the Selenium scraper."""
+"""Cloud Run entrypoint for the Selenium scraper.
+
+With PIPELINE_CASE_BUNDLES=1 each case's files are uploaded as a single zip
+bundle instead of one object per file.
+"""
 
 from __future__ import annotations
 
@@ -11,10 +15,14 @@ from google.cloud import storage
 
 REPO_ROOT = Path(__file__).resolve().parents[3]
 TESTING_DIR = REPO_ROOT / "testing"
-if str(TESTING_DIR) not in sys.path:
-    sys.path.insert(0, str(TESTING_DIR))
+for path in (REPO_ROOT, TESTING_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
 
 from LOCAL_oc_records_search import main as local_scraper_main  # type: ignore
+from bundles import bundle_directory, bundle_name  # type: ignore
+from gcs_io import upload_file  # type: ignore
+from settings import CASE_BUNDLES  # type: ignore
 
 RAW_BUCKET = os.environ.get("RAW_BUCKET")
 OUTPUT_PREFIX = os.environ.get("OUTPUT_PREFIX", "raw_cases")
@@ -42,12 +50,24 @@ def upload_case_artifacts(client: storage.Client, base_dir: Path) -> list[dict]:
         if not case_dir.is_dir():
             continue
 
+        if CASE_BUNDLES:
+            name = bundle_name("raw", case_dir.name)
+            members = bundle_directory(bucket, name, case_dir)
+            manifest_cases.append(
+                {
+                    "case_number": case_dir.name,
+                    "bundle": name,
+                    "files": [{"name": member} for member in members],
+                }
+            )
+            continue
+
         case_entry = {"case_number": case_dir.name, "files": []}
         for file_path in sorted(case_dir.glob("*")):
             if not file_path.is_file():
                 continue
             destination_blob = f"{OUTPUT_PREFIX}/cases/{case_dir.name}/{file_path.name}"
-            bucket.blob(destination_blob).upload_from_filename(file_path)
+            upload_file(bucket, destination_blob, file_path)
             case_entry["files"].append(
                 {
                     "name": file_path.name,
@@ -1,11 +1,23 @@
-"""Cloud Run entrypoint for Vertex AI processing."""
+"""Cloud Run entrypoint for Vertex AI processing.
+
+With SERVE_EVENTS=1 the service summarises each prompt as it is written (see
+``events.py``), always through the online API.
+
+Every model call is logged as a structured entry (``llm_call``) and, for a batch
+or online run, the run's metrics file is uploaded to
+``gs://METRICS_BUCKET/METRICS_PREFIX/<run>.jsonl`` for ``llm_metrics.py``.
+"""
 
 from __future__ import annotations
 
 import json
 import os
 import sys
+import threading
+import time
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Callable, Iterable, Iterator
 
 import vertexai
 from vertexai.generative_models import GenerativeModel
@@ -15,11 +27,31 @@ REPO_ROOT = Path(__file__).resolve().parents[3]
 if str(REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(REPO_ROOT))
 
+from events import SERVE_EVENTS, serve
+from gcs_io import Uploader, decode_text, iter_downloads, list_objects, upload_data
+from sharding import current_shard, take_shard
 from settings import VERTEX_MODEL, VERTEX_PROJECT, VERTEX_LOCATION
+from llm_metrics import (
+    append_record,
+    build_record,
+    format_summary,
+    log_record,
+    read_records,
+    timed_generate,
+    usage_from_batch_result,
+)
 
 PROMPT_BUCKET = os.environ["PROMPT_BUCKET"]
 SUMMARY_BUCKET = os.environ.get("SUMMARY_BUCKET", PROMPT_BUCKET)
 MODEL_NAME = os.environ.get("MODEL_NAME", VERTEX_MODEL)
+MODE = os.environ.get("VERTEX_MODE", "online")  # online|batch
+BATCH_BUCKET = os.environ.get("BATCH_BUCKET", PROMPT_BUCKET)
+BATCH_PREFIX = os.environ.get("BATCH_PREFIX", "batch")
+BATCH_POLL_SECONDS = int(os.environ.get("BATCH_POLL_SECONDS", "60"))
+METRICS_PATH = Path(os.environ.get("METRICS_PATH", "/tmp/llm_metrics.jsonl"))
+METRICS_SUMMARY = os.environ.get("METRICS_SUMMARY", "0") == "1"
+METRICS_BUCKET = os.environ.get("METRICS_BUCKET", SUMMARY_BUCKET)
+METRICS_PREFIX = os.environ.get("METRICS_PREFIX", "metrics/llm")
 
 GENERATION_CONFIG = {
     "max_output_tokens": 8192,
@@ -29,25 +61,245 @@ GENERATION_CONFIG = {
 }
 
 
+def case_id_for(blob_name: str) -> str:
+    return Path(blob_name).parents[0].name
+
+
+def needs_summary(prompt: storage.Blob, summary_updated: datetime | None) -> bool:
+    """Whether *prompt* has no summary, or was rebuilt after its summary was written."""
+    return summary_updated is None or summary_updated < prompt.updated
+
+
+def list_pending_prompts(storage_client: storage.Client) -> list[storage.Blob]:
+    """Return this task's prompt blobs with no summary, or whose prompt was rebuilt after its summary."""
+    summarised = {
+        Path(blob.name).stem: blob.updated
+        for blob in list_objects(storage_client.bucket(SUMMARY_BUCKET), "summaries/", ".json")
+    }
+    pending = []
+    prompts = list_objects(storage_client.bucket(PROMPT_BUCKET), "prompts/", "combination_text.txt")
+    for blob in take_shard(prompts, key=lambda blob: case_id_for(blob.name)):
+        if needs_summary(blob, summarised.get(case_id_for(blob.name))):
+            pending.append(blob)
+    return pending
+
+
+def build_batch_request(case_id: str, prompt_text: str) -> dict:
+    """Build one line of a Gemini batch-prediction request file.
+
+    ``key`` is not interpreted by the model; batch prediction copies it to the
+    matching output line so results can be routed back to their case.
+    """
+    return {
+        "key": case_id,
+        "request": {
+            "contents": [{"role": "user", "parts": [{"text": prompt_text}]}],
+            "generationConfig": {
+                "maxOutputTokens": GENERATION_CONFIG["max_output_tokens"],
+                "temperature": GENERATION_CONFIG["temperature"],
+                "topP": GENERATION_CONFIG["top_p"],
+                "responseMimeType": GENERATION_CONFIG["response_mime_type"],
+            },
+        },
+    }
+
+
+def response_text(result: dict) -> str | None:
+    """Extract the generated text from one batch-prediction output line."""
+    try:
+        parts = result["response"]["candidates"][0]["content"]["parts"]
+    except (KeyError, IndexError, TypeError):
+        return None
+    return "".join(part.get("text", "") for part in parts)
+
+
+class VertexBatchExecutor:
+    """Run request lines through a Vertex AI batch-prediction job."""
+
+    def __init__(self, storage_client: storage.Client, poll_seconds: int = BATCH_POLL_SECONDS) -> None:
+        self.storage_client = storage_client
+        self.poll_seconds = poll_seconds
+
+    def execute(self, requests: list[dict]) -> Iterator[dict]:
+        from vertexai.batch_prediction import BatchPredictionJob
+
+        index, count = current_shard()
+        run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        if count > 1:
+            run_id = f"{run_id}-task{index}"
+        bucket = self.storage_client.bucket(BATCH_BUCKET)
+        input_name = f"{BATCH_PREFIX}/{run_id}/requests.jsonl"
+        bucket.blob(input_name).upload_from_string(
+            "\n".join(json.dumps(line) for line in requests), content_type="application/jsonl"
+        )
+
+        job = BatchPredictionJob.submit(
+            source_model=MODEL_NAME,
+            input_dataset=f"gs://{BATCH_BUCKET}/{input_name}",
+            output_uri_prefix=f"gs://{BATCH_BUCKET}/{BATCH_PREFIX}/{run_id}/output",
+        )
+        print(f"Submitted batch job {job.resource_name} with {len(requests)} requests")
+        while not job.has_ended:
+            time.sleep(self.poll_seconds)
+            job.refresh()
+            print(f"Batch job state: {job.state.name}")
+        if not job.has_succeeded:
+            raise RuntimeError(f"Batch job {job.resource_name} failed: {job.error}")
+
+        _, output_path = job.output_location.split("gs://", 1)
+        output_bucket, output_prefix = output_path.split("/", 1)
+        for blob in self.storage_client.bucket(output_bucket).list_blobs(prefix=output_prefix):
+            if not blob.name.endswith(".jsonl"):
+                continue
+            for line in blob.download_as_text().splitlines():
+                if line.strip():
+                    yield json.loads(line)
+
+
+class LocalBatchExecutor:
+    """In-process stand-in for batch prediction, used for tests and dry runs.
+
+    *respond* receives the prompt text and returns the model output; results are
+    shaped like real batch-prediction output lines.
+    """
+
+    def __init__(self, respond: Callable[[str], str]) -> None:
+        self.respond = respond
+
+    def execute(self, requests: list[dict]) -> Iterator[dict]:
+        for line in requests:
+            prompt_text = line["request"]["contents"][0]["parts"][0]["text"]
+            yield {
+                **line,
+                "status": "",
+                "response": {"candidates": [{"content": {"role": "model", "parts": [{"text": self.respond(prompt_text)}]}}]},
+            }
+
+
+def store_batch_results(storage_client: storage.Client, results: Iterable[dict]) -> int:
+    """Split batch output lines into ``summaries/{case_id}.json`` objects."""
+    written = 0
+    with Uploader(storage_client.bucket(SUMMARY_BUCKET)) as uploader:
+        for result in results:
+            case_id = result.get("key")
+            text = response_text(result)
+            if not case_id or text is None:
+                print(f"Skipping batch result for {case_id or 'unknown case'}: {result.get('status') or 'no response'}")
+                continue
+            prompt_tokens, output_tokens = usage_from_batch_result(result)
+            record = build_record(case_id, MODEL_NAME, prompt_tokens=prompt_tokens, output_tokens=output_tokens)
+            append_record(METRICS_PATH, record)
+            log_record(record)
+            uploader.put(f"summaries/{case_id}.json", text)
+            written += 1
+            print(f"Wrote summary for {case_id}")
+    return written
+
+
+def run_batch(storage_client: storage.Client, executor) -> None:
+    pending = list_pending_prompts(storage_client)
+    if not pending:
+        print("No pending prompts; nothing to submit.")
+        return
+
+    requests = [
+        build_batch_request(case_id_for(blob.name), prompt_text)
+        for blob, prompt_text in iter_downloads(pending, decode_text)
+    ]
+    written = store_batch_results(storage_client, executor.execute(requests))
+    print(f"Batch complete: {written}/{len(requests)} summaries written")
+
+
+def summarize(model: GenerativeModel, case_id: str, prompt_text: str) -> str:
+    response = timed_generate(
+        model,
+        [prompt_text],
+        case_id=case_id,
+        model_name=MODEL_NAME,
+        metrics_path=METRICS_PATH,
+        generation_config=GENERATION_CONFIG,
+        stream=False,
+        on_record=log_record,
+    )
+    return response.text
+
+
+def run_online(storage_client: storage.Client) -> None:
+    model = GenerativeModel(MODEL_NAME)
+
+    # Prompts download ahead and summaries upload behind the model calls
+    with Uploader(storage_client.bucket(SUMMARY_BUCKET)) as uploader:
+        for blob, prompt_text in iter_downloads(list_pending_prompts(storage_client), decode_text):
+            case_id = case_id_for(blob.name)
+            uploader.put(f"summaries/{case_id}.json", summarize(model, case_id, prompt_text))
+            print(f"Wrote summary for {case_id}")
+
+
+_event_init_lock = threading.Lock()
+_event_model: GenerativeModel | None = None
+
+
+def handle_event(bucket: str, name: str) -> str | None:
+    """Summarise the prompt that was just written; other objects are ignored.
+
+    A redelivered event finds the summary newer than the prompt and makes no call.
+    """
+    global _event_model
+    if bucket != PROMPT_BUCKET or not name.startswith("prompts/") or not name.endswith("combination_text.txt"):
+        return None
+    storage_client = storage.Client()
+    case_id = case_id_for(name)
+    prompt = storage_client.bucket(bucket).get_blob(name)
+    if prompt is None:
+        return f"Prompt for {case_id} no longer exists"
+    summary_blob = storage_client.bucket(SUMMARY_BUCKET).get_blob(f"summaries/{case_id}.json")
+    if not needs_summary(prompt, summary_blob.updated if summary_blob is not None else None):
+        return f"Summary for {case_id} is current"
+    with _event_init_lock:
+        if _event_model is None:
+            vertexai.init(project=VERTEX_PROJECT, location=VERTEX_LOCATION)
+            _event_model = GenerativeModel(MODEL_NAME)
+    prompt_text = decode_text(prompt.download_as_bytes())
+    summary = summarize(_event_model, case_id, prompt_text)
+    upload_data(storage_client.bucket(SUMMARY_BUCKET).blob(f"summaries/{case_id}.json"), summary, "application/json")
+    return f"Wrote summary for {case_id}"
+
+
+def upload_metrics(storage_client: storage.Client, records: list[dict]) -> str | None:
+    """Upload this run's metric *records* as one JSONL object; returns its name."""
+    if not records:
+        return None
+    index, count = current_shard()
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    if count > 1:
+        run_id = f"{run_id}-task{index}"
+    name = f"{METRICS_PREFIX.strip('/')}/{run_id}.jsonl"
+    data = "".join(json.dumps(record) + "\n" for record in records)
+    upload_data(storage_client.bucket(METRICS_BUCKET).blob(name), data, "application/jsonl")
+    print(f"Uploaded {len(records)} LLM call records to gs://{METRICS_BUCKET}/{name}")
+    return name
+
+
 def run() -> None:
     storage_client = storage.Client()
     vertexai.init(project=VERTEX_PROJECT, location=VERTEX_LOCATION)
-    model = GenerativeModel(MODEL_NAME)
-
-    prompts_bucket = storage_client.bucket(PROMPT_BUCKET)
-    summaries_bucket = storage_client.bucket(SUMMARY_BUCKET)
+    metrics_offset = len(read_records(METRICS_PATH))
 
-    for blob in prompts_bucket.list_blobs(prefix="prompts/"):
-        if not blob.name.endswith("combination_text.txt"):
-            continue
-        case_id = Path(blob.name).parents[0].name
-        prompt_text = blob.download_as_text()
+    try:
+        if MODE == "batch":
+            run_batch(storage_client, VertexBatchExecutor(storage_client))
+        else:
+            run_online(storage_client)
+    finally:
+        records = read_records(METRICS_PATH)[metrics_offset:]
+        upload_metrics(storage_client, records)
 
-        response = model.generate_content([prompt_text], generation_config=GENERATION_CONFIG, stream=False)
-        output_blob = summaries_bucket.blob(f"summaries/{case_id}.json")
-        output_blob.upload_from_string(response.text, content_type="application/json")
-        print(f"Wrote summary for {case_id}")
+    if METRICS_SUMMARY:
+        print(format_summary(records))
 
 
 if __name__ == "__main__":
-    run()
+    if SERVE_EVENTS:
+        serve(handle_event)
+    else:
+        run()
@@ -1,89 +1,272 @@
-"""Enrich cases with Zillow data using RapidAPI."""
+"""Enrich cases with Zillow data using RapidAPI.
+
+Only enriched cases that are new or changed since the last run (tracked in
+PROCESSED_MANIFEST_BLOB) are loaded, with the Zillow fields of their previous
+output carried over. Earlier cases are loaded from their last output only when
+the fetch and attempt stamps in its metadata say they may be due for a refresh
+or a retry, so only new, stale or backed-off properties are fetched again, and
+an output is only rewritten when its record or stamps changed. Pass ``--full``
+to reload every case.
+With SERVE_EVENTS=1 the service instead handles each enriched case as it is
+written (see ``events.py``).
+"""
 
 from __future__ import annotations
 
+import argparse
 import json
 import os
 import sys
+import threading
+from datetime import datetime, timezone
 from pathlib import Path
 
+from google.api_core.exceptions import NotFound
 from google.cloud import storage
 
 REPO_ROOT = Path(__file__).resolve().parents[3]
 TESTING_DIR = REPO_ROOT / "testing"
-if str(TESTING_DIR) not in sys.path:
-    sys.path.insert(0, str(TESTING_DIR))
+for path in (REPO_ROOT, TESTING_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
 
-from get_zillow_data import get_google_data, get_zillow_data  # type: ignore
+from events import SERVE_EVENTS, serve  # type: ignore
+from gcs_io import ProcessedManifest, Uploader, decode_json, iter_downloads, list_objects  # type: ignore
+from payloads import GcsRawStore, configure_raw_store  # type: ignore
+from settings import ZILLOW_REFRESH_BUDGET  # type: ignore
+from sharding import shard_state_name, take_shard, task_count  # type: ignore
+from zillow import (  # type: ignore
+    ATTEMPTED_AT_FIELD,
+    ATTEMPTS_FIELD,
+    FETCHED_AT_FIELD,
+    QUOTA_PATH,
+    ZILLOW_FIELDS,
+    enrich_entries,
+    enrich_entry,
+    may_be_due,
+    select_due,
+)
 
 ENRICHED_BUCKET = os.environ["ENRICHED_BUCKET"]
 ZILLOW_BUCKET = os.environ.get("ZILLOW_BUCKET", ENRICHED_BUCKET)
 OUTPUT_PREFIX = os.environ.get("OUTPUT_PREFIX", "zillow")
+# RapidAPI quota usage is carried between batch runs in this blob; events only read it
+QUOTA_BLOB = shard_state_name(os.environ.get("QUOTA_BLOB", "state/rapidapi_quota.json"))
+# Full /property responses are stored gzip-compressed under this prefix
+RAW_PREFIX = os.environ.get("RAW_PREFIX", "raw")
+PROCESSED_MANIFEST_BLOB = shard_state_name(
+    os.environ.get("PROCESSED_MANIFEST_BLOB", "state/zillow_processed.json")
+)
+# Object metadata keys holding the output's ZillowFetchedAt, ZillowAttemptedAt
+# and ZillowAttempts stamps
+FETCHED_AT_METADATA = "zillow_fetched_at"
+ATTEMPTED_AT_METADATA = "zillow_attempted_at"
+ATTEMPTS_METADATA = "zillow_attempts"
+STAMP_METADATA = {
+    FETCHED_AT_FIELD: FETCHED_AT_METADATA,
+    ATTEMPTED_AT_FIELD: ATTEMPTED_AT_METADATA,
+    ATTEMPTS_FIELD: ATTEMPTS_METADATA,
+}
+
+
+def list_inputs(client: storage.Client) -> dict[str, storage.Blob]:
+    """This task's enriched case objects by case number."""
+    blobs = list_objects(client.bucket(ENRICHED_BUCKET), "enriched/", ".json")
+    return dict(take_shard(((Path(blob.name).stem, blob) for blob in blobs), key=lambda item: item[0]))
+
+
+def list_outputs(client: storage.Client) -> dict[str, storage.Blob]:
+    """This task's previous Zillow outputs by case number."""
+    blobs = list_objects(client.bucket(ZILLOW_BUCKET), f"{OUTPUT_PREFIX}/", ".json")
+    return dict(take_shard(((Path(blob.name).stem, blob) for blob in blobs), key=lambda item: item[0]))
+
+
+def output_metadata(entry: dict) -> dict[str, str]:
+    """The stamps of *entry* as object metadata."""
+    return {key: str(entry[field]) for field, key in STAMP_METADATA.items() if entry.get(field) is not None}
+
+
+def may_be_due_output(blob: storage.Blob, now: datetime) -> bool:
+    """Whether the stamps on output *blob* say its case may be due for a refresh or retry."""
+    metadata = blob.metadata or {}
+    try:
+        failures = int(metadata.get(ATTEMPTS_METADATA) or 0)
+    except ValueError:
+        failures = 0
+    return may_be_due(
+        metadata.get(FETCHED_AT_METADATA),
+        now,
+        attempted_at=metadata.get(ATTEMPTED_AT_METADATA),
+        failures=failures,
+    )
+
+
+def record_key(entry: dict) -> str:
+    return json.dumps(entry, sort_keys=True, default=str)
+
+
+def is_unchanged(entry: dict, original: str | None, stored_metadata: dict | None) -> bool:
+    """Whether *entry* matches its stored output (serialized as *original*) and its stamps."""
+    return original is not None and record_key(entry) == original and (stored_metadata or {}) == output_metadata(entry)
 
 
 def load_cases(client: storage.Client) -> list[dict]:
-    bucket = client.bucket(ENRICHED_BUCKET)
-    return [
-        json.loads(blob.download_as_text())
-        for blob in bucket.list_blobs(prefix="enriched/")
-        if blob.name.endswith(".json")
-    ]
+    return [case for _, case in iter_downloads(list_inputs(client).values(), decode_json)]
+
+
+def carry_over_previous(cases: list[dict], previous: dict[str, dict]) -> None:
+    """Copy the Zillow fields of each case's last upload (*previous*, by case number) onto *cases*."""
+    for entry in cases:
+        record = previous.get(entry.get("CaseNumber_Foreclosure"), {})
+        entry.update({field: record[field] for field in ZILLOW_FIELDS if field in record})
 
 
 def enrich_case(entry: dict) -> dict:
-    address_parts = [
-        entry.get("Address_PRISM"),
-        entry.get("AddressCity_PRISM"),
-        entry.get("AddressState_PRISM"),
-        entry.get("AddressZip_PRISM"),
-    ]
-    if not all(address_parts):
-        entry.setdefault("ZillowStatus", "SKIPPED_MISSING_ADDRESS")
-        return entry
-
-    property_address = ", ".join(address_parts[:3]) + f" {address_parts[3]}"
-    google_result = get_google_data(property_address)
-    if not google_result:
-        entry.setdefault("ZillowStatus", "NO_GOOGLE_RESULT")
-        return entry
-
-    zillow_url, zpid = google_result
-    zillow_data = get_zillow_data(zpid)
-    if not zillow_data:
-        entry.setdefault("ZillowStatus", "NO_ZILLOW_RESULT")
-        return entry
-
-    entry.update(
-        {
-            "Zillow_PRISM": zillow_data.get("zestimate"),
-            "ARV_PRISM": zillow_data.get("zestimate"),
-            "Beds_PRISM": zillow_data.get("bedrooms"),
-            "Baths_PRISM": zillow_data.get("bathrooms"),
-            "SqFootage_PRISM": zillow_data.get("livingArea"),
-            "Rent_PRISM": zillow_data.get("rentZestimate"),
-            "ZillowLink_PRISM": zillow_url,
-            "Additional_Zillow_Data": zillow_data,
-            "ZillowStatus": "SUCCESS",
-        }
-    )
+    enrich_entry(entry)
     return entry
 
 
-def upload_cases(client: storage.Client, cases: list[dict]) -> None:
-    bucket = client.bucket(ZILLOW_BUCKET)
-    for entry in cases:
-        case_number = entry.get("CaseNumber_Foreclosure", "unknown")
-        blob = bucket.blob(f"{OUTPUT_PREFIX}/{case_number}.json")
-        blob.upload_from_string(json.dumps(entry, indent=2), content_type="application/json")
-        print(f"Uploaded Zillow data for {case_number}")
+def download_quota(client: storage.Client) -> None:
+    blob = client.bucket(ZILLOW_BUCKET).blob(QUOTA_BLOB)
+    if blob.exists():
+        QUOTA_PATH.parent.mkdir(parents=True, exist_ok=True)
+        blob.download_to_filename(str(QUOTA_PATH))
+
+
+def upload_quota(client: storage.Client) -> None:
+    if QUOTA_PATH.exists():
+        blob = client.bucket(ZILLOW_BUCKET).blob(QUOTA_BLOB)
+        blob.upload_from_filename(str(QUOTA_PATH), content_type="application/json")
+
+
+def upload_cases(
+    client: storage.Client,
+    cases: list[dict],
+    sources: dict[str, storage.Blob],
+    manifest: ProcessedManifest | None,
+) -> None:
+    """Upload *cases*, marking each one's enriched input (from *sources*) processed on success.
+
+    The stamps are copied into the object metadata so later runs can tell
+    which outputs may be due without downloading them.
+    """
+    with Uploader(client.bucket(ZILLOW_BUCKET)) as uploader:
+        for entry in cases:
+            case_number = entry.get("CaseNumber_Foreclosure", "unknown")
+            source = sources.get(case_number)
+            uploader.put_json(
+                f"{OUTPUT_PREFIX}/{case_number}.json",
+                entry,
+                metadata=output_metadata(entry) or None,
+                on_done=(lambda source=source: manifest.mark(source)) if source and manifest else None,
+            )
+            print(f"Uploaded Zillow data for {case_number}")
+
+
+_event_quota_lock = threading.Lock()
+_event_quota_loaded = False
+
+
+def handle_event(bucket: str, name: str) -> str | None:
+    """Enrich the case whose enriched record was just written; other objects are ignored.
+
+    The case gets the same carry-over and refresh rules as in a batch run. The
+    quota state is downloaded once per instance as a starting point but never
+    uploaded: concurrent instances and the batch run would overwrite each other's
+    counts. The remaining-calls headers RapidAPI returns keep every tracker honest.
+    """
+    global _event_quota_loaded
+    if bucket != ENRICHED_BUCKET or not name.startswith("enriched/") or not name.endswith(".json"):
+        return None
+    client = storage.Client()
+    configure_raw_store(GcsRawStore(ZILLOW_BUCKET, RAW_PREFIX))
+    with _event_quota_lock:
+        if not _event_quota_loaded:
+            download_quota(client)
+            _event_quota_loaded = True
+
+    entry = decode_json(client.bucket(bucket).blob(name).download_as_bytes())
+    case_number = entry.get("CaseNumber_Foreclosure") or Path(name).stem
+    output = client.bucket(ZILLOW_BUCKET).get_blob(f"{OUTPUT_PREFIX}/{case_number}.json")
+    try:
+        previous = decode_json(output.download_as_bytes()) if output is not None else {}
+    except NotFound:
+        output, previous = None, {}
+    carry_over_previous([entry], {case_number: previous})
+    enrich_entries(select_due([entry]))
+    if output is not None and is_unchanged(entry, record_key(previous), output.metadata):
+        return f"Zillow data for {case_number} unchanged"
+    upload_cases(client, [entry], {}, None)
+    return f"Zillow enrichment of {case_number}: {entry.get('ZillowStatus')}"
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Enrich cases with Zillow data.")
+    parser.add_argument("--full", action="store_true", help="Reload every enriched case, not just new or changed ones.")
+    return parser.parse_args(argv)
 
 
-def run() -> None:
+def run(argv: list[str] | None = None) -> None:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
     client = storage.Client()
-    cases = load_cases(client)
-    enriched = [enrich_case(entry) for entry in cases]
-    upload_cases(client, enriched)
+    configure_raw_store(GcsRawStore(ZILLOW_BUCKET, RAW_PREFIX))
+    manifest = ProcessedManifest(client.bucket(ZILLOW_BUCKET).blob(PROCESSED_MANIFEST_BLOB))
+    if args.full:
+        manifest.reset()
+
+    inputs = list_inputs(client)
+    outputs = list_outputs(client)
+    changed_inputs = {Path(blob.name).stem: blob for blob in manifest.pending(inputs.values())}
+    # Unchanged cases are only loaded (from their last output) when the stamps
+    # on that output say they may be due for a refresh or retry.
+    now = datetime.now(timezone.utc)
+    candidates = [
+        blob
+        for case_number, blob in outputs.items()
+        if case_number in inputs and case_number not in changed_inputs and may_be_due_output(blob, now)
+    ]
+    previous_outputs = [outputs[case_number] for case_number in changed_inputs if case_number in outputs]
+
+    changed = [case for _, case in iter_downloads(changed_inputs.values(), decode_json)]
+    previous = {
+        record.get("CaseNumber_Foreclosure"): record
+        for _, record in iter_downloads(previous_outputs, decode_json)
+    }
+    carry_over_previous(changed, previous)
+    refreshable = [record for _, record in iter_downloads(candidates, decode_json)]
+    # Each case's stored output as uploaded, to tell which outputs need rewriting
+    originals = {case_number: record_key(record) for case_number, record in previous.items()}
+    originals.update((record.get("CaseNumber_Foreclosure"), record_key(record)) for record in refreshable)
+    print(f"{len(changed)} new or changed cases, {len(refreshable)} earlier cases that may be due")
+
+    download_quota(client)
+    try:
+        # The refresh budget is split between the tasks
+        due = select_due(changed + refreshable, budget=-(-ZILLOW_REFRESH_BUDGET // task_count()))
+        enrich_entries(due)
+    finally:
+        upload_quota(client)
+
+    # Outputs are only rewritten when the record or its stamps changed, so
+    # unchanged objects keep their generation and are not synced again.
+    unchanged = set()
+    for entry in changed + refreshable:
+        case_number = entry.get("CaseNumber_Foreclosure")
+        output = outputs.get(case_number)
+        if output is not None and is_unchanged(entry, originals.get(case_number), output.metadata):
+            unchanged.add(case_number)
+    for case_number in unchanged & changed_inputs.keys():
+        manifest.mark(changed_inputs[case_number])
+    rewrite = [entry for entry in changed + refreshable if entry.get("CaseNumber_Foreclosure") not in unchanged]
+    print(f"{len(rewrite)} outputs to write, {len(unchanged)} unchanged")
+    try:
+        upload_cases(client, rewrite, changed_inputs, manifest)
+    finally:
+        manifest.save()
 
 
 if __name__ == "__main__":
-    run()
+    if SERVE_EVENTS:
+        serve(handle_event)
+    else:
+        run()
@@ -0,0 +1,181 @@
+"""Per-case processing driven by Cloud Storage object-finalize events.
+
+Besides its batch ``run``, each Cloud Run service has a ``handle_event(bucket,
+name)`` that processes the one case an object belongs to and ignores objects it
+does not consume. With ``SERVE_EVENTS=1`` the service serves that handler over
+HTTP (``PORT``), accepting the requests Eventarc sends for a
+``google.cloud.storage.object.v1.finalized`` trigger (a CloudEvent in binary or
+structured mode) and Pub/Sub push messages from bucket notifications. A handler
+error answers 500 so the event is redelivered.
+
+Events can be simulated locally, against a running service or in-process::
+
+    python events.py send gs://bucket/summaries/2024-CA-000123.json --url http://localhost:8080/
+    python events.py call cloud/services/appraiser_enrichment/main.py gs://bucket/summaries/2024-CA-000123.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import importlib.util
+import json
+import os
+import sys
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Mapping
+
+SERVE_EVENTS = os.environ.get("SERVE_EVENTS", "0") == "1"
+PORT = int(os.environ.get("PORT", "8080"))
+FINALIZED_EVENT_TYPE = "google.cloud.storage.object.v1.finalized"
+
+Handler = Callable[[str, str], "str | None"]
+
+
+def parse_event(body: bytes, headers: Mapping[str, str]) -> tuple[str, str] | None:
+    """Return ``(bucket, object_name)`` from an event request, or None if it has none."""
+    headers = {key.lower(): value for key, value in headers.items()}
+    payload = json.loads(body or b"{}")
+    event_type = headers.get("ce-type") or payload.get("type")
+    if event_type and event_type != FINALIZED_EVENT_TYPE:
+        return None
+    message = payload.get("message")
+    if isinstance(message, dict):
+        # Pub/Sub push of a bucket notification
+        attributes = message.get("attributes") or {}
+        if attributes.get("eventType", "OBJECT_FINALIZE") != "OBJECT_FINALIZE":
+            return None
+        if attributes.get("bucketId") and attributes.get("objectId"):
+            return attributes["bucketId"], attributes["objectId"]
+        payload = json.loads(base64.b64decode(message.get("data") or b"e30="))
+    # Structured CloudEvents carry the object under "data"; binary ones are the object
+    data = payload.get("data") if isinstance(payload.get("data"), dict) else payload
+    if data.get("bucket") and data.get("name"):
+        return data["bucket"], data["name"]
+    return None
+
+
+def serve(handler: Handler, port: int = PORT) -> None:
+    """Serve *handler* for event requests on *port* until interrupted."""
+
+    class EventRequestHandler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            try:
+                target = parse_event(body, dict(self.headers))
+            except ValueError as exc:
+                self._reply(400, f"Unreadable event: {exc}")
+                return
+            if target is None:
+                self._reply(200, "Not an object-finalize event; ignored")
+                return
+            bucket, name = target
+            try:
+                result = handler(bucket, name)
+            except Exception as exc:  # answer 500 so the event is redelivered
+                print(f"Handling gs://{bucket}/{name} failed: {exc}")
+                self._reply(500, f"Failed: {exc}")
+                return
+            self._reply(200, result or f"Ignored gs://{bucket}/{name}")
+
+        def _reply(self, status: int, message: str) -> None:
+            data = message.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args) -> None:
+            print(f"{self.address_string()} {format % args}")
+
+    server = ThreadingHTTPServer(("", port), EventRequestHandler)
+    print(f"Serving storage events on port {port}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def parse_uri(uri: str) -> tuple[str, str]:
+    if not uri.startswith("gs://"):
+        raise ValueError(f"{uri} is not a gs:// URI")
+    bucket, _, name = uri[len("gs://") :].partition("/")
+    return bucket, name
+
+
+def build_event(bucket: str, name: str) -> tuple[dict, bytes]:
+    """Headers and body of a binary-mode CloudEvent as Eventarc would send it."""
+    headers = {
+        "Content-Type": "application/json",
+        "ce-id": str(uuid.uuid4()),
+        "ce-specversion": "1.0",
+        "ce-type": FINALIZED_EVENT_TYPE,
+        "ce-source": f"//storage.googleapis.com/projects/_/buckets/{bucket}",
+        "ce-subject": f"objects/{name}",
+        "ce-time": datetime.now(timezone.utc).isoformat(),
+    }
+    body = json.dumps({"bucket": bucket, "name": name, "kind": "storage#object"}).encode("utf-8")
+    return headers, body
+
+
+def send(url: str, bucket: str, name: str):
+    """POST a simulated event for ``gs://bucket/name`` to *url*; returns the response."""
+    import requests
+
+    headers, body = build_event(bucket, name)
+    return requests.post(url, data=body, headers=headers, timeout=900)
+
+
+def load_handler(service_path: Path) -> Handler:
+    """Import a service's ``main.py`` and return its ``handle_event``."""
+    spec = importlib.util.spec_from_file_location(f"service_{service_path.parent.name}", service_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.handle_event
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Simulate storage-finalize events.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    send_parser = subparsers.add_parser("send", help="POST events to a running service.")
+    send_parser.add_argument("uris", nargs="+", help="gs://bucket/object of each finalized object.")
+    send_parser.add_argument("--url", default=f"http://localhost:{PORT}/", help="Service URL.")
+    call_parser = subparsers.add_parser("call", help="Run a service's handler in this process.")
+    call_parser.add_argument("service", type=Path, help="Path to the service's main.py.")
+    call_parser.add_argument("uris", nargs="+", help="gs://bucket/object of each finalized object.")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    failed = 0
+    handler = load_handler(args.service) if args.command == "call" else None
+    for uri in args.uris:
+        bucket, name = parse_uri(uri)
+        if handler is not None:
+            print(handler(bucket, name) or f"Ignored {uri}")
+            continue
+        response = send(args.url, bucket, name)
+        print(f"{uri}: {response.status_code} {response.text}")
+        failed += not response.ok
+    return 1 if failed else 0
+
+
+__all__ = [
+    "SERVE_EVENTS",
+    "FINALIZED_EVENT_TYPE",
+    "parse_event",
+    "serve",
+    "parse_uri",
+    "build_event",
+    "send",
+    "load_handler",
+]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
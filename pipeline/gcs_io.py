@@ -0,0 +1,320 @@
+"""Concurrent, streaming GCS reads and writes shared by the Cloud Run services.
+
+A prefix is listed once; object bodies are then downloaded on a bounded thread
+pool and yielded as they arrive, with at most ``max_in_flight`` downloads queued
+so memory stays bounded however many objects the prefix holds. ``Uploader``
+writes objects on its own pool and blocks the producer once ``max_in_flight``
+uploads are pending. ``batched`` groups a stream into lists for stages that
+de-duplicate work within a batch. ``ProcessedManifest`` records the generation
+of every input object a service has handled, so a run can skip inputs that have
+not changed since.
+
+Text and JSON are written as compact JSON, gzip-compressed with
+``Content-Encoding: gzip`` (unless ``PIPELINE_GCS_GZIP=0``). GCS decompresses
+such objects for ordinary downloads, and the decoders here also accept gzip
+bytes, so readers see plain text either way. Objects written before compression
+can be rewritten with::
+
+    python gcs_io.py compress gs://bucket/prefix/
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, TypeVar
+
+from google.cloud import storage
+
+from settings import GCS_GZIP, GCS_MAX_WORKERS
+
+T = TypeVar("T")
+
+GZIP_MAGIC = b"\x1f\x8b"
+# Files written compressed by upload_file, with their content types
+TEXT_CONTENT_TYPES = {
+    ".txt": "text/plain; charset=utf-8",
+    ".json": "application/json",
+    ".jsonl": "application/jsonl",
+    ".csv": "text/csv",
+}
+
+
+def gunzip(data: bytes) -> bytes:
+    """Return *data* decompressed if it is gzip, unchanged otherwise."""
+    return gzip.decompress(data) if data[:2] == GZIP_MAGIC else data
+
+
+def upload_data(
+    blob: storage.Blob, data: str | bytes, content_type: str, *, compress: bool = GCS_GZIP
+) -> None:
+    """Upload *data* to *blob*, gzip-encoded when *compress* is set."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if compress:
+        blob.content_encoding = "gzip"
+        data = gzip.compress(data)
+    blob.upload_from_string(data, content_type=content_type)
+
+
+def upload_file(bucket: storage.Bucket, name: str, path: Path, **properties: Any) -> None:
+    """Upload the file at *path*; text files are compressed, others copied as they are.
+
+    Keyword arguments are set as blob properties (e.g. ``metadata``).
+    """
+    blob = bucket.blob(name)
+    for key, value in properties.items():
+        setattr(blob, key, value)
+    content_type = TEXT_CONTENT_TYPES.get(path.suffix.lower())
+    if content_type is None:
+        blob.upload_from_filename(str(path))
+    else:
+        upload_data(blob, path.read_bytes(), content_type)
+
+
+def list_objects(bucket: storage.Bucket, prefix: str, suffix: str | None = None) -> list[storage.Blob]:
+    """List *prefix* once, keeping objects whose names end with *suffix*."""
+    return [blob for blob in bucket.list_blobs(prefix=prefix) if suffix is None or blob.name.endswith(suffix)]
+
+
+def iter_downloads(
+    blobs: Iterable[storage.Blob],
+    decode: Callable[[bytes], T],
+    *,
+    max_workers: int = GCS_MAX_WORKERS,
+    max_in_flight: int | None = None,
+) -> Iterator[tuple[storage.Blob, T]]:
+    """Yield ``(blob, decode(body))`` in completion order.
+
+    Objects that fail to download or decode are reported and skipped.
+    """
+    max_in_flight = max_in_flight or max_workers * 2
+    blobs = iter(blobs)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gcs-read") as pool:
+        pending: dict[Future, storage.Blob] = {}
+
+        def fill() -> None:
+            for blob in islice(blobs, max_in_flight - len(pending)):
+                pending[pool.submit(lambda b=blob: decode(b.download_as_bytes()))] = blob
+
+        fill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                blob = pending.pop(future)
+                try:
+                    value = future.result()
+                except Exception as exc:  # one bad object must not stop the stream
+                    print(f"Skipping gs://{blob.bucket.name}/{blob.name}: {exc}")
+                    continue
+                yield blob, value
+            fill()
+
+
+def decode_json(data: bytes) -> Any:
+    return json.loads(gunzip(data))
+
+
+def decode_text(data: bytes) -> str:
+    return gunzip(data).decode("utf-8")
+
+
+def iter_json(
+    bucket: storage.Bucket, prefix: str, *, suffix: str = ".json", **kwargs: Any
+) -> Iterator[tuple[storage.Blob, Any]]:
+    """Stream the decoded JSON objects under *prefix*."""
+    return iter_downloads(list_objects(bucket, prefix, suffix), decode_json, **kwargs)
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    """Group *items* into lists of at most *size* (all of them when *size* is 0)."""
+    items = iter(items)
+    if size <= 0:
+        yield list(items)
+        return
+    while batch := list(islice(items, size)):
+        yield batch
+
+
+class Uploader:
+    """Bounded concurrent uploads to one bucket; use as a context manager.
+
+    Leaving the ``with`` block waits for every upload and raises if any failed.
+    """
+
+    def __init__(
+        self,
+        bucket: storage.Bucket,
+        *,
+        max_workers: int = GCS_MAX_WORKERS,
+        max_in_flight: int | None = None,
+    ) -> None:
+        self.bucket = bucket
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gcs-write")
+        self._slots = threading.BoundedSemaphore(max_in_flight or max_workers * 2)
+        self._lock = threading.Lock()
+        self.uploaded = 0
+        self.failed: dict[str, str] = {}
+
+    def put(
+        self,
+        name: str,
+        data: str | bytes,
+        content_type: str = "application/json",
+        *,
+        on_done: Callable[[], None] | None = None,
+        **properties: Any,
+    ) -> None:
+        """Queue an upload of *data* to *name*; blocks while the queue is full.
+
+        *on_done* is called once the upload has succeeded. Other keyword
+        arguments are set as blob properties (e.g. ``metadata``).
+        """
+        self._slots.acquire()
+        try:
+            self._pool.submit(self._upload, name, data, content_type, on_done, properties)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def put_json(self, name: str, data: Any, *, indent: int | None = None, **kwargs: Any) -> None:
+        separators = (",", ":") if indent is None else None
+        self.put(name, json.dumps(data, indent=indent, separators=separators), **kwargs)
+
+    def _upload(
+        self, name: str, data: str | bytes, content_type: str, on_done: Callable[[], None] | None, properties: dict
+    ) -> None:
+        try:
+            blob = self.bucket.blob(name)
+            for key, value in properties.items():
+                setattr(blob, key, value)
+            upload_data(blob, data, content_type)
+            with self._lock:
+                self.uploaded += 1
+            if on_done is not None:
+                on_done()
+        except Exception as exc:
+            with self._lock:
+                self.failed[name] = str(exc)
+            print(f"Upload of gs://{self.bucket.name}/{name} failed: {exc}")
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self) -> "Uploader":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+        if exc_type is None and self.failed:
+            raise RuntimeError(f"{len(self.failed)} uploads to gs://{self.bucket.name} failed")
+
+
+class ProcessedManifest:
+    """Input objects already processed, by name and generation, kept in a JSON blob.
+
+    A rewritten object gets a new generation, so it counts as pending again.
+    """
+
+    def __init__(self, blob: storage.Blob) -> None:
+        self.blob = blob
+        self._lock = threading.Lock()
+        self.entries: dict[str, int] = {}
+        if blob.exists():
+            self.entries = decode_json(blob.download_as_bytes())
+
+    def is_current(self, blob: storage.Blob) -> bool:
+        return self.entries.get(blob.name) == blob.generation
+
+    def pending(self, blobs: Iterable[storage.Blob]) -> list[storage.Blob]:
+        """Return the *blobs* that are new or changed since they were processed."""
+        blobs = list(blobs)
+        pending = [blob for blob in blobs if not self.is_current(blob)]
+        print(f"{len(pending)} of {len(blobs)} objects are new or changed")
+        return pending
+
+    def mark(self, blob: storage.Blob) -> None:
+        with self._lock:
+            self.entries[blob.name] = blob.generation
+
+    def reset(self) -> None:
+        with self._lock:
+            self.entries = {}
+
+    def save(self) -> None:
+        with self._lock:
+            data = json.dumps(self.entries, separators=(",", ":"))
+        self.blob.upload_from_string(data, content_type="application/json")
+
+
+def compress_objects(bucket: storage.Bucket, prefix: str, suffixes: tuple[str, ...], *, dry_run: bool = False) -> int:
+    """Rewrite the uncompressed objects under *prefix* gzip-encoded, JSON compacted.
+
+    Content type and metadata are kept. Returns the number of objects rewritten.
+    """
+    blobs = [
+        blob
+        for blob in list_objects(bucket, prefix)
+        if blob.name.endswith(suffixes) and blob.content_encoding != "gzip"
+    ]
+    print(f"{len(blobs)} uncompressed objects under gs://{bucket.name}/{prefix}")
+    if dry_run:
+        return 0
+    before = after = 0
+    with Uploader(bucket) as uploader:
+        for blob, data in iter_downloads(blobs, gunzip):
+            if blob.name.endswith(".json"):
+                data = json.dumps(json.loads(data), separators=(",", ":")).encode("utf-8")
+            before += blob.size or 0
+            after += len(gzip.compress(data))
+            uploader.put(blob.name, data, blob.content_type or "application/octet-stream", metadata=blob.metadata)
+    print(f"Rewrote {uploader.uploaded} objects: {before:,} -> about {after:,} bytes")
+    return uploader.uploaded
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Maintain pipeline objects in GCS.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compress = subparsers.add_parser("compress", help="Gzip-encode existing text and JSON objects.")
+    compress.add_argument("uri", help="gs://bucket/prefix to rewrite.")
+    compress.add_argument("--suffix", action="append", help="Object name suffixes (default .json and .txt).")
+    compress.add_argument("--dry-run", action="store_true", help="Only count the objects to rewrite.")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if not args.uri.startswith("gs://"):
+        raise ValueError("uri must be a gs:// URI")
+    bucket_name, _, prefix = args.uri[len("gs://") :].partition("/")
+    bucket = storage.Client().bucket(bucket_name)
+    compress_objects(bucket, prefix, tuple(args.suffix or (".json", ".txt")), dry_run=args.dry_run)
+    return 0
+
+
+__all__ = [
+    "gunzip",
+    "upload_data",
+    "upload_file",
+    "list_objects",
+    "iter_downloads",
+    "decode_json",
+    "decode_text",
+    "iter_json",
+    "batched",
+    "Uploader",
+    "ProcessedManifest",
+    "compress_objects",
+]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
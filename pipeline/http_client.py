@@ -0,0 +1,363 @@
+"""Shared HTTP client for every external API the pipeline calls.
+
+All requests go through one pooled ``requests.Session`` so connections are kept
+alive and reused. Idempotent requests are retried with exponential backoff on
+429/5xx (honouring ``Retry-After``, with every wait capped at
+``HTTP_MAX_RETRY_WAIT``), every request gets a timeout, and each host
+can be given a concurrency cap and a request rate. Per-host timing is collected so
+stages can report how long they spent waiting on each upstream.
+
+Each host also has a circuit breaker. After ``CIRCUIT_FAILURE_THRESHOLD``
+consecutive failures (connection errors, timeouts or retryable statuses once
+retries are exhausted) requests to it fail fast with ``CircuitOpenError`` until a
+single probe request is let through after ``CIRCUIT_RESET_SECONDS``. Stages mark
+the affected cases ``PENDING_UPSTREAM`` and hand them back to ``requeue_deferred``.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, TypeVar
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from settings import (
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_SECONDS,
+    HTTP_MAX_RETRY_WAIT,
+    HTTP_TIMEOUT,
+    UPSTREAM_REQUEUE_ROUNDS,
+)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_SECONDS = 1.0
+POOL_SIZE = 32
+
+# Status given to cases deferred because their upstream's circuit is open
+PENDING_UPSTREAM = "PENDING_UPSTREAM"
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of sending a request to a host whose circuit is open."""
+
+    def __init__(self, host: str, retry_in: float) -> None:
+        super().__init__(f"circuit open for {host}; next probe in {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class HostLimiter:
+    """Concurrency cap and minimum spacing between requests to one host."""
+
+    def __init__(self, max_concurrency: int | None = None, rate_per_second: float | None = None) -> None:
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._interval = 1.0 / rate_per_second if rate_per_second else 0.0
+        self._next_start = 0.0
+        self._lock = threading.Lock()
+
+    def _wait_for_rate(self) -> None:
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self._interval
+        if start > now:
+            time.sleep(start - now)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        if self._slots is None:
+            self._wait_for_rate()
+            yield
+            return
+        with self._slots:
+            self._wait_for_rate()
+            yield
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker for one host.
+
+    Closed: requests pass. Open: requests raise ``CircuitOpenError`` until
+    *reset_seconds* have passed, then one probe is let through; its outcome closes
+    the circuit or opens it again.
+    """
+
+    def __init__(self, host: str, failure_threshold: int, reset_seconds: float) -> None:
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_until: float | None = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_until is not None
+
+    def seconds_until_probe(self) -> float:
+        with self._lock:
+            if self._opened_until is None:
+                return 0.0
+            return max(0.0, self._opened_until - time.monotonic())
+
+    def before_request(self) -> None:
+        with self._lock:
+            if self._opened_until is None:
+                return
+            retry_in = self._opened_until - time.monotonic()
+            if retry_in > 0 or self._probing:
+                raise CircuitOpenError(self.host, max(retry_in, 0.0))
+            self._probing = True
+        print(f"Probing {self.host} for recovery")
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_until is not None:
+                print(f"Circuit for {self.host} closed")
+            self._failures = 0
+            self._opened_until = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if not self._probing and self._failures < self.failure_threshold:
+                return
+            self._opened_until = time.monotonic() + self.reset_seconds
+            self._probing = False
+        print(f"Circuit for {self.host} open after {self._failures} consecutive failures")
+
+
+    def configure(self, failure_threshold: int, reset_seconds: float) -> None:
+        """Change the thresholds, keeping the current state (an open circuit stays open)."""
+        with self._lock:
+            self.failure_threshold = failure_threshold
+            self.reset_seconds = reset_seconds
+
+
+class HostMetrics:
+    __slots__ = ("requests", "errors", "rejected", "total_seconds", "max_seconds", "statuses")
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.statuses: dict[int, int] = defaultdict(int)
+
+
+class CappedRetry(Retry):
+    """``Retry`` whose ``Retry-After`` wait is capped at ``HTTP_MAX_RETRY_WAIT``."""
+
+    def get_retry_after(self, response) -> float | None:
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, HTTP_MAX_RETRY_WAIT)
+
+
+def _build_session(retries: int, backoff_seconds: float) -> requests.Session:
+    retry = CappedRetry(
+        total=retries,
+        backoff_factor=backoff_seconds,
+        backoff_max=HTTP_MAX_RETRY_WAIT,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # Only advertise encodings requests can always decode
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    return session
+
+
+_session = _build_session(DEFAULT_RETRIES, DEFAULT_BACKOFF_SECONDS)
+_limiters: dict[str, HostLimiter] = {}
+_breakers: dict[str, CircuitBreaker] = {}
+_metrics: dict[str, HostMetrics] = defaultdict(HostMetrics)
+_lock = threading.Lock()
+
+
+def configure_retries(retries: int = DEFAULT_RETRIES, backoff_seconds: float = DEFAULT_BACKOFF_SECONDS) -> None:
+    """Replace the shared session with one using the given retry policy."""
+    global _session
+    with _lock:
+        _session = _build_session(retries, backoff_seconds)
+
+
+def configure_host(
+    host: str,
+    *,
+    max_concurrency: int | None = None,
+    rate_per_second: float | None = None,
+    failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+    reset_seconds: float = CIRCUIT_RESET_SECONDS,
+) -> None:
+    """Limit requests to *host* to *max_concurrency* in flight and *rate_per_second*.
+
+    An existing circuit breaker keeps its state and only takes the new thresholds.
+    """
+    with _lock:
+        _limiters[host] = HostLimiter(max_concurrency, rate_per_second)
+        if host in _breakers:
+            _breakers[host].configure(failure_threshold, reset_seconds)
+        else:
+            _breakers[host] = CircuitBreaker(host, failure_threshold, reset_seconds)
+
+
+def breaker(host: str) -> CircuitBreaker:
+    """Return the circuit breaker for *host*, creating one with the defaults."""
+    with _lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS)
+        return _breakers[host]
+
+
+def request(method: str, url: str, *, timeout: float | None = None, **kwargs: Any) -> requests.Response:
+    """Send a request through the shared session.
+
+    Accepts the keyword arguments of ``requests.Session.request``. Exceptions from
+    ``requests`` propagate to the caller once retries are exhausted; requests to a
+    host whose circuit is open raise ``CircuitOpenError`` without being sent.
+    """
+    host = urlsplit(url).netloc
+    limiter = _limiters.get(host)
+    circuit = breaker(host)
+    try:
+        circuit.before_request()
+    except CircuitOpenError:
+        with _lock:
+            _metrics[host].rejected += 1
+        raise
+
+    start = time.monotonic()
+    status = None
+    try:
+        if limiter is None:
+            response = _session.request(method, url, timeout=timeout or HTTP_TIMEOUT, **kwargs)
+        else:
+            with limiter.slot():
+                response = _session.request(method, url, timeout=timeout or HTTP_TIMEOUT, **kwargs)
+        status = response.status_code
+        return response
+    finally:
+        if status is None or status in RETRY_STATUSES:
+            circuit.record_failure()
+        else:
+            circuit.record_success()
+        elapsed = time.monotonic() - start
+        with _lock:
+            metrics = _metrics[host]
+            metrics.requests += 1
+            metrics.total_seconds += elapsed
+            metrics.max_seconds = max(metrics.max_seconds, elapsed)
+            if status is None or status >= 400:
+                metrics.errors += 1
+            if status is not None:
+                metrics.statuses[status] += 1
+
+
+def get(url: str, **kwargs: Any) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs: Any) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def seconds_until_probe() -> float:
+    """Seconds until the next open circuit may be probed (0 when all are closed)."""
+    with _lock:
+        circuits = list(_breakers.values())
+    waits = [circuit.seconds_until_probe() for circuit in circuits if circuit.is_open]
+    return min(waits, default=0.0)
+
+
+def requeue_deferred(
+    items: list[T],
+    run_round: Callable[[list[T]], list[T]],
+    *,
+    rounds: int = UPSTREAM_REQUEUE_ROUNDS,
+) -> list[T]:
+    """Process *items* with *run_round*, re-queuing what it defers.
+
+    *run_round* processes a list and returns the items it deferred because an
+    upstream circuit was open. Deferred items are retried once the next circuit
+    probe is due, up to *rounds* times; whatever is still deferred is returned.
+    """
+    deferred = run_round(items)
+    for _ in range(rounds):
+        if not deferred:
+            break
+        wait = seconds_until_probe()
+        print(f"{len(deferred)} deferred on open circuits; re-queuing in {wait:.1f}s")
+        time.sleep(wait)
+        deferred = run_round(deferred)
+    if deferred:
+        print(f"{len(deferred)} still pending on unavailable upstreams")
+    return deferred
+
+
+def metrics() -> dict[str, dict]:
+    """Snapshot of per-host request counts and timings."""
+    with _lock:
+        return {
+            host: {
+                "requests": m.requests,
+                "errors": m.errors,
+                "rejected": m.rejected,
+                "total_seconds": round(m.total_seconds, 3),
+                "avg_seconds": round(m.total_seconds / m.requests, 3) if m.requests else 0.0,
+                "max_seconds": round(m.max_seconds, 3),
+                "statuses": dict(m.statuses),
+            }
+            for host, m in _metrics.items()
+        }
+
+
+def format_metrics() -> str:
+    snapshot = metrics()
+    if not snapshot:
+        return "No HTTP requests made."
+    lines = [f"{'host':<48} {'requests':>8} {'errors':>6} {'skipped':>7} {'avg_s':>7} {'max_s':>7}"]
+    for host, m in sorted(snapshot.items()):
+        lines.append(
+            f"{host:<48} {m['requests']:>8} {m['errors']:>6} {m['rejected']:>7} "
+            f"{m['avg_seconds']:>7.3f} {m['max_seconds']:>7.3f}"
+        )
+    return "\n".join(lines)
+
+
+__all__ = [
+    "RETRY_STATUSES",
+    "PENDING_UPSTREAM",
+    "CircuitOpenError",
+    "CircuitBreaker",
+    "HostLimiter",
+    "configure_retries",
+    "configure_host",
+    "breaker",
+    "request",
+    "get",
+    "post",
+    "seconds_until_probe",
+    "requeue_deferred",
+    "metrics",
+    "format_metrics",
+]
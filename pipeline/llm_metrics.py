@@ -0,0 +1,219 @@
+"""Per-call token usage and latency accounting for the LLM stage.
+
+Every model call is described by one JSON line in a metrics file so that the
+expensive cases, retry rates and quota headroom can be read back after a run.
+Cases skipped because their summary is current make no call and are only
+counted per run. ``log_record`` also writes a record to stdout as a structured
+log entry, for services whose local files do not outlive the container.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Iterable, Sequence
+
+try:
+    from google.api_core import exceptions as api_exceptions
+except ImportError:  # pragma: no cover - only the summary CLI works without it
+    api_exceptions = None
+
+RETRYABLE_ERRORS: tuple[type[BaseException], ...] = (
+    (
+        api_exceptions.ResourceExhausted,
+        api_exceptions.InternalServerError,
+        api_exceptions.ServiceUnavailable,
+        api_exceptions.DeadlineExceeded,
+    )
+    if api_exceptions
+    else ()
+)
+
+
+def usage_from_response(response: Any) -> tuple[int | None, int | None]:
+    """Return ``(prompt_tokens, output_tokens)`` from a ``generate_content`` response."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None, None
+    return getattr(usage, "prompt_token_count", None), getattr(usage, "candidates_token_count", None)
+
+
+def usage_from_batch_result(result: dict) -> tuple[int | None, int | None]:
+    """Return ``(prompt_tokens, output_tokens)`` from a batch-prediction output line."""
+    usage = (result.get("response") or {}).get("usageMetadata") or {}
+    return usage.get("promptTokenCount"), usage.get("candidatesTokenCount")
+
+
+def build_record(
+    case_id: str,
+    model: str,
+    *,
+    prompt_tokens: int | None = None,
+    output_tokens: int | None = None,
+    latency_s: float | None = None,
+    attempts: int = 1,
+    status: str = "SUCCESS",
+) -> dict:
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "case_id": case_id,
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "output_tokens": output_tokens,
+        "latency_s": round(latency_s, 3) if latency_s is not None else None,
+        "attempts": attempts,
+        "status": status,
+    }
+
+
+def append_record(path: Path, record: dict) -> None:
+    """Append *record* as a single JSON line to *path*."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as fh:
+        fh.write(json.dumps(record) + "\n")
+
+
+def log_record(record: dict) -> None:
+    """Print *record* as a structured log entry (one JSON line, as Cloud Logging parses it)."""
+    severity = "INFO" if record["status"] == "SUCCESS" else "WARNING"
+    message = f"LLM call for case {record['case_id']}: {record['status']}"
+    print(json.dumps({"severity": severity, "message": message, "llm_call": record}), flush=True)
+
+
+def read_records(path: Path) -> list[dict]:
+    """Load every complete record from *path*, ignoring a torn trailing line."""
+    if not path.exists():
+        return []
+    records = []
+    with path.open("r", encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def timed_generate(
+    model: Any,
+    contents: list,
+    *,
+    case_id: str,
+    model_name: str,
+    metrics_path: Path,
+    max_attempts: int = 3,
+    backoff_seconds: float = 30.0,
+    on_record: Callable[[dict], None] | None = None,
+    **kwargs: Any,
+) -> Any:
+    """Call ``model.generate_content`` with retries and record the call in *metrics_path*.
+
+    Retryable API errors are retried with exponential backoff; the final error is
+    recorded and re-raised once *max_attempts* is exhausted. *on_record* is also
+    given each record, e.g. ``log_record``.
+    """
+
+    def record(**fields: Any) -> None:
+        entry = build_record(case_id, model_name, latency_s=time.monotonic() - start, attempts=attempts, **fields)
+        append_record(metrics_path, entry)
+        if on_record is not None:
+            on_record(entry)
+
+    start = time.monotonic()
+    attempts = 0
+    while True:
+        attempts += 1
+        try:
+            response = model.generate_content(contents, **kwargs)
+            break
+        except RETRYABLE_ERRORS as exc:
+            if attempts >= max_attempts:
+                record(status=type(exc).__name__)
+                raise
+            delay = backoff_seconds * 2 ** (attempts - 1)
+            print(f"Retryable error for case {case_id} (attempt {attempts}): {exc}; retrying in {delay:.0f}s")
+            time.sleep(delay)
+
+    prompt_tokens, output_tokens = usage_from_response(response)
+    record(prompt_tokens=prompt_tokens, output_tokens=output_tokens)
+    return response
+
+
+def _percentile(values: Sequence[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def format_summary(records: Iterable[dict], *, top: int = 5, skipped: int = 0) -> str:
+    """Render a per-model summary table and the most expensive cases.
+
+    *skipped* is the number of cases the run skipped without a call.
+    """
+    records = list(records)
+    skipped_line = f"{skipped} cases skipped with a current summary." if skipped else ""
+    if not records:
+        return "\n".join(filter(None, ["No LLM calls recorded.", skipped_line]))
+
+    lines = [
+        f"{'model':<28} {'calls':>6} {'retries':>7} {'failed':>6} "
+        f"{'prompt_tok':>11} {'output_tok':>11} {'avg_s':>7} {'p95_s':>7}"
+    ]
+    for model in sorted({record["model"] for record in records}):
+        rows = [record for record in records if record["model"] == model]
+        latencies = [row["latency_s"] for row in rows if row["latency_s"] is not None]
+        lines.append(
+            f"{model:<28} {len(rows):>6} "
+            f"{sum(max(row['attempts'] - 1, 0) for row in rows):>7} "
+            f"{sum(row['status'] != 'SUCCESS' for row in rows):>6} "
+            f"{sum(row['prompt_tokens'] or 0 for row in rows):>11} "
+            f"{sum(row['output_tokens'] or 0 for row in rows):>11} "
+            f"{(sum(latencies) / len(latencies)) if latencies else 0:>7.2f} "
+            f"{_percentile(latencies, 0.95) if latencies else 0:>7.2f}"
+        )
+
+    costly = sorted(
+        records,
+        key=lambda record: (record["prompt_tokens"] or 0) + (record["output_tokens"] or 0),
+        reverse=True,
+    )[:top]
+    if costly:
+        lines.append("")
+        lines.append("Most expensive cases:")
+        for record in costly:
+            lines.append(
+                f"  {record['case_id']:<24} prompt={record['prompt_tokens']} "
+                f"output={record['output_tokens']} latency={record['latency_s']}s attempts={record['attempts']}"
+            )
+    if skipped_line:
+        lines.extend(["", skipped_line])
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Summarise recorded LLM call metrics.")
+    parser.add_argument("path", type=Path, help="Metrics JSONL file to summarise.")
+    parser.add_argument("--top", type=int, default=5, help="Number of expensive cases to list.")
+    args = parser.parse_args(argv if argv is not None else sys.argv[1:])
+    print(format_summary(read_records(args.path), top=args.top))
+    return 0
+
+
+__all__ = [
+    "RETRYABLE_ERRORS",
+    "usage_from_response",
+    "usage_from_batch_result",
+    "build_record",
+    "append_record",
+    "log_record",
+    "read_records",
+    "timed_generate",
+    "format_summary",
+]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
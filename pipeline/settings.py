@@ -18,6 +18,20 @@ MANUAL_JSON_PATH: Final[Path] = LOCAL_DIR / "manual.json"
 ERROR_LOG_PATH: Final[Path] = LOCAL_DIR / "error_log.json"
 CASE_SCRAPER_LOG_PATH: Final[Path] = LOCAL_DIR / "case_scraper.log"
 FINAL_RESULTS_PATH: Final[Path] = LOCAL_DIR / "final_results.csv"
+ENRICHMENT_CACHE_PATH: Final[Path] = Path(
+    os.getenv("PIPELINE_ENRICHMENT_CACHE_PATH", str(LOCAL_DIR / "enrichment_cache.sqlite3"))
+)
+PARCEL_INDEX_PATH: Final[Path] = Path(
+    os.getenv("PIPELINE_PARCEL_INDEX_PATH", str(LOCAL_DIR / "parcel_index.sqlite3"))
+)
+LLM_METRICS_PATH: Final[Path] = LOCAL_DIR / "llm_metrics.jsonl"
+RAW_PAYLOAD_DIR: Final[Path] = Path(os.getenv("PIPELINE_RAW_PAYLOAD_DIR", str(LOCAL_DIR / "raw_payloads")))
+FIRESTORE_SYNC_INDEX_PATH: Final[Path] = Path(
+    os.getenv("PIPELINE_FIRESTORE_SYNC_INDEX_PATH", str(LOCAL_DIR / "firestore_sync_index.json"))
+)
+RAPIDAPI_QUOTA_PATH: Final[Path] = Path(
+    os.getenv("PIPELINE_RAPIDAPI_QUOTA_PATH", str(LOCAL_DIR / "rapidapi_quota.json"))
+)
 
 # Service account handling
 DEFAULT_SERVICE_ACCOUNT_PATHS = (
@@ -28,8 +42,10 @@ DEFAULT_SERVICE_ACCOUNT_PATHS = (
 
 
 def get_service_account_path() -> Path:
-    """Return the first existing service account path."""
-    for candidate in DEFAULT_SERVICE_ACCOUNT_PATHS:
+    """Return ``PIPELINE_SERVICE_ACCOUNT_PATH`` or the first existing default path."""
+    override = os.getenv("PIPELINE_SERVICE_ACCOUNT_PATH")
+    candidates = (Path(override),) if override else DEFAULT_SERVICE_ACCOUNT_PATHS
+    for candidate in candidates:
         if candidate.exists():
             return candidate
     raise FileNotFoundError(
@@ -53,9 +69,76 @@ FILEMAKER_COUNTY_ID: Final[str] = os.getenv(
     "PIPELINE_FILEMAKER_COUNTY_ID", "C82CDF06-179F-45E0-AC9E-F8869D93616C"
 )
 
+# Prompt building
+PROMPT_COMPACTION: Final[bool] = os.getenv("PIPELINE_PROMPT_COMPACTION", "1") == "1"
+PROMPT_TOKEN_BUDGET: Final[int] = int(os.getenv("PIPELINE_PROMPT_TOKEN_BUDGET", "0"))
+PROMPT_DROP_EXHIBITS: Final[bool] = os.getenv("PIPELINE_PROMPT_DROP_EXHIBITS", "0") == "1"
+
+# HTTP clients
+HTTP_TIMEOUT: Final[float] = float(os.getenv("PIPELINE_HTTP_TIMEOUT", "30"))
+# Longest wait between retries of one request, including a server's Retry-After;
+# the wait holds the host's concurrency slot, so a longer one would stall the host.
+HTTP_MAX_RETRY_WAIT: Final[float] = float(os.getenv("PIPELINE_HTTP_MAX_RETRY_WAIT", "10"))
+OCPA_MAX_CONCURRENCY: Final[int] = int(os.getenv("PIPELINE_OCPA_MAX_CONCURRENCY", "8"))
+APPRAISER_MAX_WORKERS: Final[int] = int(os.getenv("PIPELINE_APPRAISER_MAX_WORKERS", "4"))
+
+# Circuit breakers: a host is skipped after this many consecutive failures and
+# probed again after the reset interval; deferred cases are re-queued this many times.
+CIRCUIT_FAILURE_THRESHOLD: Final[int] = int(os.getenv("PIPELINE_CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS: Final[float] = float(os.getenv("PIPELINE_CIRCUIT_RESET_SECONDS", "30"))
+UPSTREAM_REQUEUE_ROUNDS: Final[int] = int(os.getenv("PIPELINE_UPSTREAM_REQUEUE_ROUNDS", "3"))
+
+# Enrichment caches; TTL overrides are "Namespace=days" pairs, e.g. "Search=7,TotalTaxes=365"
+APPRAISER_CACHE_ENABLED: Final[bool] = os.getenv("PIPELINE_APPRAISER_CACHE", "1") == "1"
+APPRAISER_CACHE_TTL_DAYS: Final[str] = os.getenv("PIPELINE_APPRAISER_CACHE_TTL_DAYS", "")
+
+# Cloud Run GCS access: concurrent transfers, and records processed per streamed batch
+GCS_MAX_WORKERS: Final[int] = int(os.getenv("PIPELINE_GCS_MAX_WORKERS", "16"))
+GCS_STREAM_BATCH_SIZE: Final[int] = int(os.getenv("PIPELINE_GCS_STREAM_BATCH_SIZE", "200"))
+# Text and JSON objects are written gzip-encoded (Content-Encoding: gzip)
+GCS_GZIP: Final[bool] = os.getenv("PIPELINE_GCS_GZIP", "1") == "1"
+# Per-case zip bundles replace the many small raw and OCR objects when enabled
+CASE_BUNDLES: Final[bool] = os.getenv("PIPELINE_CASE_BUNDLES", "0") == "1"
+CASE_BUNDLE_PREFIX: Final[str] = os.getenv("PIPELINE_CASE_BUNDLE_PREFIX", "bundles")
+
+# Firestore bulk writes; throughput ramps up from the initial rate (500/50/5 rule)
+FIRESTORE_COLLECTION: Final[str] = os.getenv("PIPELINE_FIRESTORE_COLLECTION", "data_from_oc_records_search")
+FIRESTORE_INITIAL_OPS_PER_SECOND: Final[int] = int(os.getenv("PIPELINE_FIRESTORE_INITIAL_OPS_PER_SECOND", "500"))
+FIRESTORE_MAX_OPS_PER_SECOND: Final[int] = int(os.getenv("PIPELINE_FIRESTORE_MAX_OPS_PER_SECOND", "10000"))
+FIRESTORE_PARALLEL: Final[bool] = os.getenv("PIPELINE_FIRESTORE_PARALLEL", "1") == "1"
+FIRESTORE_MAX_RETRIES: Final[int] = int(os.getenv("PIPELINE_FIRESTORE_MAX_RETRIES", "10"))
+
 GOOGLE_SEARCH_RAPIDAPI_HOST: Final[str] = "google-search74.p.rapidapi.com"
 ZILLOW_RAPIDAPI_HOST: Final[str] = "zillow-com1.p.rapidapi.com"
 
+# RapidAPI plan limits; a monthly quota of 0 is taken from the response headers
+GOOGLE_SEARCH_RAPIDAPI_RPS: Final[float] = float(os.getenv("PIPELINE_GOOGLE_SEARCH_RAPIDAPI_RPS", "5"))
+GOOGLE_SEARCH_RAPIDAPI_MONTHLY_QUOTA: Final[int] = int(
+    os.getenv("PIPELINE_GOOGLE_SEARCH_RAPIDAPI_MONTHLY_QUOTA", "0")
+)
+ZILLOW_RAPIDAPI_RPS: Final[float] = float(os.getenv("PIPELINE_ZILLOW_RAPIDAPI_RPS", "2"))
+ZILLOW_RAPIDAPI_MONTHLY_QUOTA: Final[int] = int(os.getenv("PIPELINE_ZILLOW_RAPIDAPI_MONTHLY_QUOTA", "0"))
+ZILLOW_MAX_WORKERS: Final[int] = int(os.getenv("PIPELINE_ZILLOW_MAX_WORKERS", "4"))
+
+# Address -> zpid cache; addresses without a Zillow listing are retried sooner
+ZILLOW_CACHE_ENABLED: Final[bool] = os.getenv("PIPELINE_ZILLOW_CACHE", "1") == "1"
+ZILLOW_SEARCH_TTL_DAYS: Final[float] = float(os.getenv("PIPELINE_ZILLOW_SEARCH_TTL_DAYS", "365"))
+ZILLOW_SEARCH_MISS_TTL_DAYS: Final[float] = float(os.getenv("PIPELINE_ZILLOW_SEARCH_MISS_TTL_DAYS", "7"))
+
+# Attributes of the enrichment payloads kept on records, as comma-separated dotted
+# paths (e.g. "zpid,zestimate,address.zipcode"); empty uses the defaults in payloads.py
+ZILLOW_PROJECTION: Final[str] = os.getenv("PIPELINE_ZILLOW_PROJECTION", "")
+APPRAISER_PROJECTION: Final[str] = os.getenv("PIPELINE_APPRAISER_PROJECTION", "")
+
+# Zillow refresh policy. Active states are "Field=Value" pairs, e.g. "Status_PRISM=Active";
+# a refresh budget of 0 refreshes every stale property in one run. A failed lookup is
+# retried after the retry delay, doubled for each further failure up to the max age.
+ZILLOW_MAX_AGE_DAYS: Final[float] = float(os.getenv("PIPELINE_ZILLOW_MAX_AGE_DAYS", "30"))
+ZILLOW_ACTIVE_MAX_AGE_DAYS: Final[float] = float(os.getenv("PIPELINE_ZILLOW_ACTIVE_MAX_AGE_DAYS", "1"))
+ZILLOW_ACTIVE_STATES: Final[str] = os.getenv("PIPELINE_ZILLOW_ACTIVE_STATES", "")
+ZILLOW_REFRESH_BUDGET: Final[int] = int(os.getenv("PIPELINE_ZILLOW_REFRESH_BUDGET", "0"))
+ZILLOW_RETRY_DAYS: Final[float] = float(os.getenv("PIPELINE_ZILLOW_RETRY_DAYS", "7"))
+
 # Chrome / Selenium
 CHROME_EXTENSION_DIR: Final[Path] = LOCAL_DIR / "nopecha_extension"
 
@@ -76,6 +159,12 @@ __all__ = [
     "ERROR_LOG_PATH",
     "CASE_SCRAPER_LOG_PATH",
     "FINAL_RESULTS_PATH",
+    "ENRICHMENT_CACHE_PATH",
+    "PARCEL_INDEX_PATH",
+    "LLM_METRICS_PATH",
+    "RAW_PAYLOAD_DIR",
+    "FIRESTORE_SYNC_INDEX_PATH",
+    "RAPIDAPI_QUOTA_PATH",
     "SERVICE_ACCOUNT_PATH",
     "GCS_BUCKET",
     "VERTEX_PROJECT",
@@ -86,8 +175,45 @@ __all__ = [
     "FILEMAKER_BASIC_AUTH",
     "FILEMAKER_BEARER_TOKEN",
     "FILEMAKER_COUNTY_ID",
+    "PROMPT_COMPACTION",
+    "PROMPT_TOKEN_BUDGET",
+    "PROMPT_DROP_EXHIBITS",
+    "HTTP_TIMEOUT",
+    "HTTP_MAX_RETRY_WAIT",
+    "OCPA_MAX_CONCURRENCY",
+    "APPRAISER_MAX_WORKERS",
+    "CIRCUIT_FAILURE_THRESHOLD",
+    "CIRCUIT_RESET_SECONDS",
+    "UPSTREAM_REQUEUE_ROUNDS",
+    "APPRAISER_CACHE_ENABLED",
+    "APPRAISER_CACHE_TTL_DAYS",
+    "GCS_MAX_WORKERS",
+    "GCS_STREAM_BATCH_SIZE",
+    "GCS_GZIP",
+    "CASE_BUNDLES",
+    "CASE_BUNDLE_PREFIX",
+    "FIRESTORE_COLLECTION",
+    "FIRESTORE_INITIAL_OPS_PER_SECOND",
+    "FIRESTORE_MAX_OPS_PER_SECOND",
+    "FIRESTORE_PARALLEL",
+    "FIRESTORE_MAX_RETRIES",
     "GOOGLE_SEARCH_RAPIDAPI_HOST",
     "ZILLOW_RAPIDAPI_HOST",
+    "GOOGLE_SEARCH_RAPIDAPI_RPS",
+    "GOOGLE_SEARCH_RAPIDAPI_MONTHLY_QUOTA",
+    "ZILLOW_RAPIDAPI_RPS",
+    "ZILLOW_RAPIDAPI_MONTHLY_QUOTA",
+    "ZILLOW_MAX_WORKERS",
+    "ZILLOW_CACHE_ENABLED",
+    "ZILLOW_SEARCH_TTL_DAYS",
+    "ZILLOW_SEARCH_MISS_TTL_DAYS",
+    "ZILLOW_PROJECTION",
+    "APPRAISER_PROJECTION",
+    "ZILLOW_MAX_AGE_DAYS",
+    "ZILLOW_ACTIVE_MAX_AGE_DAYS",
+    "ZILLOW_ACTIVE_STATES",
+    "ZILLOW_REFRESH_BUDGET",
+    "ZILLOW_RETRY_DAYS",
     "CHROME_EXTENSION_DIR",
     "ensure_directories",
 ]
@@ -0,0 +1,118 @@
+"""Split a Cloud Run Job's cases across its parallel tasks.
+
+Cloud Run Jobs start ``CLOUD_RUN_TASK_COUNT`` copies of a service and give each
+one its ``CLOUD_RUN_TASK_INDEX``. A case belongs to the task given by a stable
+hash of its case number, so every task sees the same split on every run and the
+outputs of all tasks land in the same prefixes. State a service keeps between
+runs (manifests, quota usage, sync indexes) is kept per shard with
+``shard_state_name`` so tasks never overwrite each other's.
+
+Several tasks can be simulated locally::
+
+    python sharding.py --tasks 4 -- python cloud/services/ocr/main.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import subprocess
+import sys
+from pathlib import PurePosixPath
+from typing import Callable, Iterable, TypeVar
+
+T = TypeVar("T")
+
+TASK_INDEX_ENV = "CLOUD_RUN_TASK_INDEX"
+TASK_COUNT_ENV = "CLOUD_RUN_TASK_COUNT"
+
+
+def current_shard() -> tuple[int, int]:
+    """Return ``(task_index, task_count)``; ``(0, 1)`` outside a Cloud Run Job."""
+    count = max(1, int(os.environ.get(TASK_COUNT_ENV, "1")))
+    index = int(os.environ.get(TASK_INDEX_ENV, "0"))
+    if not 0 <= index < count:
+        raise ValueError(f"{TASK_INDEX_ENV}={index} is outside 0..{count - 1}")
+    return index, count
+
+
+def task_count() -> int:
+    return current_shard()[1]
+
+
+def shard_of(key: str, count: int) -> int:
+    """The shard of *key* among *count*; unlike ``hash()`` it is the same in every process."""
+    digest = hashlib.sha256(str(key).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+
+def take_shard(items: Iterable[T], key: Callable[[T], str], shard: tuple[int, int] | None = None) -> list[T]:
+    """Keep the *items* whose *key* falls in *shard* (the current task's by default)."""
+    index, count = shard or current_shard()
+    items = list(items)
+    if count == 1:
+        return items
+    mine = [item for item in items if shard_of(key(item), count) == index]
+    print(f"Task {index + 1}/{count}: {len(mine)} of {len(items)} cases")
+    return mine
+
+
+def shard_state_name(name: str, shard: tuple[int, int] | None = None) -> str:
+    """Per-shard variant of a state object or file *name* (unchanged for a single task).
+
+    ``state/x.json`` becomes ``state/x.shard-1-of-4.json``. Changing the task
+    count starts fresh state for the new shards.
+    """
+    index, count = shard or current_shard()
+    if count == 1:
+        return name
+    path = PurePosixPath(name)
+    return str(path.with_name(f"{path.stem}.shard-{index}-of-{count}{path.suffix}"))
+
+
+def run_tasks(command: list[str], tasks: int) -> int:
+    """Run *command* as *tasks* parallel local tasks; returns the number that failed."""
+    processes = []
+    for index in range(tasks):
+        env = {**os.environ, TASK_INDEX_ENV: str(index), TASK_COUNT_ENV: str(tasks)}
+        processes.append(subprocess.Popen(command, env=env))
+    failed = 0
+    for index, process in enumerate(processes):
+        code = process.wait()
+        if code:
+            failed += 1
+            print(f"Task {index + 1}/{tasks} exited with status {code}")
+    print(f"{tasks - failed} of {tasks} tasks succeeded")
+    return failed
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run a service as several local Cloud Run tasks.")
+    parser.add_argument("--tasks", type=int, default=2, help="Number of tasks to start.")
+    parser.add_argument("command", nargs=argparse.REMAINDER, help="Command to run, after --.")
+    args = parser.parse_args(argv)
+    if args.command[:1] == ["--"]:
+        args.command = args.command[1:]
+    if not args.command or args.tasks < 1:
+        parser.error("a command and --tasks >= 1 are required")
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    return 1 if run_tasks(args.command, args.tasks) else 0
+
+
+__all__ = [
+    "current_shard",
+    "task_count",
+    "shard_of",
+    "take_shard",
+    "shard_state_name",
+    "run_tasks",
+]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,174 @@
+"""Street address normalisation shared by the enrichment stages.
+
+Addresses written by the LLM vary ("123 North Main Street, Apt 4" vs
+"123 N MAIN ST #4"). ``normalize_address`` reduces them to a USPS-style canonical
+form so that caches, the parcel index and per-run de-duplication treat them as the
+same property; ``group_by_address`` groups case records by that canonical form so
+each enrichment runs once per unique property.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Iterable, NamedTuple
+
+# USPS Publication 28, Appendix C1 (common suffixes and their frequent variants)
+STREET_SUFFIXES = {
+    "ALLEY": "ALY", "ALLY": "ALY",
+    "AVENUE": "AVE", "AV": "AVE", "AVEN": "AVE", "AVENU": "AVE", "AVN": "AVE", "AVNUE": "AVE",
+    "BEND": "BND",
+    "BOULEVARD": "BLVD", "BOUL": "BLVD", "BOULV": "BLVD", "BLV": "BLVD",
+    "CIRCLE": "CIR", "CIRC": "CIR", "CIRCL": "CIR", "CRCL": "CIR",
+    "COURT": "CT", "CRT": "CT",
+    "COVE": "CV",
+    "CROSSING": "XING", "CRSSNG": "XING",
+    "DRIVE": "DR", "DRIV": "DR", "DRV": "DR",
+    "EXPRESSWAY": "EXPY", "EXPRESS": "EXPY",
+    "HIGHWAY": "HWY", "HIGHWY": "HWY", "HIWAY": "HWY",
+    "LANE": "LN",
+    "LOOP": "LOOP",
+    "PARKWAY": "PKWY", "PARKWY": "PKWY", "PKY": "PKWY",
+    "PATH": "PATH",
+    "PLACE": "PL",
+    "POINT": "PT",
+    "ROAD": "RD",
+    "RUN": "RUN",
+    "SQUARE": "SQ", "SQR": "SQ",
+    "STREET": "ST", "STR": "ST", "STRT": "ST",
+    "TERRACE": "TER", "TERR": "TER",
+    "TRAIL": "TRL", "TRAILS": "TRL", "TRLS": "TRL",
+    "TRACE": "TRCE",
+    "WAY": "WAY",
+}
+USPS_SUFFIXES = frozenset(STREET_SUFFIXES.values())
+
+DIRECTIONALS = {
+    "NORTH": "N", "SOUTH": "S", "EAST": "E", "WEST": "W",
+    "NORTHEAST": "NE", "NORTHWEST": "NW", "SOUTHEAST": "SE", "SOUTHWEST": "SW",
+}
+USPS_DIRECTIONALS = frozenset(DIRECTIONALS.values())
+
+# Secondary unit designators; every form is reduced to "#<unit>". A designator
+# followed by a street suffix is part of the street name ("2000 N LOT RD").
+UNIT_DESIGNATORS = frozenset({"APT", "APARTMENT", "UNIT", "STE", "SUITE", "BLDG", "BUILDING", "LOT", "RM", "ROOM", "#"})
+
+# Florida ZIP codes fall in 32004-34997
+FLORIDA_ZIP_RANGE = (32004, 34997)
+
+ZIP_PATTERN = re.compile(r"^(\d{5})(?:-?\d{4})?$")
+STREET_NUMBER_PATTERN = re.compile(r"^\d+[A-Z]?(?:-\d+)?$")
+
+
+class ParsedAddress(NamedTuple):
+    number: str
+    street: str
+    unit: str
+
+    def line(self) -> str:
+        parts = [self.number, self.street, f"#{self.unit}" if self.unit else ""]
+        return " ".join(part for part in parts if part)
+
+
+def _tokens(address: str) -> list[str]:
+    cleaned = re.sub(r"[^\w\s#-]", " ", address.upper()).replace("#", " # ")
+    return cleaned.split()
+
+
+def parse_address(address: str) -> ParsedAddress:
+    """Split a street line into number, canonical street and unit."""
+    tokens = _tokens(address)
+
+    unit = ""
+    for position, token in enumerate(tokens):
+        following = tokens[position + 1 :]
+        if token not in UNIT_DESIGNATORS or position == 0 or not following:
+            continue
+        if token != "#" and following[0] in STREET_SUFFIXES.keys() | USPS_SUFFIXES:
+            continue
+        unit = "".join(following).lstrip("#")
+        tokens = tokens[:position]
+        break
+
+    number = ""
+    if tokens and STREET_NUMBER_PATTERN.match(tokens[0]):
+        number, tokens = tokens[0], tokens[1:]
+
+    # Directionals are abbreviated unless they are the street name itself
+    # ("123 NORTH ST" keeps NORTH).
+    if len(tokens) > 2 and tokens[0] in DIRECTIONALS:
+        tokens[0] = DIRECTIONALS[tokens[0]]
+    if len(tokens) > 2 and tokens[-1] in DIRECTIONALS:
+        tokens[-1] = DIRECTIONALS[tokens[-1]]
+
+    suffix_position = len(tokens) - 1
+    if tokens and tokens[-1] in USPS_DIRECTIONALS and len(tokens) > 2:
+        suffix_position -= 1
+    if suffix_position > 0 and tokens[suffix_position] in STREET_SUFFIXES:
+        tokens[suffix_position] = STREET_SUFFIXES[tokens[suffix_position]]
+
+    return ParsedAddress(number, " ".join(tokens), unit)
+
+
+def normalize_address(address: str) -> str:
+    """Canonical USPS-style form of a street line, e.g. ``123 N MAIN ST #4``."""
+    return parse_address(address).line()
+
+
+def split_street_number(address: str) -> tuple[str, str]:
+    """Split a normalised address into ``(street_number, rest)``."""
+    number, _, rest = address.partition(" ")
+    if STREET_NUMBER_PATTERN.match(number):
+        return number, rest
+    return "", address
+
+
+def normalize_zip(zip_code) -> str | None:
+    """Return the 5-digit Florida ZIP in *zip_code*, or None if it is not valid."""
+    match = ZIP_PATTERN.match(str(zip_code or "").strip())
+    if not match:
+        return None
+    low, high = FLORIDA_ZIP_RANGE
+    return match.group(1) if low <= int(match.group(1)) <= high else None
+
+
+def canonical_key(entry: dict) -> str | None:
+    """Key identifying the property of a case record, or None without an address."""
+    street = entry.get("Address_PRISM")
+    if not street:
+        return None
+    locality = normalize_zip(entry.get("AddressZip_PRISM")) or " ".join(
+        str(entry.get("AddressCity_PRISM") or "").upper().split()
+    )
+    return f"{normalize_address(street)}|{locality}"
+
+
+def group_by_address(entries: Iterable[dict]) -> list[list[dict]]:
+    """Group *entries* by canonical property; entries without an address stand alone."""
+    groups: dict[str, list[dict]] = {}
+    singles: list[list[dict]] = []
+    for entry in entries:
+        key = canonical_key(entry)
+        if key is None:
+            singles.append([entry])
+        else:
+            groups.setdefault(key, []).append(entry)
+    return list(groups.values()) + singles
+
+
+def share_fields(lead: dict, followers: Iterable[dict], fields: Iterable[str]) -> None:
+    """Copy the enrichment *fields* of *lead* onto the other cases of its group."""
+    fields = tuple(fields)
+    for entry in followers:
+        entry.update({field: lead[field] for field in fields if field in lead})
+
+
+__all__ = [
+    "ParsedAddress",
+    "parse_address",
+    "normalize_address",
+    "split_street_number",
+    "normalize_zip",
+    "canonical_key",
+    "group_by_address",
+    "share_fields",
+]
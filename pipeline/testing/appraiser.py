@@ -0,0 +1,397 @@
+"""Single-pass enrichment of case records from the Orange County Property Appraiser.
+
+Each address is resolved once, each parcel endpoint is fetched once, and the
+results fill both the ``*_PRISM`` fields and ``Additional_Appraiser_Data``. The
+local pipeline and the ``appraiser_enrichment`` Cloud Run service share this code.
+While the OCPA circuit is open, cases are marked ``PENDING_UPSTREAM`` and re-queued
+once the host has been probed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import threading
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+import http_client
+from addresses import group_by_address, normalize_address, share_fields
+from parcel_index import get_index
+from payloads import APPRAISER_PATHS, APPRAISER_RAW_FIELD, compact_payload
+from settings import (
+    APPRAISER_CACHE_ENABLED,
+    APPRAISER_CACHE_TTL_DAYS,
+    APPRAISER_MAX_WORKERS,
+    ENRICHMENT_CACHE_PATH,
+    HTTP_TIMEOUT,
+    MANUAL_JSON_PATH,
+    OCPA_MAX_CONCURRENCY,
+)
+from ttl_cache import DAY, TTLCache, parse_ttl_overrides
+from utils import read_json, write_json
+
+OCPA_API_BASE_URL = "https://ocpa-mainsite-afd-standard.azurefd.net/api"
+SEARCH_BASE_URL = f"{OCPA_API_BASE_URL}/QuickSearch/GetSearchInfoByAddress"
+PARCEL_LINK_BASE_URL = "https://ocpaweb.ocpafl.org/parcelsearch/Parcel%20ID"
+
+# Fields written by the enrichment; copied verbatim to cases sharing a property.
+APPRAISER_FIELDS = (
+    "CountyDBName_PRISM",
+    "ParcelLink_PRISM",
+    "TaxID_PRISM",
+    "PropertyType_PRISM",
+    "LegalDescription_PRISM",
+    "Additional_Appraiser_Data",
+    APPRAISER_RAW_FIELD,
+    "AppraiserStatus",
+    "ParcelMatch",
+)
+# How the parcel was found: "index" (exact or prefix index match), "search" (the
+# OCPA search API, which also confirms fuzzy index matches) or "fuzzy" (a fuzzy
+# index match the API could not confirm, which may be a neighbouring property).
+PARCEL_MATCH_FIELD = "ParcelMatch"
+
+# Cache lifetimes per OCPA endpoint. Search results and GeneralInfo carry the owner
+# name, which changes on sale; tax and building data change at most once a year.
+APPRAISER_CACHE_TTLS = {
+    "Search": 30 * DAY,
+    "GeneralInfo": 30 * DAY,
+    "Stats": 180 * DAY,
+    "CertifiedTaxes": 365 * DAY,
+    "TotalTaxes": 365 * DAY,
+    "NonAdValorem": 365 * DAY,
+    "PropFeatBldg": 365 * DAY,
+    "PropFeatLandArea": 365 * DAY,
+    "PropFeatLegal": 365 * DAY,
+    **parse_ttl_overrides(APPRAISER_CACHE_TTL_DAYS),
+}
+# Addresses the search API does not know are retried after this long
+SEARCH_MISS_TTL = 1 * DAY
+
+_cache: TTLCache | None = None
+_cache_lock = threading.Lock()
+
+OCPA_HOST = urllib.parse.urlsplit(OCPA_API_BASE_URL).netloc
+http_client.configure_host(OCPA_HOST, max_concurrency=OCPA_MAX_CONCURRENCY)
+
+# Endpoint requests for all parcels share this pool; parcels run on their own pool
+# so a parcel waiting on its endpoints never starves the endpoint workers.
+_endpoint_pool = ThreadPoolExecutor(max_workers=OCPA_MAX_CONCURRENCY, thread_name_prefix="ocpa-endpoint")
+
+
+def generate_headers() -> dict:
+    """Return the browser-like headers the OCPA API expects."""
+    return {
+        "accept": "application/json, text/plain, */*",
+        "accept-encoding": "gzip, deflate",
+        "accept-language": "en-GB,en-US;q=0.9,en;q=0.8,no;q=0.7,sv;q=0.6",
+        "cache-control": "no-cache",
+        "expires": "Sat, 01 Jan 2000 00:00:00 GMT",
+        "origin": "https://ocpaweb.ocpafl.org",
+        "pragma": "no-cache",
+        "priority": "u=1, i",
+        "referer": "https://ocpaweb.ocpafl.org/",
+        "sec-ch-ua": '"Chromium";v="128", "Not;A=Brand";v="24", "Google Chrome";v="128"',
+        "sec-ch-ua-mobile": "?0",
+        "sec-ch-ua-platform": '"macOS"',
+        "sec-fetch-dest": "empty",
+        "sec-fetch-mode": "cors",
+        "sec-fetch-site": "cross-site",
+        "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36",
+        "x-user-key": str(uuid.uuid4()),
+    }
+
+
+# One header set (and x-user-key) per process rather than per entry
+OCPA_HEADERS = generate_headers()
+
+
+def parcel_id_to_tax_id(parcel_id) -> str:
+    """Convert an OCPA parcelId to a TaxID, reversing the first three segments."""
+    parcel_id_str = str(parcel_id)
+    segment1 = parcel_id_str[:2]
+    segment2 = parcel_id_str[2:4]
+    segment3 = parcel_id_str[4:6]
+    segment4 = parcel_id_str[6:10]
+    segment5 = parcel_id_str[10:12]
+    segment6 = parcel_id_str[12:]
+    return f"{segment3}-{segment2}-{segment1}-{segment4}-{segment5}-{segment6}"
+
+
+def build_urls(parcel_id) -> dict[str, str]:
+    """Return the parcel endpoints stored in ``Additional_Appraiser_Data``."""
+    return {
+        "GeneralInfo": f"{OCPA_API_BASE_URL}/PRC/GetPRCGeneralInfo?pid={parcel_id}",
+        "Stats": f"{OCPA_API_BASE_URL}/PRC/GetPRCStats?PID={parcel_id}",
+        "CertifiedTaxes": f"{OCPA_API_BASE_URL}/PRC/GetPRCCertifiedTaxes?PID={parcel_id}&TaxYear=0",
+        "TotalTaxes": f"{OCPA_API_BASE_URL}/PRC/GetPRCTotalTaxes?PID={parcel_id}&TaxYear=0",
+        "NonAdValorem": f"{OCPA_API_BASE_URL}/PRC/GetPRCNonAdValorem?PID={parcel_id}&TaxYear=0",
+        "PropFeatBldg": f"{OCPA_API_BASE_URL}/PRC/GetPRCPropFeatBldg?pid={parcel_id}&page=1&size=5",
+        "PropFeatLandArea": f"{OCPA_API_BASE_URL}/PRC/GetPRCPropFeatLandArea?pid={parcel_id}",
+    }
+
+
+def legal_description_url(parcel_id) -> str:
+    return f"{OCPA_API_BASE_URL}/PRC/GetPRCPropFeatLegal?pid={parcel_id}"
+
+
+def get_cache() -> TTLCache | None:
+    """Return the shared parcel cache, or None when caching is disabled."""
+    global _cache
+    if not APPRAISER_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = TTLCache(ENRICHMENT_CACHE_PATH, APPRAISER_CACHE_TTLS)
+        return _cache
+
+
+def fetch_data(url: str, headers: dict, timeout: float = HTTP_TIMEOUT):
+    """GET *url* and return the decoded JSON body, or None on any failure.
+
+    ``CircuitOpenError`` is raised rather than swallowed so the case can be deferred.
+    """
+    try:
+        response = http_client.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 200:
+            return response.json()
+        print(f"Failed to fetch data from {url}. Status Code: {response.status_code}")
+        return None
+    except http_client.CircuitOpenError:
+        raise
+    except (requests.RequestException, ValueError) as e:
+        print(f"Error fetching data from {url}: {e}")
+        return None
+
+
+def _query_search_api(address: str, headers: dict) -> tuple[bool, dict | None]:
+    encoded_address = urllib.parse.quote(address)
+    search_url = f"{SEARCH_BASE_URL}?address={encoded_address}&page=1&size=5&sortBy=ParcelID&sortDir=ASC"
+    search_data = fetch_data(search_url, headers)
+    if search_data is None:
+        return False, None
+    if isinstance(search_data, list) and search_data and "parcelId" in search_data[0]:
+        match = search_data[0]
+        return True, {"parcelId": match["parcelId"], "ownerName": match.get("ownerName")}
+    return True, None
+
+
+def _search(address: str, headers: dict) -> dict | None:
+    cache = get_cache()
+    if cache is None:
+        return _query_search_api(address, headers)[1]
+    return cache.get_or_fetch(
+        "Search",
+        normalize_address(address),
+        lambda: _query_search_api(address, headers),
+        negative_ttl=SEARCH_MISS_TTL,
+    )
+
+
+def search_address(address: str, headers: dict, zip_code=None, city: str | None = None) -> dict | None:
+    """Return the best OCPA match for *address* in *zip_code* / *city*.
+
+    The local parcel index is consulted first; the search API (through the cache)
+    handles addresses the index cannot resolve and confirms fuzzy index matches.
+    The result's ``match`` says how the parcel was found (see ``PARCEL_MATCH_FIELD``).
+    """
+    index = get_index()
+    fuzzy = None
+    if index is not None:
+        match = index.lookup(address, zip_code, city)
+        if match and match["match"] != "fuzzy":
+            return {"parcelId": match["parcelId"], "ownerName": match["ownerName"], "match": "index"}
+        fuzzy = match
+
+    result = _search(address, headers)
+    if fuzzy is not None and result is None:
+        print(f"Unconfirmed fuzzy parcel match for {address}: {fuzzy['parcelId']}")
+        return {"parcelId": fuzzy["parcelId"], "ownerName": fuzzy["ownerName"], "match": "fuzzy"}
+    if fuzzy is not None and str(result["parcelId"]) != str(fuzzy["parcelId"]):
+        print(f"Search API overrides fuzzy parcel match for {address}: {fuzzy['parcelId']} -> {result['parcelId']}")
+    if result is None:
+        print(f"No parcelId found for address: {address}")
+        return None
+    return {**result, "match": "search"}
+
+
+def fetch_endpoint(endpoint: str, parcel_id, url: str, headers: dict):
+    """Fetch one parcel endpoint, reading through the cache. Failures are not cached."""
+    cache = get_cache()
+    if cache is None:
+        return fetch_data(url, headers)
+
+    def fetch():
+        data = fetch_data(url, headers)
+        return data is not None, data
+
+    return cache.get_or_fetch(endpoint, str(parcel_id), fetch)
+
+
+def fetch_parcel_data(parcel_id, headers: dict) -> tuple[dict, dict | None]:
+    """Fetch every parcel endpoint concurrently.
+
+    Returns ``(additional_data, legal_description)``; endpoints that fail are left
+    out of *additional_data*.
+    """
+    futures = {
+        key: _endpoint_pool.submit(fetch_endpoint, key, parcel_id, url, headers)
+        for key, url in build_urls(parcel_id).items()
+    }
+    legal_future = _endpoint_pool.submit(
+        fetch_endpoint, "PropFeatLegal", parcel_id, legal_description_url(parcel_id), headers
+    )
+    additional_data = {}
+    for key, future in futures.items():
+        data = future.result()
+        if data:
+            additional_data[key] = data
+    return additional_data, legal_future.result()
+
+
+def apply_parcel_data(entry: dict, parcel_id, additional_data: dict, legal_info: dict | None) -> None:
+    entry["ParcelLink_PRISM"] = f"{PARCEL_LINK_BASE_URL}/{parcel_id}"
+    entry["TaxID_PRISM"] = parcel_id_to_tax_id(parcel_id)
+
+    general_info = additional_data.get("GeneralInfo")
+    if general_info and "dorCode" in general_info and "dorDescription" in general_info:
+        entry["PropertyType_PRISM"] = f"{general_info['dorCode']} - {general_info['dorDescription']}".strip()
+    if legal_info and "propertyDescription" in legal_info:
+        entry["LegalDescription_PRISM"] = legal_info["propertyDescription"].strip()
+
+    entry["Additional_Appraiser_Data"], entry[APPRAISER_RAW_FIELD] = compact_payload(
+        "appraiser", parcel_id, additional_data, APPRAISER_PATHS
+    )
+
+
+def enrich_entry(entry: dict, headers: dict) -> dict:
+    """Fill the appraiser fields of *entry* in place and return it."""
+    try:
+        return _enrich_entry(entry, headers)
+    except http_client.CircuitOpenError as exc:
+        print(f"Deferring {entry.get('CaseNumber_Foreclosure')}: {exc}")
+        entry["AppraiserStatus"] = http_client.PENDING_UPSTREAM
+        return entry
+
+
+def _enrich_entry(entry: dict, headers: dict) -> dict:
+    parcel_id = entry.get("parcelId")
+    if not parcel_id:
+        address = entry.get("Address_PRISM")
+        if not address:
+            entry["AppraiserStatus"] = "SKIPPED_MISSING_ADDRESS"
+            return entry
+        # OCPA gets the address as written; normalisation only keys the index and cache
+        search_data = search_address(address, headers, entry.get("AddressZip_PRISM"), entry.get("AddressCity_PRISM"))
+        if not search_data:
+            entry["AppraiserStatus"] = "NO_SEARCH_RESULT"
+            return entry
+        parcel_id = search_data["parcelId"]
+        entry[PARCEL_MATCH_FIELD] = search_data["match"]
+        owner_name = search_data.get("ownerName")
+        if owner_name:
+            entry["CountyDBName_PRISM"] = owner_name.strip()
+        print(f"Owner Name: {owner_name}, Parcel ID: {parcel_id}")
+
+    additional_data, legal_info = fetch_parcel_data(parcel_id, headers)
+    apply_parcel_data(entry, parcel_id, additional_data, legal_info)
+    entry["AppraiserStatus"] = "SUCCESS"
+    return entry
+
+
+def enrich_entries(entries: list[dict], max_workers: int = APPRAISER_MAX_WORKERS) -> list[dict]:
+    """Enrich *entries* in place, looking each distinct property up only once."""
+    headers = OCPA_HEADERS
+
+    def enrich_group(group: list[dict]) -> bool:
+        lead = enrich_entry(group[0], headers)
+        share_fields(lead, group[1:], APPRAISER_FIELDS)
+        return lead["AppraiserStatus"] == http_client.PENDING_UPSTREAM
+
+    work = group_by_address(entries)
+    print(f"Enriching {len(work)} unique properties for {len(entries)} cases")
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ocpa-parcel") as pool:
+
+        def run_round(groups: list[list[dict]]) -> list[list[dict]]:
+            deferred = pool.map(enrich_group, groups)
+            return [group for group, is_deferred in zip(groups, deferred) if is_deferred]
+
+        http_client.requeue_deferred(work, run_round)
+
+    cache = get_cache()
+    if cache is not None:
+        print(cache.format_stats())
+    index = get_index()
+    if index is not None:
+        print(f"Parcel index: {index.hits} hits, {index.misses} misses")
+    print(http_client.format_metrics())
+    return entries
+
+
+def warm_cache(entries: list[dict], max_workers: int = APPRAISER_MAX_WORKERS) -> None:
+    """Populate the cache for every address and parcel in *entries* without changing them."""
+    enrich_entries([dict(entry) for entry in entries], max_workers=max_workers)
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Enrich manual.json with Orange County appraiser data.")
+    subparsers = parser.add_subparsers(dest="command")
+    warm = subparsers.add_parser("warm", help="Fill the parcel cache from a JSON list of case records.")
+    warm.add_argument("source", nargs="?", default=str(MANUAL_JSON_PATH), help="Records to warm from.")
+    stats = subparsers.add_parser("stats", help="Show cumulative cache hit rates.")
+    stats.add_argument("--purge", action="store_true", help="Delete expired entries first.")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    if args.command in ("warm", "stats") and get_cache() is None:
+        raise SystemExit("The appraiser cache is disabled (PIPELINE_APPRAISER_CACHE=0).")
+    if args.command == "stats":
+        if args.purge:
+            print(f"Purged {get_cache().purge_expired()} expired entries")
+        print(get_cache().format_stats(cumulative=True))
+        return
+
+    source = Path(args.source) if args.command == "warm" else MANUAL_JSON_PATH
+    try:
+        data = read_json(source)
+    except Exception as exc:
+        print(f"Unable to read {source.name}: {exc}")
+        raise
+
+    if args.command == "warm":
+        warm_cache(data)
+        print(f"Cache warmed from {source}")
+        return
+
+    enrich_entries(data)
+    write_json(MANUAL_JSON_PATH, data, indent=4)
+    print("Script completed and manual.json updated with appraiser data.")
+
+
+__all__ = [
+    "APPRAISER_FIELDS",
+    "PARCEL_MATCH_FIELD",
+    "generate_headers",
+    "parcel_id_to_tax_id",
+    "build_urls",
+    "fetch_data",
+    "get_cache",
+    "search_address",
+    "fetch_endpoint",
+    "fetch_parcel_data",
+    "enrich_entry",
+    "enrich_entries",
+    "warm_cache",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 """Notify FileMaker that an import run has finished."""
 
-import requests
+import http_client
 
 from settings import FILEMAKER_BEARER_TOKEN, FILEMAKER_COUNTY_ID
 
@@ -21,7 +21,7 @@ def mark_import_finished(status: str = "In progress"):
     }
     headers = {"Authorization": f"Bearer {FILEMAKER_BEARER_TOKEN}"}
 
-    response = requests.get(URL, headers=headers, params=params)
+    response = http_client.get(URL, headers=headers, params=params)
     response.raise_for_status()
     print(response.text)
 
@@ -0,0 +1,113 @@
+"""Bulk Firestore writes shared by the local and Cloud Run uploaders.
+
+Documents are queued on a ``BulkWriter``, which batches them into parallel
+commits and ramps its rate up from ``FIRESTORE_INITIAL_OPS_PER_SECOND`` (the
+500/50/5 rule) to at most ``FIRESTORE_MAX_OPS_PER_SECOND``. Writes that fail
+with contention or transient errors are retried per document; the rest are
+reported at the end instead of stopping the upload.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+from google.cloud import firestore
+from google.cloud.firestore_v1.bulk_writer import BulkWriteFailure, BulkWriterOptions, SendMode
+
+from settings import (
+    FIRESTORE_INITIAL_OPS_PER_SECOND,
+    FIRESTORE_MAX_OPS_PER_SECOND,
+    FIRESTORE_MAX_RETRIES,
+    FIRESTORE_PARALLEL,
+)
+
+# gRPC codes worth retrying: DEADLINE_EXCEEDED, RESOURCE_EXHAUSTED, ABORTED
+# (contention), INTERNAL, UNAVAILABLE
+RETRYABLE_CODES = frozenset({4, 8, 10, 13, 14})
+
+
+class UploadReport:
+    """Outcome of one bulk upload; *failed* maps document id to its last error."""
+
+    def __init__(self) -> None:
+        self.written = 0
+        self.skipped = 0
+        self.retried = 0
+        self.failed: dict[str, str] = {}
+        self.seconds = 0.0
+
+    def format(self) -> str:
+        rate = self.written / self.seconds if self.seconds else 0.0
+        lines = [
+            f"Wrote {self.written} documents in {self.seconds:.1f}s ({rate:.0f}/s), "
+            f"{self.skipped} unchanged, {self.retried} retries, {len(self.failed)} failures"
+        ]
+        lines.extend(f"  {doc_id}: {error}" for doc_id, error in sorted(self.failed.items()))
+        return "\n".join(lines)
+
+
+def bulk_set(
+    db: firestore.Client,
+    collection: str,
+    documents: dict[str, dict],
+    *,
+    merge: bool = False,
+    parallel: bool = FIRESTORE_PARALLEL,
+    max_retries: int = FIRESTORE_MAX_RETRIES,
+) -> UploadReport:
+    """Write *documents* (document id -> data) to *collection* and report the outcome."""
+    return bulk_write(db, collection, sets=documents, merge=merge, parallel=parallel, max_retries=max_retries)
+
+
+def bulk_write(
+    db: firestore.Client,
+    collection: str,
+    *,
+    sets: dict[str, dict] | None = None,
+    updates: dict[str, dict] | None = None,
+    merge: bool = False,
+    parallel: bool = FIRESTORE_PARALLEL,
+    max_retries: int = FIRESTORE_MAX_RETRIES,
+) -> UploadReport:
+    """Replace the *sets* documents and apply field *updates* to existing ones.
+
+    Keys of an *updates* entry are field paths; only those fields are written.
+    """
+    report = UploadReport()
+    lock = threading.Lock()
+    options = BulkWriterOptions(
+        initial_ops_per_second=FIRESTORE_INITIAL_OPS_PER_SECOND,
+        max_ops_per_second=FIRESTORE_MAX_OPS_PER_SECOND,
+        mode=SendMode.parallel if parallel else SendMode.serial,
+    )
+    writer = db.bulk_writer(options=options)
+
+    def on_result(reference, result, bulk_writer) -> None:
+        with lock:
+            report.written += 1
+
+    def on_error(error: BulkWriteFailure, bulk_writer) -> bool:
+        retry = error.code in RETRYABLE_CODES and error.attempts < max_retries
+        with lock:
+            if retry:
+                report.retried += 1
+            else:
+                report.failed[error.operation.reference.id] = f"code {error.code}: {error.message}"
+        return retry
+
+    writer.on_write_result(on_result)
+    writer.on_write_error(on_error)
+
+    start = time.monotonic()
+    collection_ref = db.collection(collection)
+    for doc_id, data in (sets or {}).items():
+        writer.set(collection_ref.document(doc_id), data, merge=merge)
+    for doc_id, fields in (updates or {}).items():
+        writer.update(collection_ref.document(doc_id), fields)
+    writer.close()
+    report.seconds = time.monotonic() - start
+    return report
+
+
+__all__ = ["RETRYABLE_CODES", "UploadReport", "bulk_set", "bulk_write"]
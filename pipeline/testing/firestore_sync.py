@@ -0,0 +1,178 @@
+"""Delta sync of case records to Firestore.
+
+Every record is hashed (canonical JSON, SHA-256) as a whole and field by field.
+The index of what was last written, document id -> hashes, is kept in a local
+JSON file, and the whole-record hash is also stored on the document in
+``_contentHash`` so the index can be rebuilt from Firestore. Unchanged records
+are skipped. A changed record whose previous field hashes are known is sent as a
+field-mask update of just the fields that differ, which also leaves fields added
+by other writers (such as ``RECORD_ID``) in place. Other records are written whole,
+carrying the ``RECORD_ID`` the document already has or a newly generated one.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import uuid
+from pathlib import Path
+
+from google.cloud import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+
+from firestore_bulk import UploadReport, bulk_write
+from utils import read_json, write_json
+
+HASH_FIELD = "_contentHash"
+RECORD_ID_FIELD = "RECORD_ID"
+# Document reads per get_all request when looking up existing record ids
+RECORD_ID_LOOKUP_BATCH = 300
+
+
+def generate_record_id() -> str:
+    return str(uuid.uuid4()).upper()
+
+
+def existing_record_ids(db: firestore.Client, collection: str, doc_ids) -> dict[str, str]:
+    """Return the ``RECORD_ID`` of each of *doc_ids* that exists and has one."""
+    collection_ref = db.collection(collection)
+    doc_ids = list(doc_ids)
+    found = {}
+    for start in range(0, len(doc_ids), RECORD_ID_LOOKUP_BATCH):
+        refs = [collection_ref.document(doc_id) for doc_id in doc_ids[start : start + RECORD_ID_LOOKUP_BATCH]]
+        for snapshot in db.get_all(refs, field_paths=[RECORD_ID_FIELD]):
+            record_id = snapshot.exists and (snapshot.to_dict() or {}).get(RECORD_ID_FIELD)
+            if record_id:
+                found[snapshot.id] = record_id
+    return found
+
+
+def assign_record_ids(db: firestore.Client, collection: str, documents: dict[str, dict]) -> int:
+    """Give every document in *documents* a ``RECORD_ID``, keeping ids already issued.
+
+    Ids on the records themselves win, then ids stored in Firestore; the rest are
+    generated. Returns the number of new ids.
+    """
+    missing = [doc_id for doc_id, data in documents.items() if not data.get(RECORD_ID_FIELD)]
+    stored = existing_record_ids(db, collection, missing) if missing else {}
+    for doc_id in missing:
+        documents[doc_id][RECORD_ID_FIELD] = stored.get(doc_id) or generate_record_id()
+    return len(missing) - len(stored)
+
+
+def content_hash(value) -> str:
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def record_hashes(record: dict) -> tuple[str, dict[str, str]]:
+    """Return ``(record_hash, {field: field_hash})``, ignoring the stored hash field."""
+    fields = {field: content_hash(value) for field, value in record.items() if field != HASH_FIELD}
+    return content_hash(sorted(fields.items())), fields
+
+
+class SyncIndex:
+    """Hashes of the documents last written, persisted as JSON at *path*."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        try:
+            self.entries: dict[str, dict] = read_json(self.path)
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def get(self, doc_id: str) -> dict | None:
+        return self.entries.get(doc_id)
+
+    def record(self, doc_id: str, record_hash: str, field_hashes: dict[str, str] | None) -> None:
+        self.entries[doc_id] = {"hash": record_hash, "fields": field_hashes}
+
+    def rebuild(self, db: firestore.Client, collection: str) -> int:
+        """Replace the index with the hashes stored on the documents themselves."""
+        self.entries = {}
+        for snapshot in db.collection(collection).select([HASH_FIELD]).stream():
+            stored = (snapshot.to_dict() or {}).get(HASH_FIELD)
+            if stored:
+                self.record(snapshot.id, stored, None)
+        return len(self.entries)
+
+    def save(self) -> None:
+        write_json(self.path, self.entries, indent=None)
+
+
+def plan_sync(records: dict[str, dict], index: SyncIndex) -> tuple[dict, dict, dict]:
+    """Split *records* into full writes, field updates and their new hashes.
+
+    Returns ``(sets, updates, hashes)``; documents absent from both *sets* and
+    *updates* are unchanged.
+    """
+    sets: dict[str, dict] = {}
+    updates: dict[str, dict] = {}
+    hashes: dict[str, tuple[str, dict]] = {}
+    for doc_id, record in records.items():
+        record_hash, field_hashes = record_hashes(record)
+        previous = index.get(doc_id)
+        if previous and previous["hash"] == record_hash:
+            continue
+        hashes[doc_id] = (record_hash, field_hashes)
+        old_fields = previous.get("fields") if previous else None
+        if not old_fields:
+            sets[doc_id] = {**record, HASH_FIELD: record_hash}
+            continue
+        changed = {
+            FieldPath(field).to_api_repr(): record[field]
+            for field, field_hash in field_hashes.items()
+            if old_fields.get(field) != field_hash
+        }
+        removed = {
+            FieldPath(field).to_api_repr(): firestore.DELETE_FIELD
+            for field in old_fields.keys() - field_hashes.keys()
+        }
+        updates[doc_id] = {**changed, **removed, HASH_FIELD: record_hash}
+    return sets, updates, hashes
+
+
+def delta_sync(
+    db: firestore.Client,
+    collection: str,
+    records: dict[str, dict],
+    index: SyncIndex,
+    *,
+    full: bool = False,
+) -> UploadReport:
+    """Write only the new and changed *records* and update *index* for those that succeed.
+
+    With *full* every record is written whole, which also resets the index.
+    """
+    if full:
+        index.entries = {}
+    sets, updates, hashes = plan_sync(records, index)
+    unchanged = len(records) - len(hashes)
+    print(f"Delta sync: {len(sets)} full writes, {len(updates)} field updates, {unchanged} unchanged")
+    new_ids = assign_record_ids(db, collection, sets)
+    if new_ids:
+        print(f"Assigned {new_ids} new RECORD_IDs")
+    report = bulk_write(db, collection, sets=sets, updates=updates)
+    report.skipped = unchanged
+    for doc_id, (record_hash, field_hashes) in hashes.items():
+        if doc_id not in report.failed:
+            index.record(doc_id, record_hash, field_hashes)
+        elif doc_id in updates:
+            # The document may be gone; write it whole next time
+            index.entries.pop(doc_id, None)
+    index.save()
+    return report
+
+
+__all__ = [
+    "HASH_FIELD",
+    "RECORD_ID_FIELD",
+    "generate_record_id",
+    "existing_record_ids",
+    "assign_record_ids",
+    "content_hash",
+    "record_hashes",
+    "SyncIndex",
+    "plan_sync",
+    "delta_sync",
+]
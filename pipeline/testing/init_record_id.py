@@ -1,31 +1,98 @@
-"""Assign RECORD_ID fields to Firestore documents that do not have one."""
+"""Backfill RECORD_ID on Firestore documents uploaded before ids were assigned at write time.
 
+New documents get their RECORD_ID from the uploaders (see ``firestore_sync``).
+This script walks one collection in document-id order, a page at a time, and
+writes the missing ids with the bulk writer. The id of the last finished page is
+saved after every page, so an interrupted backfill resumes where it stopped.
+"""
+
+import argparse
 import os
-import uuid
+import sys
 
 from google.cloud import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
 
-from settings import SERVICE_ACCOUNT_PATH
+from firestore_bulk import bulk_write
+from firestore_sync import RECORD_ID_FIELD, generate_record_id
+from settings import FIRESTORE_COLLECTION, LOCAL_DIR, SERVICE_ACCOUNT_PATH
+from utils import read_json, write_json
 
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(SERVICE_ACCOUNT_PATH)
 
+CURSOR_PATH = LOCAL_DIR / "record_id_backfill_cursor.json"
+DEFAULT_PAGE_SIZE = 500
+
+
+def load_cursor(collection):
+    try:
+        return read_json(CURSOR_PATH).get(collection)
+    except (FileNotFoundError, ValueError):
+        return None
 
-def generate_record_id() -> str:
-    return str(uuid.uuid4()).upper()
 
+def save_cursor(collection, doc_id):
+    try:
+        cursors = read_json(CURSOR_PATH)
+    except (FileNotFoundError, ValueError):
+        cursors = {}
+    if doc_id is None:
+        cursors.pop(collection, None)
+    else:
+        cursors[collection] = doc_id
+    write_json(CURSOR_PATH, cursors, indent=2)
 
-def assign_record_ids():
+
+def assign_record_ids(collection=FIRESTORE_COLLECTION, page_size=DEFAULT_PAGE_SIZE, resume=True):
+    """Give every document of *collection* without a RECORD_ID a new one."""
     db = firestore.Client()
-    collections = db.collections()
-    for collection in collections:
-        for doc in collection.stream():
-            doc_data = doc.to_dict()
-            if "RECORD_ID" not in doc_data:
-                record_id = generate_record_id()
-                doc.reference.update({"RECORD_ID": record_id})
-                print(f"Assigned RECORD_ID {record_id} to document {doc.id}")
+    collection_ref = db.collection(collection)
+    cursor = load_cursor(collection) if resume else None
+    if cursor:
+        print(f"Resuming {collection} after document {cursor}")
+
+    scanned = assigned = 0
+    while True:
+        query = collection_ref.select([RECORD_ID_FIELD]).order_by(FieldPath.document_id()).limit(page_size)
+        if cursor:
+            query = query.start_after({FieldPath.document_id(): collection_ref.document(cursor)})
+        page = list(query.stream())
+        if not page:
+            break
+
+        updates = {
+            snapshot.id: {RECORD_ID_FIELD: generate_record_id()}
+            for snapshot in page
+            if not (snapshot.to_dict() or {}).get(RECORD_ID_FIELD)
+        }
+        if updates:
+            report = bulk_write(db, collection, updates=updates)
+            if report.failed:
+                print(report.format())
+                raise RuntimeError(f"{len(report.failed)} RECORD_ID updates failed; rerun to resume")
+        scanned += len(page)
+        assigned += len(updates)
+        cursor = page[-1].id
+        save_cursor(collection, cursor)
+        print(f"Scanned {scanned} documents, assigned {assigned} RECORD_IDs (cursor {cursor})")
+
+    save_cursor(collection, None)
+    return assigned
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Backfill RECORD_ID on one Firestore collection.")
+    parser.add_argument("--collection", default=FIRESTORE_COLLECTION)
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument("--restart", action="store_true", help="Ignore the saved cursor and start from the beginning.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    assigned = assign_record_ids(args.collection, args.page_size, resume=not args.restart)
+    print(f"Finished assigning {assigned} RECORD_IDs in {args.collection}.")
 
 
 if __name__ == "__main__":
-    assign_record_ids()
-    print("Finished assigning RECORD_IDs to all documents without one.")
+    main()
@@ -1,26 +1,58 @@
-"""Upload the aggregated manual.json records into Firestore."""
+"""Upload the aggregated manual.json records into Firestore.
+
+Only records that changed since the last upload are written (see
+``firestore_sync``); ``--full`` rewrites every record.
+"""
+
+import argparse
+import sys
 
 from google.cloud import firestore
 
-from settings import SERVICE_ACCOUNT_PATH, MANUAL_JSON_PATH
+from firestore_sync import SyncIndex, delta_sync
+from settings import FIRESTORE_COLLECTION, FIRESTORE_SYNC_INDEX_PATH, SERVICE_ACCOUNT_PATH, MANUAL_JSON_PATH
 from utils import read_json
 
 
-def upload_documents_to_firestore(documents):
-    collection_name = "data_from_oc_records_search"
+def upload_documents_to_firestore(documents, full=False, rebuild_index=False):
     db = firestore.Client.from_service_account_json(str(SERVICE_ACCOUNT_PATH))
+    index = SyncIndex(FIRESTORE_SYNC_INDEX_PATH)
+    if rebuild_index:
+        print(f"Rebuilt sync index with {index.rebuild(db, FIRESTORE_COLLECTION)} documents")
+    report = delta_sync(
+        db,
+        FIRESTORE_COLLECTION,
+        {document["CaseNumber_Foreclosure"]: document for document in documents},
+        index,
+        full=full,
+    )
+    print(report.format())
+    return report
 
-    for document in documents:
-        case_number = document["CaseNumber_Foreclosure"]
-        db.collection(collection_name).document(case_number).set(document)
-        print(f"Document {case_number} uploaded successfully")
 
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Upload manual.json records into Firestore.")
+    parser.add_argument("--full", action="store_true", help="Rewrite every record, not only changed ones.")
+    parser.add_argument(
+        "--rebuild-index",
+        action="store_true",
+        help="Reload the sync index from the hashes stored in Firestore first.",
+    )
+    return parser.parse_args(argv)
 
-if __name__ == "__main__":
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
     try:
         documents = read_json(MANUAL_JSON_PATH)
-        upload_documents_to_firestore(documents)
+        report = upload_documents_to_firestore(documents, full=args.full, rebuild_index=args.rebuild_index)
+        if report.failed:
+            raise RuntimeError(f"{len(report.failed)} documents failed to upload")
         print("Documents uploaded successfully")
     except Exception as exc:
         print(f"Document upload failed: {exc}")
         raise
+
+
+if __name__ == "__main__":
+    main()
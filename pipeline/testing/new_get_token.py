@@ -1,6 +1,6 @@
 """Obtain a FileMaker session token using the configured Basic auth credentials."""
 
-import requests
+import http_client
 
 from settings import FILEMAKER_BASIC_AUTH
 
@@ -16,7 +16,7 @@ def request_token():
         "Content-Type": "application/json",
     }
 
-    response = requests.post(URL, headers=headers, json={})
+    response = http_client.post(URL, headers=headers, json={})
     response.raise_for_status()
     print(response.text)
 
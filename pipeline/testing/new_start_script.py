@@ -1,6 +1,6 @@
 """Notify FileMaker that an import run has started."""
 
-import requests
+import http_client
 
 from settings import FILEMAKER_BEARER_TOKEN, FILEMAKER_COUNTY_ID
 
@@ -24,7 +24,7 @@ def mark_import_started(status: str = "In progress"):
         "Authorization": f"Bearer {FILEMAKER_BEARER_TOKEN}",
     }
 
-    response = requests.get(URL, headers=headers, params=params)
+    response = http_client.get(URL, headers=headers, params=params)
     response.raise_for_status()
     print(response.text)
 
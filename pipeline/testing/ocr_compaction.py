@@ -0,0 +1,237 @@
+"""Shrink OCR text before it is embedded in a prompt.
+
+The Complaint and Value of Real Property OCR output carries a lot of text the model
+does not need: repeated page headers, certificate-of-service and ADA boilerplate,
+duplicated pages from re-run OCR and stray recognition noise. ``compact_text``
+removes those and can optionally keep only the paragraphs most relevant to the
+fields the prompt asks for, within a token budget.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from collections import Counter
+
+# Bump when the compaction logic changes in a way ``rules_fingerprint`` does not
+# show, e.g. how ``fit_to_budget`` ranks paragraphs.
+COMPACTION_VERSION = "1"
+
+# Rough characters-per-token ratio for English legal text; good enough for budgeting.
+CHARS_PER_TOKEN = 4
+
+# A line repeated this many times across a document is treated as a page header or
+# footer and dropped after its first occurrence.
+REPEATED_LINE_THRESHOLD = 3
+REPEATED_LINE_MAX_LENGTH = 80
+
+# Lines at least this long are sentences, so an exact repeat is a duplicated passage.
+DUPLICATE_LINE_MIN_LENGTH = 40
+
+# Paragraphs opening with any of these are dropped entirely. The patterns are
+# anchored to the start of the paragraph so that pleadings which merely quote a
+# phrase (say, a debt-collection notice inside the allegations) are kept.
+BOILERPLATE_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE | re.DOTALL)
+    for pattern in (
+        r"^\s*certificate of service\b",
+        r"^\s*i hereby certify that a true and correct copy\b",
+        r"^\s*(americans with disabilities act\W*)?if you are a person with a disability who needs any accommodation\b",
+        r"^\s*this communication is from a debt collector\b",
+        r"^\s*this is an attempt to collect a debt\b",
+        r"^\s*designation of (primary )?e-?mail address",
+        r"^\s*pursuant to fla\. r\. jud\. admin\. 2\.516\b",
+        r"^\s*notice pursuant to the fair debt collection practices act\b",
+    )
+]
+
+# Lines carrying these prefixes are per-page e-filing stamps.
+PAGE_STAMP_PATTERN = re.compile(
+    r"^(filed|e-?filed)\b.*\b(clerk|tiffany moore russell)\b|^page \d+ of \d+$",
+    re.IGNORECASE,
+)
+
+EXHIBIT_PATTERN = re.compile(r"^\s*exhibit\s+[\"'“]?[a-z0-9]{1,3}[\"'”]?\s*$", re.IGNORECASE)
+
+# Terms that mark a paragraph as useful for the fields in the prompt template.
+FIELD_KEYWORDS = {
+    "property": 3,
+    "address": 3,
+    "located at": 4,
+    "lot": 2,
+    "block": 2,
+    "plat book": 3,
+    "legal description": 4,
+    "defendant": 2,
+    "plaintiff": 2,
+    "association": 2,
+    "homeowners": 2,
+    "bank": 2,
+    "mortgage": 2,
+    "lien": 2,
+    "foreclos": 3,
+    "deceased": 3,
+    "estate of": 3,
+    "the late": 3,
+    "heirs": 2,
+    "value": 2,
+    "claim": 2,
+    "total": 1,
+    "florida": 1,
+    "orange county": 1,
+    "timeshare": 2,
+    "quiet title": 2,
+    "partition": 2,
+    "commercial": 2,
+    "$": 1,
+}
+
+# The opening paragraphs hold the style of the case and the parties.
+LEADING_PARAGRAPHS_KEPT = 3
+
+
+def rules_fingerprint() -> str:
+    """Hash of the compaction rules, so prompts are rebuilt when any of them change."""
+    rules = {
+        "version": COMPACTION_VERSION,
+        "chars_per_token": CHARS_PER_TOKEN,
+        "repeated_line": [REPEATED_LINE_THRESHOLD, REPEATED_LINE_MAX_LENGTH],
+        "duplicate_line_min_length": DUPLICATE_LINE_MIN_LENGTH,
+        "boilerplate": [pattern.pattern for pattern in BOILERPLATE_PATTERNS],
+        "page_stamp": PAGE_STAMP_PATTERN.pattern,
+        "exhibit": EXHIBIT_PATTERN.pattern,
+        "field_keywords": FIELD_KEYWORDS,
+        "leading_paragraphs_kept": LEADING_PARAGRAPHS_KEPT,
+    }
+    return hashlib.sha256(json.dumps(rules, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+
+def normalize_whitespace(text: str) -> str:
+    """Collapse runs of spaces, strip line ends and squeeze blank lines."""
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    lines = [re.sub(r"[ \t ]+", " ", line).strip() for line in text.split("\n")]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def is_noise(line: str) -> bool:
+    """Return True for OCR debris: lines with almost no letters or digits."""
+    if not line:
+        return False
+    alnum = sum(ch.isalnum() for ch in line)
+    return alnum < 2 or alnum / len(line) < 0.3
+
+
+def _drop_repeated_lines(lines: list[str]) -> list[str]:
+    counts = Counter(line for line in lines if line and len(line) <= REPEATED_LINE_MAX_LENGTH)
+    repeated = {line for line, count in counts.items() if count >= REPEATED_LINE_THRESHOLD}
+    seen: set[str] = set()
+    kept = []
+    for line in lines:
+        if line in repeated or len(line) >= DUPLICATE_LINE_MIN_LENGTH:
+            if line in seen:
+                continue
+            seen.add(line)
+        kept.append(line)
+    return kept
+
+
+def split_paragraphs(text: str) -> list[str]:
+    return [paragraph for paragraph in text.split("\n\n") if paragraph.strip()]
+
+
+def _dedupe_key(paragraph: str) -> str:
+    return re.sub(r"\W+", "", paragraph).lower()
+
+
+def score_paragraph(paragraph: str) -> int:
+    lowered = paragraph.lower()
+    return sum(weight * lowered.count(term) for term, weight in FIELD_KEYWORDS.items())
+
+
+def fit_to_budget(paragraphs: list[str], token_budget: int) -> list[str]:
+    """Keep the most relevant paragraphs that fit in *token_budget*, in original order."""
+    leading = list(range(min(LEADING_PARAGRAPHS_KEPT, len(paragraphs))))
+    ranked = sorted(
+        range(LEADING_PARAGRAPHS_KEPT, len(paragraphs)),
+        key=lambda index: score_paragraph(paragraphs[index]),
+        reverse=True,
+    )
+    chosen: set[int] = set()
+    used = 0
+    for index in leading + ranked:
+        cost = estimate_tokens(paragraphs[index]) + 1
+        if used + cost > token_budget:
+            continue
+        chosen.add(index)
+        used += cost
+    return [paragraphs[index] for index in sorted(chosen)]
+
+
+def compact_text(text: str, *, token_budget: int | None = None, drop_exhibits: bool = False) -> str:
+    """Return a compacted copy of OCR *text*.
+
+    Pages (separated by form feeds when present) and paragraphs that are exact
+    repeats of earlier ones are removed, as are boilerplate blocks, page stamps,
+    repeated header lines and OCR noise. With *drop_exhibits* everything after the
+    first exhibit cover page is discarded. With *token_budget* the remaining
+    paragraphs are ranked by relevance and trimmed to fit.
+    """
+    pages = []
+    seen_pages: set[str] = set()
+    for page in text.split("\f"):
+        key = _dedupe_key(page)
+        if key and key not in seen_pages:
+            seen_pages.add(key)
+            pages.append(page)
+
+    lines = normalize_whitespace("\n\n".join(pages)).split("\n")
+    lines = [line for line in lines if not PAGE_STAMP_PATTERN.search(line) and not is_noise(line)]
+    lines = _drop_repeated_lines(lines)
+    if drop_exhibits:
+        for index, line in enumerate(lines):
+            if EXHIBIT_PATTERN.match(line):
+                lines = lines[:index]
+                break
+
+    paragraphs = []
+    seen_paragraphs: set[str] = set()
+    for paragraph in split_paragraphs(re.sub(r"\n{3,}", "\n\n", "\n".join(lines))):
+        key = _dedupe_key(paragraph)
+        if key in seen_paragraphs or any(pattern.match(paragraph) for pattern in BOILERPLATE_PATTERNS):
+            continue
+        seen_paragraphs.add(key)
+        paragraphs.append(paragraph.strip())
+
+    if token_budget is not None:
+        paragraphs = fit_to_budget(paragraphs, token_budget)
+    return "\n\n".join(paragraphs)
+
+
+def format_report(rows: list[dict]) -> str:
+    """Render per-case byte savings produced by the prompt builder."""
+    if not rows:
+        return "No prompts compacted."
+    lines = [f"{'case':<24} {'before':>9} {'after':>9} {'saved':>7}"]
+    for row in rows:
+        saved = 1 - row["after"] / row["before"] if row["before"] else 0
+        lines.append(f"{row['case']:<24} {row['before']:>9} {row['after']:>9} {saved:>7.1%}")
+    before = sum(row["before"] for row in rows)
+    after = sum(row["after"] for row in rows)
+    lines.append(f"{'total':<24} {before:>9} {after:>9} {(1 - after / before) if before else 0:>7.1%}")
+    return "\n".join(lines)
+
+
+__all__ = [
+    "COMPACTION_VERSION",
+    "rules_fingerprint",
+    "estimate_tokens",
+    "normalize_whitespace",
+    "compact_text",
+    "fit_to_budget",
+    "format_report",
+]
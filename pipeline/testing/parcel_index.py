@@ -0,0 +1,269 @@
+"""Local index of Orange County parcels built from the appraiser's bulk extract.
+
+Resolving an address against this index is a single indexed SQLite lookup, so the
+enrichment only falls back to the live ``GetSearchInfoByAddress`` API on a miss.
+Lookups try an exact match on the normalised situs address, then a prefix match,
+then, to absorb OCR-garbled digits, the one parcel on the same street in the same
+ZIP code (or city) whose street number is a single edit away. A fuzzy match may
+be a neighbouring property, so it is reported as such for the caller to confirm.
+Anything less certain falls through to the live API.
+
+Build or refresh the index with::
+
+    python parcel_index.py import parcels.csv --parcel-column PARCEL_ID \\
+        --address-column SITUS --owner-column OWNER --dor-column DOR_CODE \\
+        --zip-column SITUS_ZIP --city-column SITUS_CITY
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+from addresses import normalize_address, normalize_zip, split_street_number
+from settings import PARCEL_INDEX_PATH
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parcels (
+    address TEXT NOT NULL,
+    street TEXT NOT NULL,
+    street_number TEXT NOT NULL,
+    situs TEXT NOT NULL,
+    parcel_id TEXT NOT NULL,
+    owner_name TEXT,
+    dor_code TEXT,
+    zip_code TEXT,
+    city TEXT
+);
+CREATE INDEX IF NOT EXISTS parcels_address ON parcels (address);
+CREATE INDEX IF NOT EXISTS parcels_street ON parcels (street);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+# Largest street-number edit distance accepted by the fuzzy match
+MAX_NUMBER_DISTANCE = 1
+# Columns added after the first release, with their types
+_ADDED_COLUMNS = {"zip_code": "TEXT", "city": "TEXT"}
+
+# Maximum candidates returned by a prefix match before it is considered ambiguous
+MAX_PREFIX_CANDIDATES = 1
+
+
+def _normalize_city(city) -> str | None:
+    return " ".join(str(city or "").upper().split()) or None
+
+
+def _edit_distance(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+class ParcelIndex:
+    """Read/write access to the SQLite parcel index at *path*."""
+
+    def __init__(self, path: Path = PARCEL_INDEX_PATH) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(parcels)")}
+        for column, column_type in _ADDED_COLUMNS.items():
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE parcels ADD COLUMN {column} {column_type}")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM parcels").fetchone()[0]
+
+    def import_rows(
+        self,
+        rows,
+        *,
+        parcel_column: str,
+        address_column: str,
+        owner_column: str,
+        dor_column: str,
+        zip_column: str | None = None,
+        city_column: str | None = None,
+    ) -> int:
+        """Replace the index contents with parcels from *rows* (dicts keyed by column)."""
+        records = []
+        for row in rows:
+            situs = (row.get(address_column) or "").strip()
+            parcel_id = (row.get(parcel_column) or "").strip()
+            if not situs or not parcel_id:
+                continue
+            address = normalize_address(situs)
+            street_number, street = split_street_number(address)
+            records.append(
+                (
+                    address,
+                    street,
+                    street_number,
+                    situs,
+                    parcel_id,
+                    (row.get(owner_column) or "").strip() or None,
+                    (row.get(dor_column) or "").strip() or None,
+                    normalize_zip(row.get(zip_column)) if zip_column else None,
+                    _normalize_city(row.get(city_column)) if city_column else None,
+                )
+            )
+        with self._lock:
+            self._conn.execute("DELETE FROM parcels")
+            self._conn.executemany(
+                "INSERT INTO parcels (address, street, street_number, situs, parcel_id, owner_name, dor_code, "
+                "zip_code, city) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                records,
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('imported_at', ?)", (time.strftime("%Y-%m-%dT%H:%M:%S"),)
+            )
+            self._conn.commit()
+        return len(records)
+
+    def reindex(self) -> int:
+        """Recompute normalised keys from the stored situs addresses."""
+        with self._lock:
+            rows = self._conn.execute("SELECT rowid, situs FROM parcels").fetchall()
+            updates = []
+            for rowid, situs in rows:
+                address = normalize_address(situs)
+                street_number, street = split_street_number(address)
+                updates.append((address, street, street_number, rowid))
+            self._conn.executemany(
+                "UPDATE parcels SET address = ?, street = ?, street_number = ? WHERE rowid = ?", updates
+            )
+            self._conn.commit()
+        return len(updates)
+
+    def _rows(self, query: str, params: tuple) -> list[tuple]:
+        with self._lock:
+            return self._conn.execute(query, params).fetchall()
+
+    def lookup(self, address: str, zip_code=None, city: str | None = None) -> dict | None:
+        """Return ``{"parcelId", "ownerName", "dorCode", "match"}`` for *address*, or None.
+
+        ``match`` is ``"exact"``, ``"prefix"`` or ``"fuzzy"``. The street-number
+        fuzzy match needs the *zip_code* or *city* of the address; without them
+        only exact and prefix matches are tried.
+        """
+        key = normalize_address(address)
+        columns = "parcel_id, owner_name, dor_code, street_number"
+        match = "exact"
+        rows = self._rows(f"SELECT {columns} FROM parcels WHERE address = ? LIMIT 2", (key,))
+        if len(rows) != 1:
+            # Prefix match: the extract may carry a unit or suffix the record lacks
+            match = "prefix"
+            rows = self._rows(
+                f"SELECT {columns} FROM parcels WHERE address >= ? AND address < ? LIMIT ?",
+                (key + " ", key + " \uffff", MAX_PREFIX_CANDIDATES + 1),
+            )
+        if len(rows) != 1:
+            match = "fuzzy"
+            rows = self._closest_number(key, columns, normalize_zip(zip_code), _normalize_city(city))
+
+        if len(rows) != 1:
+            self.misses += 1
+            return None
+        self.hits += 1
+        parcel_id, owner_name, dor_code, _ = rows[0]
+        return {"parcelId": parcel_id, "ownerName": owner_name, "dorCode": dor_code, "match": match}
+
+    def _closest_number(self, key: str, columns: str, zip_code: str | None, city: str | None) -> list[tuple]:
+        """Parcels on the same street and in the same ZIP (or city) one number edit away."""
+        street_number, street = split_street_number(key)
+        if not street_number or not (zip_code or city):
+            return []
+        locality, value = ("zip_code", zip_code) if zip_code else ("city", city)
+        candidates = self._rows(
+            f"SELECT {columns} FROM parcels WHERE street = ? AND {locality} = ?", (street, value)
+        )
+        return [row for row in candidates if _edit_distance(street_number, row[3]) <= MAX_NUMBER_DISTANCE]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_index: ParcelIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> ParcelIndex | None:
+    """Return the shared index, or None when no index has been imported."""
+    global _index
+    if not PARCEL_INDEX_PATH.exists():
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = ParcelIndex(PARCEL_INDEX_PATH)
+        return _index
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Manage the local OCPA parcel index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    importer = subparsers.add_parser("import", help="Load a county parcel extract (CSV).")
+    importer.add_argument("source", type=Path)
+    importer.add_argument("--delimiter", default=",")
+    importer.add_argument("--parcel-column", default="PARCEL_ID")
+    importer.add_argument("--address-column", default="SITUS_ADDRESS")
+    importer.add_argument("--owner-column", default="OWNER_NAME")
+    importer.add_argument("--dor-column", default="DOR_CODE")
+    importer.add_argument("--zip-column", default="SITUS_ZIP")
+    importer.add_argument("--city-column", default="SITUS_CITY")
+
+    subparsers.add_parser("reindex", help="Recompute keys after the address normaliser changes.")
+
+    lookup = subparsers.add_parser("lookup", help="Resolve addresses against the index.")
+    lookup.add_argument("addresses", nargs="+")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    index = ParcelIndex(PARCEL_INDEX_PATH)
+
+    if args.command == "import":
+        with args.source.open("r", encoding="utf-8-sig", newline="") as fh:
+            count = index.import_rows(
+                csv.DictReader(fh, delimiter=args.delimiter),
+                parcel_column=args.parcel_column,
+                address_column=args.address_column,
+                owner_column=args.owner_column,
+                dor_column=args.dor_column,
+                zip_column=args.zip_column,
+                city_column=args.city_column,
+            )
+        print(f"Imported {count} parcels into {PARCEL_INDEX_PATH}")
+    elif args.command == "reindex":
+        print(f"Reindexed {index.reindex()} parcels")
+    else:
+        for address in args.addresses:
+            start = time.perf_counter()
+            result = index.lookup(address)
+            elapsed_us = (time.perf_counter() - start) * 1e6
+            print(f"{address!r}: {result} ({elapsed_us:.0f} µs)")
+    return 0
+
+
+__all__ = ["ParcelIndex", "get_index"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,264 @@
+"""Projection of raw enrichment payloads and compressed storage of the originals.
+
+The RapidAPI ``/property`` response and the OCPA parcel endpoints are far larger
+than what the pipeline and FileMaker use, and they end up in every GCS record and
+Firestore document. Records keep only the attributes named by a projection (dotted
+paths such as ``address.zipcode``; ``*`` keeps everything below a level and lists
+are projected element by element). The full payload is written gzip-compressed to
+a raw store, and the record keeps a reference to it in ``*_Raw``:
+``file:<kind>/<key>.json.gz`` (relative to ``RAW_PAYLOAD_DIR``) for the local
+store, ``gs://<bucket>/<name>`` for GCS. A store refuses references of the other
+kind rather than misreading them.
+
+Records written before projection existed can be converted with::
+
+    python payloads.py compact manual.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Iterable
+
+from settings import APPRAISER_PROJECTION, MANUAL_JSON_PATH, RAW_PAYLOAD_DIR, ZILLOW_PROJECTION
+from utils import read_json, write_json
+
+DEFAULT_ZILLOW_PROJECTION = (
+    "zpid",
+    "zestimate",
+    "rentZestimate",
+    "price",
+    "bedrooms",
+    "bathrooms",
+    "livingArea",
+    "lotAreaValue",
+    "lotAreaUnits",
+    "yearBuilt",
+    "homeType",
+    "homeStatus",
+    "lastSoldPrice",
+    "dateSold",
+    "taxAssessedValue",
+    "propertyTaxRate",
+    "monthlyHoaFee",
+    "daysOnZillow",
+    "latitude",
+    "longitude",
+    "url",
+    "address.streetAddress",
+    "address.city",
+    "address.state",
+    "address.zipcode",
+)
+
+# The small OCPA endpoints are kept whole; certified taxes, non-ad-valorem
+# assessments and land areas live only in the raw payload.
+DEFAULT_APPRAISER_PROJECTION = (
+    "GeneralInfo.*",
+    "Stats.*",
+    "TotalTaxes.*",
+    "PropFeatBldg.*",
+)
+
+ZILLOW_RAW_FIELD = "Additional_Zillow_Data_Raw"
+APPRAISER_RAW_FIELD = "Additional_Appraiser_Data_Raw"
+
+
+def parse_projection(spec: str, default: Iterable[str]) -> tuple[str, ...]:
+    """Comma-separated dotted paths from *spec*, or *default* when it is empty."""
+    paths = tuple(filter(None, (part.strip() for part in spec.split(","))))
+    return paths or tuple(default)
+
+
+def _projection_tree(paths: Iterable[str]) -> dict:
+    tree: dict = {}
+    for path in paths:
+        node = tree
+        for part in path.split("."):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def _apply(value: Any, tree: dict) -> Any:
+    if not tree or "*" in tree:
+        return value
+    if isinstance(value, list):
+        return [_apply(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {key: _apply(value[key], subtree) for key, subtree in tree.items() if key in value}
+
+
+def project(payload: Any, paths: Iterable[str]) -> Any:
+    """Return the parts of *payload* named by *paths*."""
+    return _apply(payload, _projection_tree(paths))
+
+
+ZILLOW_PATHS = parse_projection(ZILLOW_PROJECTION, DEFAULT_ZILLOW_PROJECTION)
+APPRAISER_PATHS = parse_projection(APPRAISER_PROJECTION, DEFAULT_APPRAISER_PROJECTION)
+
+
+FILE_SCHEME = "file:"
+GCS_SCHEME = "gs://"
+
+
+class LocalRawStore:
+    """Raw payloads as ``<root>/<kind>/<key>.json.gz`` files."""
+
+    def __init__(self, root: Path = RAW_PAYLOAD_DIR) -> None:
+        self.root = Path(root)
+
+    def put(self, kind: str, key: str, payload: Any) -> str:
+        name = f"{kind}/{key}.json.gz"
+        path = self.root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_bytes(gzip.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8")))
+        tmp_path.replace(path)
+        return FILE_SCHEME + name
+
+    def get(self, ref: str) -> Any:
+        if ref.startswith(GCS_SCHEME):
+            raise ValueError(f"{ref} is not a local raw payload")
+        # References written before the scheme was added are bare relative paths
+        name = ref[len(FILE_SCHEME) :] if ref.startswith(FILE_SCHEME) else ref
+        return json.loads(gzip.decompress((self.root / name).read_bytes()))
+
+
+class GcsRawStore:
+    """Raw payloads as gzip-encoded objects under ``gs://<bucket>/<prefix>/``."""
+
+    def __init__(self, bucket_name: str, prefix: str = "raw") -> None:
+        from google.cloud import storage
+
+        self.client = storage.Client()
+        self.bucket = self.client.bucket(bucket_name)
+        self.prefix = prefix.strip("/")
+
+    def put(self, kind: str, key: str, payload: Any) -> str:
+        name = f"{self.prefix}/{kind}/{key}.json.gz"
+        blob = self.bucket.blob(name)
+        blob.content_encoding = "gzip"
+        blob.upload_from_string(
+            gzip.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8")),
+            content_type="application/json",
+        )
+        return f"{GCS_SCHEME}{self.bucket.name}/{name}"
+
+    def get(self, ref: str) -> Any:
+        """Read the payload at *ref*, which may be in any bucket."""
+        bucket_name, _, name = ref[len(GCS_SCHEME) :].partition("/")
+        if not ref.startswith(GCS_SCHEME) or not bucket_name or not name:
+            raise ValueError(f"{ref} is not a GCS raw payload")
+        bucket = self.bucket if bucket_name == self.bucket.name else self.client.bucket(bucket_name)
+        # Download the stored bytes rather than letting GCS decompress them
+        data = bucket.blob(name).download_as_bytes(raw_download=True)
+        return json.loads(gzip.decompress(data))
+
+
+_store: LocalRawStore | GcsRawStore | None = None
+_store_lock = threading.Lock()
+
+
+def configure_raw_store(store: LocalRawStore | GcsRawStore) -> None:
+    global _store
+    with _store_lock:
+        _store = store
+
+
+def get_raw_store() -> LocalRawStore | GcsRawStore:
+    """Return the configured raw store, a ``LocalRawStore`` unless one was set."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = LocalRawStore()
+        return _store
+
+
+def compact_payload(kind: str, key, payload: Any, paths: Iterable[str]) -> tuple[Any, str | None]:
+    """Store *payload* raw and return ``(projection, reference)``.
+
+    A failed write is reported and yields a None reference; the projection is
+    still returned so enrichment carries on.
+    """
+    try:
+        ref = get_raw_store().put(kind, str(key), payload)
+    except Exception as exc:  # storage failures must not fail the enrichment
+        print(f"Could not store raw {kind} payload {key}: {exc}")
+        ref = None
+    return project(payload, paths), ref
+
+
+def compact_record(entry: dict) -> bool:
+    """Project full payloads left on *entry* by earlier runs; returns True if changed."""
+    changed = False
+    zillow_data = entry.get("Additional_Zillow_Data")
+    if isinstance(zillow_data, dict) and ZILLOW_RAW_FIELD not in entry and zillow_data.get("zpid"):
+        entry["Additional_Zillow_Data"], entry[ZILLOW_RAW_FIELD] = compact_payload(
+            "zillow", zillow_data["zpid"], zillow_data, ZILLOW_PATHS
+        )
+        changed = True
+    appraiser_data = entry.get("Additional_Appraiser_Data")
+    parcel_link = entry.get("ParcelLink_PRISM")
+    if isinstance(appraiser_data, dict) and APPRAISER_RAW_FIELD not in entry and parcel_link:
+        parcel_id = parcel_link.rsplit("/", 1)[-1]
+        entry["Additional_Appraiser_Data"], entry[APPRAISER_RAW_FIELD] = compact_payload(
+            "appraiser", parcel_id, appraiser_data, APPRAISER_PATHS
+        )
+        changed = True
+    return changed
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Manage raw enrichment payloads.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compact = subparsers.add_parser("compact", help="Project full payloads in a JSON list of records.")
+    compact.add_argument("source", nargs="?", default=str(MANUAL_JSON_PATH))
+    show = subparsers.add_parser("show", help="Print a stored raw payload.")
+    show.add_argument("ref")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.command == "show":
+        if args.ref.startswith(GCS_SCHEME):
+            store = GcsRawStore(args.ref[len(GCS_SCHEME) :].partition("/")[0])
+        else:
+            store = get_raw_store()
+        print(json.dumps(store.get(args.ref), indent=2))
+        return 0
+
+    source = Path(args.source)
+    records = read_json(source)
+    before = len(json.dumps(records))
+    changed = sum(compact_record(entry) for entry in records)
+    write_json(source, records, indent=4)
+    after = len(json.dumps(records))
+    print(f"Compacted {changed} of {len(records)} records; {before:,} -> {after:,} bytes of JSON")
+    return 0
+
+
+__all__ = [
+    "ZILLOW_RAW_FIELD",
+    "APPRAISER_RAW_FIELD",
+    "ZILLOW_PATHS",
+    "APPRAISER_PATHS",
+    "parse_projection",
+    "project",
+    "LocalRawStore",
+    "GcsRawStore",
+    "configure_raw_store",
+    "get_raw_store",
+    "compact_payload",
+    "compact_record",
+]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
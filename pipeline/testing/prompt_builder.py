@@ -1,57 +1,177 @@
 import os
 from pathlib import Path
-from datetime import timedelta, datetime
+import hashlib
+import json
 
-from settings import OUTPUT_DIR, ensure_directories
+from utils import read_json, write_json
 
-def create_combination_text(output_base_dir):
+from ocr_compaction import compact_text, estimate_tokens, format_report, rules_fingerprint
+from settings import (
+    OUTPUT_DIR,
+    PROMPT_COMPACTION,
+    PROMPT_DROP_EXHIBITS,
+    PROMPT_TOKEN_BUDGET,
+    ensure_directories,
+)
+
+# Bump when the prompt layout changes in a way the instruction text does not show.
+TEMPLATE_VERSION = "3"
+FINGERPRINT_FILENAME = "prompt_fingerprint.json"
+DELTA_REPORT_FILENAME = "prompt_delta.json"
+# Share of the token budget the Complaint keeps however long the Value filing is
+COMPLAINT_MIN_BUDGET_SHARE = 0.5
+
+PROMPT_INSTRUCTIONS = (
+    "The text above was extracted via OCR from PDFs of either a complaint filing in Florida courts, or the complaint filing as well as a Value of Real Property filing, please fill out the following JSON object using the data. YOU MUST leave pre-filled fields as they are, and values you cannot find should be empty strings, not null. Your response should NOT contain markdown.\n\n"
+    "{\n"
+    '    "Address_PRISM": "", // The address of the foreclosed property as found in the document. This MUST be the address that is subject of the filing, NOT the mailing address of the defendant. It should not contain the city, state, or zip code.\n'
+    '    "AddressCity_PRISM": "", // The city of the property address\n'
+    '    "AddressState_PRISM": "FL", // Always "FL"\n'
+    '    "AddressZip_PRISM": "", // Always 5 digits\n'
+    '    "County_PRISM": "Orange", // Always "Orange"\n'
+    '    "Foreclosure_PRISM": "", // "YES" or "NO", if discernible from language (e.g. "foreclosure" or "lien")\n'
+    '    "Deceased_PRISM": "", // "LIVE" or "DECEASED", if discernible from language (e.g. "the late John Doe" or "the estate of John Doe") HOWEVER: Note that this must be the decased status of the PRIMARY DEFENDANT. If the document indicates someone has died, this is not necessarily "DECEASED" UNLESS it says the primary defendant died or says the primary defendant is an estate. Oftentimes a document will say a spouse died and the living spouse is named as the primary defendant ("LIVE" in that case)\n'
+    '    "FirstName_Contacts": "", // The first name of the primary defendant / debtor\n'
+    '    "LastName_Contacts": "", // The last name of the primary defendant / debtor\n'
+    '    "Type_expenses": "", // Usually "Lien"\n'
+    '    "ForeclosureType_PRISM": "", // Usually "Residential", a very small percent of the time it will be "Commercial Type 1" (standard commercial properties), "Quiet Title", "Partition Action", "Declaratory relief / easement", or "Timeshare", read the document to decide which.\n'
+    '    "Cost_expenses": "", // This is a currency, but should be stored without commas or dollar signs, decimals are acceptable - extract from the Real Value of Property doc, the "Total Estimated Value of Claim" IF PROVIDED, otherwise leave blank\n'
+    '    "PlaintiffType_PRISM": "", // "HOA", "BANK", or "PRIVATE". "HOA" if it is a Homeowners Association as the plaintiff, "Bank" if it is a bank or lender, "Private" if the plaintiff is named as a person or private company.\n'
+    "}"
+)
+
+
+def compact_case_text(complaint_text, value_text, token_budget):
+    """Compact both documents, spending the token budget on the Complaint.
+
+    The Value of Real Property filing is short and holds the claim total, so it is
+    kept whole and the remainder of the budget goes to the Complaint. An unusually
+    long Value filing is trimmed so the Complaint keeps at least
+    ``COMPLAINT_MIN_BUDGET_SHARE`` of the budget.
+    """
+    value_text = compact_text(value_text, drop_exhibits=PROMPT_DROP_EXHIBITS)
+    complaint_budget = None
+    if token_budget:
+        complaint_floor = int(token_budget * COMPLAINT_MIN_BUDGET_SHARE)
+        if estimate_tokens(value_text) > token_budget - complaint_floor:
+            value_text = compact_text(value_text, token_budget=token_budget - complaint_floor)
+        complaint_budget = max(token_budget - estimate_tokens(value_text), complaint_floor)
+    complaint_text = compact_text(
+        complaint_text, token_budget=complaint_budget, drop_exhibits=PROMPT_DROP_EXHIBITS
+    )
+    return complaint_text, value_text
+
+
+def prompt_fingerprint(input_paths, compact, token_budget):
+    """Hash the OCR inputs together with everything else that shapes the prompt."""
+    digest = hashlib.sha256()
+    settings_key = json.dumps(
+        {
+            "template_version": TEMPLATE_VERSION,
+            "compact": compact,
+            "token_budget": token_budget,
+            "drop_exhibits": PROMPT_DROP_EXHIBITS,
+            "compaction_rules": rules_fingerprint() if compact else None,
+        },
+        sort_keys=True,
+    )
+    digest.update(settings_key.encode("utf-8"))
+    digest.update(PROMPT_INSTRUCTIONS.encode("utf-8"))
+    for path in sorted(input_paths, key=lambda p: p.name):
+        digest.update(path.name.encode("utf-8"))
+        digest.update(hashlib.sha256(path.read_bytes()).digest())
+    return digest.hexdigest()
+
+
+def stored_fingerprint(case_dir):
+    """Return the fingerprint recorded for *case_dir*'s current prompt, if any."""
+    fingerprint_path = Path(case_dir) / FINGERPRINT_FILENAME
+    if not fingerprint_path.exists() or not (Path(case_dir) / "combination_text.txt").exists():
+        return None
+    try:
+        return read_json(fingerprint_path).get("fingerprint")
+    except (json.JSONDecodeError, AttributeError):
+        return None
+
+
+def create_combination_text(
+    output_base_dir,
+    *,
+    compact=PROMPT_COMPACTION,
+    token_budget=PROMPT_TOKEN_BUDGET,
+    force=False,
+):
+    """Build combination_text.txt for every case whose inputs changed.
+
+    Returns ``(delta, report)``: the delta ``{"new": [...], "changed": [...],
+    "unchanged": [...]}``, also written to ``prompt_delta.json`` so later stages
+    can process only new and changed cases, and the per-case compaction sizes.
+    *force* rebuilds every prompt.
+    """
+    report = []
+    delta = {"new": [], "changed": [], "unchanged": []}
     for root, dirs, files in os.walk(output_base_dir):
         root_path = Path(root)
         complaint_text = ""
         value_text = ""
         case_number = root_path.name
+        input_paths = []
 
         # Read the text from the appropriate files
         for file in files:
             if "Complaint" in file and file.endswith("_extracted_text.txt"):
                 with open(root_path / file, "r", encoding="utf-8") as f:
                     complaint_text = f.read().strip()
+                input_paths.append(root_path / file)
             elif "Value" in file and file.endswith("_extracted_text.txt"):
                 with open(root_path / file, "r", encoding="utf-8") as f:
                     value_text = f.read().strip()
+                input_paths.append(root_path / file)
 
         if complaint_text or value_text:
+            fingerprint = prompt_fingerprint(input_paths, compact, token_budget)
+            previous = stored_fingerprint(root_path)
+            if previous == fingerprint and not force:
+                delta["unchanged"].append(case_number)
+                continue
+            delta["new" if previous is None else "changed"].append(case_number)
+
+            original_size = len(f"{complaint_text}\n\n\n{value_text}\n\n".encode("utf-8"))
+            if compact:
+                complaint_text, value_text = compact_case_text(
+                    complaint_text, value_text, token_budget
+                )
+
             # Create the combination_text content
             combined_text = f"{complaint_text}\n\n\n{value_text}\n\n"
-            today = datetime.now()
-            yesterday = today - timedelta(days=1)
-            formatted_yesterday = yesterday.strftime("%m/%d/%Y")
-            formatted_today = today.strftime("%Y/%m/%d")
-            json_template = (
-                f"{combined_text}"
-                "The text above was extracted via OCR from PDFs of either a complaint filing in Florida courts, or the complaint filing as well as a Value of Real Property filing, please fill out the following JSON object using the data. YOU MUST leave pre-filled fields as they are, and values you cannot find should be empty strings, not null. Your response should NOT contain markdown.\n\n"
-                "{\n"
-                '    "Address_PRISM": "", // The address of the foreclosed property as found in the document. This MUST be the address that is subject of the filing, NOT the mailing address of the defendant. It should not contain the city, state, or zip code.\n'
-                '    "AddressCity_PRISM": "", // The city of the property address\n'
-                '    "AddressState_PRISM": "FL", // Always "FL"\n'
-                '    "AddressZip_PRISM": "", // Always 5 digits\n'
-                '    "County_PRISM": "Orange", // Always "Orange"\n'
-                '    "Foreclosure_PRISM": "", // "YES" or "NO", if discernible from language (e.g. "foreclosure" or "lien")\n'
-                '    "Deceased_PRISM": "", // "LIVE" or "DECEASED", if discernible from language (e.g. "the late John Doe" or "the estate of John Doe") HOWEVER: Note that this must be the decased status of the PRIMARY DEFENDANT. If the document indicates someone has died, this is not necessarily "DECEASED" UNLESS it says the primary defendant died or says the primary defendant is an estate. Oftentimes a document will say a spouse died and the living spouse is named as the primary defendant ("LIVE" in that case)\n'
-                '    "FirstName_Contacts": "", // The first name of the primary defendant / debtor\n'
-                '    "LastName_Contacts": "", // The last name of the primary defendant / debtor\n'
-                '    "Type_expenses": "", // Usually "Lien"\n'
-                '    "ForeclosureType_PRISM": "", // Usually "Residential", a very small percent of the time it will be "Commercial Type 1" (standard commercial properties), "Quiet Title", "Partition Action", "Declaratory relief / easement", or "Timeshare", read the document to decide which.\n'
-                '    "Cost_expenses": "", // This is a currency, but should be stored without commas or dollar signs, decimals are acceptable - extract from the Real Value of Property doc, the "Total Estimated Value of Claim" IF PROVIDED, otherwise leave blank\n'
-                '    "PlaintiffType_PRISM": "", // "HOA", "BANK", or "PRIVATE". "HOA" if it is a Homeowners Association as the plaintiff, "Bank" if it is a bank or lender, "Private" if the plaintiff is named as a person or private company.\n'
-                "}"
-            )
+            json_template = f"{combined_text}{PROMPT_INSTRUCTIONS}"
 
             # Write the combined text and JSON template to a new file
             output_file_path = root_path / "combination_text.txt"
             with open(output_file_path, "w", encoding="utf-8") as f:
                 f.write(json_template)
+            write_json(
+                root_path / FINGERPRINT_FILENAME,
+                {"fingerprint": fingerprint, "template_version": TEMPLATE_VERSION},
+                indent=2,
+            )
             print(f"Created combination_text.txt in {root_path}")
+            report.append(
+                {
+                    "case": case_number,
+                    "before": original_size,
+                    "after": len(combined_text.encode("utf-8")),
+                }
+            )
+
+    if compact and report:
+        print(format_report(report))
+    write_json(Path(output_base_dir) / DELTA_REPORT_FILENAME, delta, indent=2)
+    print(
+        f"Prompts: {len(delta['new'])} new, {len(delta['changed'])} changed, "
+        f"{len(delta['unchanged'])} unchanged"
+    )
+    return delta, report
 
 
 if __name__ == "__main__":
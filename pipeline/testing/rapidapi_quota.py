@@ -0,0 +1,128 @@
+"""Monthly RapidAPI request quota, tracked per API host and persisted between runs.
+
+Each RapidAPI subscription has its own monthly allowance. The tracker starts from
+the configured plan limit and, whenever a response carries the
+``x-ratelimit-requests-*`` headers, adopts the limit, remaining count and reset
+time RapidAPI reports. Calls are reserved before they are made so a run stops
+scheduling work once the allowance is spent instead of failing partway through.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+from typing import Mapping
+
+from utils import read_json, write_json
+
+LIMIT_HEADER = "x-ratelimit-requests-limit"
+REMAINING_HEADER = "x-ratelimit-requests-remaining"
+RESET_HEADER = "x-ratelimit-requests-reset"
+
+
+def _current_period() -> str:
+    return time.strftime("%Y-%m")
+
+
+def _header_int(headers: Mapping[str, str], name: str) -> int | None:
+    try:
+        return int(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class QuotaTracker:
+    """Thread-safe request allowance per host.
+
+    *limits* maps host to its monthly plan limit; 0 or a missing host means the
+    limit is unknown until RapidAPI reports one in its response headers.
+    """
+
+    def __init__(self, path: Path, limits: Mapping[str, int]) -> None:
+        self.path = Path(path)
+        self.limits = dict(limits)
+        self._lock = threading.Lock()
+        try:
+            self._state: dict[str, dict] = read_json(self.path)
+        except (FileNotFoundError, ValueError):
+            self._state = {}
+
+    def _host_state(self, host: str) -> dict:
+        state = self._state.get(host)
+        reset_at = state.get("reset_at") if state else None
+        expired = reset_at is not None and reset_at <= time.time()
+        if state is None or expired or (reset_at is None and state.get("period") != _current_period()):
+            state = {"period": _current_period(), "used": 0, "limit": None, "remaining": None, "reset_at": None}
+            self._state[host] = state
+        return state
+
+    def _available(self, host: str, state: dict) -> float:
+        limit = state["limit"] or self.limits.get(host) or 0
+        available = float(limit - state["used"]) if limit else float("inf")
+        if state["remaining"] is not None:
+            available = min(available, state["remaining"])
+        return available
+
+    def reserve(self, counts: Mapping[str, int]) -> bool:
+        """Reserve *counts* calls per host, all or nothing."""
+        with self._lock:
+            states = {host: self._host_state(host) for host in counts}
+            if any(self._available(host, states[host]) < count for host, count in counts.items()):
+                return False
+            for host, count in counts.items():
+                states[host]["used"] += count
+                if states[host]["remaining"] is not None:
+                    states[host]["remaining"] -= count
+            return True
+
+    def release(self, counts: Mapping[str, int]) -> None:
+        """Return reserved calls that were not made."""
+        with self._lock:
+            for host, count in counts.items():
+                state = self._host_state(host)
+                state["used"] = max(0, state["used"] - count)
+                if state["remaining"] is not None:
+                    state["remaining"] += count
+
+    def observe(self, host: str, headers: Mapping[str, str]) -> None:
+        """Adopt the quota RapidAPI reports in a response's headers."""
+        limit = _header_int(headers, LIMIT_HEADER)
+        remaining = _header_int(headers, REMAINING_HEADER)
+        reset = _header_int(headers, RESET_HEADER)
+        if limit is None and remaining is None:
+            return
+        with self._lock:
+            state = self._host_state(host)
+            if limit is not None:
+                state["limit"] = limit
+            if remaining is not None:
+                # Other calls may still be in flight; keep the lower figure
+                state["remaining"] = remaining if state["remaining"] is None else min(remaining, state["remaining"])
+                if limit is not None:
+                    state["used"] = max(state["used"], limit - remaining)
+            if reset is not None:
+                state["reset_at"] = time.time() + reset
+
+    def remaining(self, host: str) -> float:
+        with self._lock:
+            return self._available(host, self._host_state(host))
+
+    def save(self) -> None:
+        with self._lock:
+            write_json(self.path, self._state, indent=2)
+
+    def format_report(self) -> str:
+        with self._lock:
+            hosts = sorted(set(self._state) | set(self.limits))
+            rows = [(host, self._host_state(host)) for host in hosts]
+            rows = [(host, state, self._available(host, state)) for host, state in rows]
+        lines = [f"{'host':<36} {'used':>7} {'limit':>7} {'remaining':>9}"]
+        for host, state, available in rows:
+            limit = state["limit"] or self.limits.get(host) or "-"
+            remaining = "-" if available == float("inf") else int(available)
+            lines.append(f"{host:<36} {state['used']:>7} {limit:>7} {remaining:>9}")
+        return "\n".join(lines)
+
+
+__all__ = ["QuotaTracker"]
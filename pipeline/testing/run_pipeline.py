@@ -32,7 +32,9 @@ def run_prompt_builder():
 
 
 def run_vertex():
-    import vertex_processor  # pylint: disable=unused-import
+    from vertex_processor import main as vertex_main
+
+    vertex_main([])
 
 
 def run_style_foreclosure():
@@ -40,23 +42,27 @@ def run_style_foreclosure():
 
 
 def run_appraiser():
-    import get_appraiser_data  # pylint: disable=unused-import
-
+    from appraiser import main as appraiser_main
 
-def run_all_appraiser():
-    import get_all_appraiser_data  # pylint: disable=unused-import
+    appraiser_main([])
 
 
 def run_zillow():
-    import get_zillow_data  # pylint: disable=unused-import
+    from zillow import main as zillow_main
+
+    zillow_main([])
 
 
 def run_firestore_upload():
-    import manual_firestore_uploader  # pylint: disable=unused-import
+    from manual_firestore_uploader import main as upload_main
+
+    upload_main([])
 
 
 def run_assign_record_id():
-    import init_record_id  # pylint: disable=unused-import
+    from init_record_id import main as backfill_main
+
+    backfill_main([])
 
 
 def run_mark_start():
@@ -74,9 +80,11 @@ PIPELINE_STEPS: Dict[str, Callable[[], None]] = {
     "vertex": run_vertex,
     "style": run_style_foreclosure,
     "appraiser": run_appraiser,
-    "appraiser_all": run_all_appraiser,
+    # Kept for existing invocations; both field sets are now filled in one pass.
+    "appraiser_all": run_appraiser,
     "zillow": run_zillow,
     "firestore": run_firestore_upload,
+    # Uploads assign RECORD_IDs; this only backfills documents from older runs.
     "assign_record_id": run_assign_record_id,
     "mark_start": run_mark_start,
     "mark_finish": run_mark_finish,
@@ -90,11 +98,9 @@ ORDERED_STEPS = [
     "vertex",
     "style",
     "appraiser",
-    "appraiser_all",
     "zillow",
     "mark_start",
     "firestore",
-    "assign_record_id",
     "mark_finish",
 ]
 
@@ -0,0 +1,181 @@
+"""SQLite-backed key/value cache with per-namespace expiry.
+
+Used by the enrichment stages to avoid re-requesting data that changes rarely
+(parcel lookups, appraiser endpoints). Values are stored as JSON; ``None`` can be
+cached as a negative result. Hit and miss counters are kept per namespace both for
+the current process and cumulatively in the database; reads only count in memory
+and the cumulative counters are written every ``STATS_FLUSH_SECONDS``, with the
+next ``store``, and on ``close`` or interpreter exit.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable
+
+DAY = 24 * 60 * 60
+STATS_FLUSH_SECONDS = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE TABLE IF NOT EXISTS stats (
+    namespace TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class TTLCache:
+    """Persistent cache where each namespace has its own time-to-live.
+
+    *ttls* maps namespace to lifetime in seconds; namespaces not listed use
+    *default_ttl*. The cache is safe to share between threads.
+    """
+
+    def __init__(self, path: Path, ttls: dict[str, float] | None = None, default_ttl: float = 30 * DAY) -> None:
+        self.path = Path(path)
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self.hits: Counter[str] = Counter()
+        self.misses: Counter[str] = Counter()
+        # Counts not yet added to the stats table, guarded by _lock
+        self._unflushed_hits: Counter[str] = Counter()
+        self._unflushed_misses: Counter[str] = Counter()
+        self._flushed_at = time.monotonic()
+        self._closed = False
+        atexit.register(self.flush_stats)
+
+    def ttl_for(self, namespace: str) -> float:
+        return self.ttls.get(namespace, self.default_ttl)
+
+    def lookup(self, namespace: str, key: str) -> tuple[bool, Any]:
+        """Return ``(found, value)``; expired entries count as misses."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+            found = row is not None and row[1] > time.time()
+            (self.hits if found else self.misses)[namespace] += 1
+            (self._unflushed_hits if found else self._unflushed_misses)[namespace] += 1
+            if time.monotonic() - self._flushed_at >= STATS_FLUSH_SECONDS:
+                self._write_stats()
+                self._conn.commit()
+        return (True, json.loads(row[0])) if found else (False, None)
+
+    def store(self, namespace: str, key: str, value: Any, ttl: float | None = None) -> None:
+        now = time.time()
+        expires_at = now + (self.ttl_for(namespace) if ttl is None else ttl)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, stored_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), now, expires_at),
+            )
+            self._write_stats()
+            self._conn.commit()
+
+    def get_or_fetch(
+        self,
+        namespace: str,
+        key: str,
+        fetch: Callable[[], tuple[bool, Any]],
+        *,
+        negative_ttl: float | None = None,
+    ) -> Any:
+        """Return the cached value for *key*, calling *fetch* on a miss.
+
+        *fetch* returns ``(cacheable, value)``: transient failures should return
+        ``cacheable=False`` so they are retried next time. A cacheable ``None`` is
+        stored for *negative_ttl* seconds (or not at all when it is None).
+        """
+        found, value = self.lookup(namespace, key)
+        if found:
+            return value
+        cacheable, value = fetch()
+        if cacheable and (value is not None or negative_ttl is not None):
+            self.store(namespace, key, value, ttl=negative_ttl if value is None else None)
+        return value
+
+    def _write_stats(self) -> None:
+        """Add the unflushed counts to the stats table; the caller holds _lock and commits."""
+        namespaces = set(self._unflushed_hits) | set(self._unflushed_misses)
+        self._conn.executemany(
+            "INSERT INTO stats (namespace, hits, misses) VALUES (?, ?, ?) "
+            "ON CONFLICT(namespace) DO UPDATE SET hits = hits + excluded.hits, misses = misses + excluded.misses",
+            [(ns, self._unflushed_hits[ns], self._unflushed_misses[ns]) for ns in sorted(namespaces)],
+        )
+        self._unflushed_hits.clear()
+        self._unflushed_misses.clear()
+        self._flushed_at = time.monotonic()
+
+    def flush_stats(self) -> None:
+        """Write the hit and miss counts not yet in the database."""
+        with self._lock:
+            if self._closed:
+                return
+            self._write_stats()
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+        return cursor.rowcount
+
+    def cumulative_stats(self) -> dict[str, tuple[int, int]]:
+        self.flush_stats()
+        with self._lock:
+            rows = self._conn.execute("SELECT namespace, hits, misses FROM stats ORDER BY namespace").fetchall()
+        return {namespace: (hits, misses) for namespace, hits, misses in rows}
+
+    def format_stats(self, cumulative: bool = False) -> str:
+        """Render hit rates for this process, or for the lifetime of the database."""
+        if cumulative:
+            counts = self.cumulative_stats()
+        else:
+            counts = {ns: (self.hits[ns], self.misses[ns]) for ns in sorted(set(self.hits) | set(self.misses))}
+        if not counts:
+            return "Cache not used."
+        lines = [f"{'namespace':<20} {'hits':>7} {'misses':>7} {'hit_rate':>8}"]
+        for namespace, (hits, misses) in counts.items():
+            total = hits + misses
+            lines.append(f"{namespace:<20} {hits:>7} {misses:>7} {(hits / total) if total else 0:>8.1%}")
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        self.flush_stats()
+        atexit.unregister(self.flush_stats)
+        with self._lock:
+            self._conn.close()
+            self._closed = True
+
+
+def parse_ttl_overrides(spec: str) -> dict[str, float]:
+    """Parse ``"Search=30,TotalTaxes=365"`` (days) into a namespace→seconds map."""
+    ttls = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        namespace, _, days = item.partition("=")
+        ttls[namespace.strip()] = float(days) * DAY
+    return ttls
+
+
+__all__ = ["DAY", "TTLCache", "parse_ttl_overrides"]
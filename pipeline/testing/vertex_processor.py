@@ -1,5 +1,7 @@
 import os
+import sys
 import json
+import argparse
 import datetime
 import vertexai
 from vertexai.generative_models import GenerativeModel
@@ -10,6 +12,7 @@ import re
 
 from settings import (
     OUTPUT_DIR,
+    LLM_METRICS_PATH,
     MANUAL_JSON_PATH,
     SERVICE_ACCOUNT_PATH,
     VERTEX_PROJECT,
@@ -17,6 +20,9 @@ from settings import (
     VERTEX_MODEL,
     ensure_directories,
 )
+from addresses import canonical_key
+from utils import read_json, write_json
+from llm_metrics import format_summary, read_records, timed_generate
 
 # Set the path to the service account JSON file
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(SERVICE_ACCOUNT_PATH)
@@ -43,81 +49,177 @@ safety_settings = {
     generative_models.HarmCategory.HARM_CATEGORY_HARASSMENT: generative_models.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
 }
 
-# Initialize a list to hold all outputs
-all_outputs = []
+# Each case's result is checkpointed next to its prompt as soon as it is generated,
+# so an interrupted run only has to redo the cases that have no result yet.
+SUMMARY_FILENAME = "summary.json"
+# Model output that was not valid JSON is kept here for inspection
+UNPARSED_FILENAME = "summary_unparsed.txt"
+# Placeholders in each result that the appraiser and style stages fill in later
+STAGE_FILLED_FIELDS = (
+    "FileDate_foreclosure",
+    "CountyDBName_PRISM",
+    "LegalDescription_PRISM",
+    "TaxID_PRISM",
+    "Style_foreclosure",
+    "PropertyType_PRISM",
+)
 
-# Get today's date in YYYY-MM-DD format
-today_date = datetime.date.today().strftime("%Y-%m-%d")
 
-# Iterate through each folder in the output directory
-ensure_directories()
-for case_path in OUTPUT_DIR.iterdir():
-    if case_path.is_dir():
+def process_case(case_path, today_date):
+    case_folder = case_path.name
+    combination_text_path = case_path / "combination_text.txt"
+
+    # Read the content from combination_text.txt
+    with open(combination_text_path, "r") as file:
+        content = file.read()
+
+    # Generate content using the model with streaming set to False; retries and
+    # token usage are recorded in the metrics file
+    response = timed_generate(
+        model,
+        [content],
+        case_id=case_folder,
+        model_name=VERTEX_MODEL,
+        metrics_path=LLM_METRICS_PATH,
+        generation_config=generation_config,
+        safety_settings=safety_settings,
+        stream=False,
+    )
+    print(f"Response content for case {case_folder}: {response.text}")
+
+    # Clean the response text to extract JSON
+    response_text = response.text.strip()
+    cleaned_response = re.sub(
+        r"^```.*?```$", "", response_text, flags=re.DOTALL
+    ).strip()
+
+    # Assuming the response contains valid JSON data
+    try:
+        generated_data = json.loads(cleaned_response)
+    except json.JSONDecodeError:
+        # Keep a stub record as before, so the case is not sent to the model
+        # again until its prompt changes
+        print(f"Error decoding JSON for case {case_folder}: {cleaned_response}")
+        (case_path / UNPARSED_FILENAME).write_text(cleaned_response, encoding="utf-8")
+        generated_data = {}
+
+    output_dict = {
+        "FileDate_foreclosure": "",
+        "DATE.ProcessedByAI_Import": today_date,
+        "CaseNumber_Foreclosure": case_folder,
+        "CountyDBName_PRISM": "",
+        "LegalDescription_PRISM": "",
+        "TaxID_PRISM": "",
+        "Style_foreclosure": "",
+        "ProcessingCompleted": "True",
+        "PropertyType_PRISM": "",
+    }
+
+    # Merge the generated data with the output dictionary
+    output_dict.update(generated_data)
+    return output_dict
+
+
+def collect_summaries(output_dir):
+    """Return every checkpointed case result under *output_dir*."""
+    summaries = []
+    for case_path in sorted(output_dir.iterdir()):
+        summary_path = case_path / SUMMARY_FILENAME
+        if case_path.is_dir() and summary_path.exists():
+            try:
+                summaries.append(read_json(summary_path))
+            except json.JSONDecodeError as e:
+                print(f"Ignoring unreadable summary {summary_path}: {e}")
+    return summaries
+
+
+def merge_enrichment(summaries, previous):
+    """Carry the fields later stages added to the previous manual.json onto *summaries*.
+
+    Zillow and appraiser data (with ``ZillowFetchedAt``) are kept so refresh
+    scheduling survives the rebuild; a case whose property changed starts over.
+    """
+    previous_by_case = {entry.get("CaseNumber_Foreclosure"): entry for entry in previous}
+    merged = []
+    for summary in summaries:
+        old = previous_by_case.get(summary.get("CaseNumber_Foreclosure"))
+        record = dict(summary)
+        if old is not None and canonical_key(old) == canonical_key(summary):
+            for field, value in old.items():
+                if field not in record or (field in STAGE_FILLED_FIELDS and record[field] == ""):
+                    record[field] = value
+        merged.append(record)
+    return merged
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Generate case summaries with Vertex AI.")
+    parser.add_argument(
+        "--metrics-summary",
+        action="store_true",
+        help="Print a token usage and latency table for this run when finished.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    metrics_offset = len(read_records(LLM_METRICS_PATH))
+
+    # Get today's date in YYYY-MM-DD format
+    today_date = datetime.date.today().strftime("%Y-%m-%d")
+
+    # Iterate through each folder in the output directory
+    ensure_directories()
+    skipped = 0
+    for case_path in sorted(OUTPUT_DIR.iterdir()):
+        if not case_path.is_dir():
+            continue
         case_folder = case_path.name
-        combination_text_path = case_path / "combination_text.txt"
-        if combination_text_path.exists():
-            # Read the content from combination_text.txt
-            with open(combination_text_path, "r") as file:
-                content = file.read()
+        prompt_path = case_path / "combination_text.txt"
+        if not prompt_path.exists():
+            continue
+        # A summary older than its prompt belongs to a prompt that has since been rebuilt
+        summary_path = case_path / SUMMARY_FILENAME
+        if summary_path.exists() and summary_path.stat().st_mtime >= prompt_path.stat().st_mtime:
+            print(f"Result already stored for case {case_folder}; skipping.")
+            skipped += 1
+            continue
 
-            try:
-                # Generate content using the model with streaming set to False
-                response = model.generate_content(
-                    [content],
-                    generation_config=generation_config,
-                    safety_settings=safety_settings,
-                    stream=False,
-                )
-                print(f"Response content for case {case_folder}: {response.text}")
-
-                # Clean the response text to extract JSON
-                response_text = response.text.strip()
-                cleaned_response = re.sub(
-                    r"^```.*?```$", "", response_text, flags=re.DOTALL
-                ).strip()
-
-                # Assuming the response contains valid JSON data
-                try:
-                    generated_data = json.loads(cleaned_response)
-                except json.JSONDecodeError:
-                    print(
-                        f"Error decoding JSON for case {case_folder}: {cleaned_response}"
-                    )
-                    generated_data = {}
-
-                output_dict = {
-                    "FileDate_foreclosure": "",
-                    "DATE.ProcessedByAI_Import": today_date,
-                    "CaseNumber_Foreclosure": case_folder,
-                    "CountyDBName_PRISM": "",
-                    "LegalDescription_PRISM": "",
-                    "TaxID_PRISM": "",
-                    "Style_foreclosure": "",
-                    "ProcessingCompleted": "True",
-                    "PropertyType_PRISM": "",
-                }
-
-                # Merge the generated data with the output dictionary
-                output_dict.update(generated_data)
-
-                all_outputs.append(output_dict)
-
-                # Print the final dictionary for each case
-                print(f"Final output for case {case_folder}: {output_dict}")
-                time.sleep(20)  # avoid rate limit
-
-            except InternalServerError as e:
-                print(f"Error processing case {case_folder}: {e}")
-
-            #handle 429 too many requests
-            except vertexai.preview.generative_models.GenerativeModelsRateLimitError as e:
-                print(f"Rate limit error processing case {case_folder}: {e}")
-                time.sleep(110)  # wait for 60 seconds
-            except Exception as e:
-                print(f"Error processing case {case_folder}: {e}")
-
-# Write the collected outputs to the manual.json file
-with MANUAL_JSON_PATH.open("w") as manual_file:
-    json.dump(all_outputs, manual_file, indent=4)
-
-print(f"Generated content has been saved to {MANUAL_JSON_PATH}")
+        try:
+            output_dict = process_case(case_path, today_date)
+
+            # Persist the result before moving on to the next case
+            write_json(summary_path, output_dict, indent=4)
+
+            # Print the final dictionary for each case
+            print(f"Final output for case {case_folder}: {output_dict}")
+            time.sleep(20)  # avoid rate limit
+
+        except InternalServerError as e:
+            print(f"Error processing case {case_folder}: {e}")
+
+        #handle 429 too many requests
+        except vertexai.preview.generative_models.GenerativeModelsRateLimitError as e:
+            print(f"Rate limit error processing case {case_folder}: {e}")
+            time.sleep(110)  # wait for 60 seconds
+        except Exception as e:
+            print(f"Error processing case {case_folder}: {e}")
+
+    print(f"{skipped} cases already had a current summary")
+
+    # Rebuild manual.json from every stored result, keeping earlier enrichment
+    try:
+        previous = read_json(MANUAL_JSON_PATH)
+    except (FileNotFoundError, json.JSONDecodeError):
+        previous = []
+    write_json(MANUAL_JSON_PATH, merge_enrichment(collect_summaries(OUTPUT_DIR), previous), indent=4)
+
+    print(f"Generated content has been saved to {MANUAL_JSON_PATH}")
+
+    if args.metrics_summary:
+        print(format_summary(read_records(LLM_METRICS_PATH)[metrics_offset:], skipped=skipped))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,580 @@
+"""Zillow enrichment of case records through RapidAPI.
+
+A property is looked up with a Google search restricted to zillow.com (to find
+its zpid) followed by a Zillow ``/property`` call. A zpid never changes, so the
+search is skipped when the record already carries one and its results (including
+"no listing") are kept in the enrichment cache. Unique properties are enriched
+concurrently within the plan's request rate, calls are reserved against the
+monthly RapidAPI quota before they are made, and new cases are scheduled before
+refreshes of cases that already have Zillow data. Each successful fetch is
+stamped in ``ZillowFetchedAt``, and every lookup that reached an outcome in
+``ZillowAttemptedAt`` with the number of consecutive failures in
+``ZillowAttempts``. ``select_due`` picks the cases whose data is missing, older
+than ``PIPELINE_ZILLOW_MAX_AGE_DAYS``, or older than
+``PIPELINE_ZILLOW_ACTIVE_MAX_AGE_DAYS`` while in an active state, retries failed
+lookups with a doubling ``PIPELINE_ZILLOW_RETRY_DAYS`` back-off, and caps
+refreshes and retries per run. The local pipeline and the ``zillow_enrichment`` Cloud Run
+service share this code.
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import requests
+
+import http_client
+from addresses import group_by_address, normalize_address, normalize_zip, share_fields
+from payloads import ZILLOW_PATHS, ZILLOW_RAW_FIELD, compact_payload
+from rapidapi_quota import QuotaTracker
+from sharding import shard_state_name, task_count
+from settings import (
+    ENRICHMENT_CACHE_PATH,
+    GOOGLE_SEARCH_RAPIDAPI_HOST,
+    GOOGLE_SEARCH_RAPIDAPI_MONTHLY_QUOTA,
+    GOOGLE_SEARCH_RAPIDAPI_RPS,
+    MANUAL_JSON_PATH,
+    RAPIDAPI_KEY,
+    RAPIDAPI_QUOTA_PATH,
+    ZILLOW_ACTIVE_MAX_AGE_DAYS,
+    ZILLOW_ACTIVE_STATES,
+    ZILLOW_CACHE_ENABLED,
+    ZILLOW_MAX_AGE_DAYS,
+    ZILLOW_MAX_WORKERS,
+    ZILLOW_RAPIDAPI_HOST,
+    ZILLOW_RAPIDAPI_MONTHLY_QUOTA,
+    ZILLOW_RAPIDAPI_RPS,
+    ZILLOW_REFRESH_BUDGET,
+    ZILLOW_RETRY_DAYS,
+    ZILLOW_SEARCH_MISS_TTL_DAYS,
+    ZILLOW_SEARCH_TTL_DAYS,
+)
+from ttl_cache import DAY, TTLCache
+from utils import read_json, write_json
+
+GOOGLE_SEARCH_URL = f"https://{GOOGLE_SEARCH_RAPIDAPI_HOST}/"
+ZILLOW_PROPERTY_URL = f"https://{ZILLOW_RAPIDAPI_HOST}/property"
+ZPID_PATTERN = re.compile(r"/(\d+)_zpid")
+
+# Cache namespace of address -> [zillow_url, zpid] search results
+SEARCH_NAMESPACE = "ZillowSearch"
+
+# Fields written by the Zillow enrichment; copied verbatim to cases sharing a property.
+ZILLOW_FIELDS = (
+    "Zillow_PRISM",
+    "ARV_PRISM",
+    "Beds_PRISM",
+    "Baths_PRISM",
+    "SqFootage_PRISM",
+    "Rent_PRISM",
+    "ZillowLink_PRISM",
+    "Additional_Zillow_Data",
+    ZILLOW_RAW_FIELD,
+    "ZillowStatus",
+    "ZillowFetchedAt",
+    "ZillowAttemptedAt",
+    "ZillowAttempts",
+)
+FETCHED_AT_FIELD = "ZillowFetchedAt"
+ATTEMPTED_AT_FIELD = "ZillowAttemptedAt"
+ATTEMPTS_FIELD = "ZillowAttempts"
+
+# RapidAPI calls a lookup costs, per host, with and without a known zpid
+LOOKUP_CALLS = {GOOGLE_SEARCH_RAPIDAPI_HOST: 1, ZILLOW_RAPIDAPI_HOST: 1}
+PROPERTY_CALLS = {ZILLOW_RAPIDAPI_HOST: 1}
+
+# Status of cases left for a later run because the monthly quota is spent
+PENDING_QUOTA = "PENDING_QUOTA"
+PENDING_STATUSES = (http_client.PENDING_UPSTREAM, PENDING_QUOTA)
+
+# The plan's request rate is shared by all parallel tasks of a Cloud Run Job
+http_client.configure_host(
+    GOOGLE_SEARCH_RAPIDAPI_HOST,
+    max_concurrency=ZILLOW_MAX_WORKERS,
+    rate_per_second=GOOGLE_SEARCH_RAPIDAPI_RPS / task_count(),
+)
+http_client.configure_host(
+    ZILLOW_RAPIDAPI_HOST, max_concurrency=ZILLOW_MAX_WORKERS, rate_per_second=ZILLOW_RAPIDAPI_RPS / task_count()
+)
+# Each task tracks its own quota usage; the remaining-calls headers keep it honest
+QUOTA_PATH = Path(shard_state_name(str(RAPIDAPI_QUOTA_PATH)))
+
+_quota: QuotaTracker | None = None
+_quota_lock = threading.Lock()
+_cache: TTLCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> TTLCache | None:
+    """Return the shared search cache, or None when caching is disabled."""
+    global _cache
+    if not ZILLOW_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = TTLCache(ENRICHMENT_CACHE_PATH, {SEARCH_NAMESPACE: ZILLOW_SEARCH_TTL_DAYS * DAY})
+        return _cache
+
+
+def get_quota() -> QuotaTracker:
+    """Return the shared quota tracker, loading its state on first use."""
+    global _quota
+    with _quota_lock:
+        if _quota is None:
+            _quota = QuotaTracker(
+                QUOTA_PATH,
+                {
+                    GOOGLE_SEARCH_RAPIDAPI_HOST: GOOGLE_SEARCH_RAPIDAPI_MONTHLY_QUOTA,
+                    ZILLOW_RAPIDAPI_HOST: ZILLOW_RAPIDAPI_MONTHLY_QUOTA,
+                },
+            )
+        return _quota
+
+
+def property_address(entry: dict) -> str | None:
+    """Normalised "street, city, state zip" search string for *entry*."""
+    street = entry.get("Address_PRISM")
+    city = entry.get("AddressCity_PRISM")
+    state = entry.get("AddressState_PRISM")
+    zip_code = entry.get("AddressZip_PRISM")
+    if not all([street, city, state, zip_code]):
+        return None
+    # An OCR-garbled zip is left out rather than sent to the search
+    zip_code = normalize_zip(zip_code) or ""
+    return f"{normalize_address(street)}, {city.strip().title()}, {state.strip().upper()} {zip_code}".strip()
+
+
+def _rapidapi_get(url: str, host: str, params: dict) -> requests.Response | None:
+    """GET a RapidAPI endpoint; transport errors return None, open circuits raise."""
+    headers = {"x-rapidapi-key": RAPIDAPI_KEY, "x-rapidapi-host": host}
+    try:
+        response = http_client.get(url, headers=headers, params=params)
+    except http_client.CircuitOpenError:
+        raise
+    except requests.RequestException as e:
+        print(f"Request to {host} failed: {e}")
+        return None
+    get_quota().observe(host, response.headers)
+    return response
+
+
+def get_google_data(property_address: str) -> tuple[str, str | None] | None:
+    """Return ``(zillow_url, zpid)`` of the first zillow.com search result with a zpid."""
+    return _search_listing(property_address)[1]
+
+
+def _search_listing(property_address: str) -> tuple[bool, tuple[str, str | None] | None]:
+    """Run the Google search; returns ``(cacheable, result)`` like a cache fetch."""
+    print(f"Performing Google search for property address: {property_address}")
+    if not RAPIDAPI_KEY:
+        print("PIPELINE_RAPIDAPI_KEY is not set; cannot query RapidAPI for Google results.")
+        return False, None
+
+    querystring = {
+        "query": property_address.replace(" ", "+") + " site:zillow.com",
+        "limit": "10",
+        "related_keywords": "true",
+    }
+    response = _rapidapi_get(GOOGLE_SEARCH_URL, GOOGLE_SEARCH_RAPIDAPI_HOST, querystring)
+    if response is None:
+        return False, None
+    if response.status_code != 200:
+        print(f"Google search request failed with status code: {response.status_code}")
+        return False, None
+
+    try:
+        results = response.json()["results"]
+    except (KeyError, ValueError) as e:
+        print(f"Error retrieving Zillow URL or ZPID: {e}")
+        return False, None
+    # Search and city pages carry no zpid and cannot be looked up; they count as a miss
+    zillow_urls = [result.get("url") for result in results if "zillow.com" in (result.get("url") or "")]
+    zillow_url = next((url for url in zillow_urls if zpid_from_url(url)), None)
+    if zillow_url is None:
+        print(f"No Zillow listing found for {property_address} ({len(zillow_urls)} zillow.com results without a zpid)")
+        return True, None
+    zpid = zpid_from_url(zillow_url)
+    print(f"Found Zillow URL: {zillow_url}, ZPID: {zpid}")
+    return True, (zillow_url, zpid)
+
+
+def zpid_from_url(url: str | None) -> str | None:
+    match = ZPID_PATTERN.search(url or "")
+    return match.group(1) if match else None
+
+
+def record_listing(entry: dict) -> tuple[str | None, str] | None:
+    """Return ``(zillow_url, zpid)`` already on *entry*, or None if it has no zpid."""
+    zillow_data = entry.get("Additional_Zillow_Data")
+    zpid = entry.get("zpid") or (zillow_data.get("zpid") if isinstance(zillow_data, dict) else None)
+    zillow_url = entry.get("ZillowLink_PRISM")
+    zpid = zpid or zpid_from_url(zillow_url)
+    return (zillow_url, str(zpid)) if zpid else None
+
+
+def find_listing(property_address: str) -> tuple[bool, tuple[str | None, str | None] | None]:
+    """Look *property_address* up in the search cache; returns ``(found, listing)``."""
+    cache = get_cache()
+    if cache is None:
+        return False, None
+    found, listing = cache.lookup(SEARCH_NAMESPACE, property_address)
+    if found and listing and not listing[1]:
+        # Entries cached before zpid-less results counted as misses are searched again
+        return False, None
+    return found, tuple(listing) if listing else None
+
+
+def store_listing(property_address: str, listing: tuple[str, str | None] | None) -> None:
+    cache = get_cache()
+    if cache is None:
+        return
+    ttl = ZILLOW_SEARCH_MISS_TTL_DAYS * DAY if listing is None else None
+    cache.store(SEARCH_NAMESPACE, property_address, listing, ttl=ttl)
+
+
+def get_zillow_data(zpid) -> dict | None:
+    """Return the full Zillow property record for *zpid*."""
+    if not zpid:
+        print("ZPID is missing, cannot fetch Zillow data.")
+        return None
+    print(f"Fetching Zillow data for ZPID: {zpid}")
+    if not RAPIDAPI_KEY:
+        print("PIPELINE_RAPIDAPI_KEY is not set; cannot query RapidAPI for Zillow data.")
+        return None
+
+    response = _rapidapi_get(ZILLOW_PROPERTY_URL, ZILLOW_RAPIDAPI_HOST, {"zpid": zpid})
+    if response is None:
+        return None
+    if response.status_code != 200:
+        print(
+            f"Failed to retrieve property details from Zillow API for ZPID: {zpid}. "
+            f"Status code: {response.status_code}"
+        )
+        return None
+    try:
+        return response.json()
+    except ValueError as e:
+        print(f"Invalid Zillow response for ZPID {zpid}: {e}")
+        return None
+
+
+def apply_zillow_data(entry: dict, zillow_url: str, zillow_data: dict, zpid=None) -> None:
+    """Fill the Zillow fields; the record keeps a projection of the response."""
+    zpid = zillow_data.get("zpid") or zpid
+    projected, raw_ref = compact_payload("zillow", zpid, zillow_data, ZILLOW_PATHS)
+    entry.update(
+        {
+            "Zillow_PRISM": zillow_data.get("zestimate"),
+            "ARV_PRISM": zillow_data.get("zestimate"),
+            "Beds_PRISM": zillow_data.get("bedrooms"),
+            "Baths_PRISM": zillow_data.get("bathrooms"),
+            "SqFootage_PRISM": zillow_data.get("livingArea"),
+            "Rent_PRISM": zillow_data.get("rentZestimate"),
+            "ZillowLink_PRISM": zillow_url,
+            "Additional_Zillow_Data": projected,
+            ZILLOW_RAW_FIELD: raw_ref,
+            FETCHED_AT_FIELD: datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+    )
+
+
+def _set_status(entry: dict, status: str) -> str:
+    # A case deferred during a refresh keeps the status of the data it already has
+    if status not in PENDING_STATUSES or "Additional_Zillow_Data" not in entry:
+        entry["ZillowStatus"] = status
+    return status
+
+
+def _lookup(entry: dict) -> str:
+    address = property_address(entry)
+    listing = record_listing(entry)
+    if listing is None:
+        if not address:
+            return _set_status(entry, "SKIPPED_MISSING_ADDRESS")
+        found, listing = find_listing(address)
+        if found and listing is None:
+            return _set_status(entry, "NO_GOOGLE_RESULT")
+    calls = PROPERTY_CALLS if listing else LOOKUP_CALLS
+
+    quota = get_quota()
+    if not quota.reserve(calls):
+        return _set_status(entry, PENDING_QUOTA)
+
+    # Calls reserved but not made (a failed search, an open circuit) are handed back
+    unused = dict(calls)
+    try:
+        if listing is None:
+            cacheable, listing = _search_listing(address)
+            unused[GOOGLE_SEARCH_RAPIDAPI_HOST] = 0
+            if cacheable:
+                store_listing(address, listing)
+            if listing is None:
+                return _set_status(entry, "NO_GOOGLE_RESULT")
+        zillow_url, zpid = listing
+
+        zillow_data = get_zillow_data(zpid)
+        if zpid:
+            unused[ZILLOW_RAPIDAPI_HOST] = 0
+        if zillow_data is None:
+            return _set_status(entry, "NO_ZILLOW_RESULT")
+    finally:
+        quota.release(unused)
+
+    apply_zillow_data(entry, zillow_url or entry.get("ZillowLink_PRISM"), zillow_data, zpid)
+    return _set_status(entry, "SUCCESS")
+
+
+def _record_attempt(entry: dict, status: str) -> str:
+    # Deferred lookups were not attempted; any other outcome is stamped for the back-off
+    if status not in PENDING_STATUSES:
+        entry[ATTEMPTED_AT_FIELD] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        entry[ATTEMPTS_FIELD] = 0 if status == "SUCCESS" else attempts(entry) + 1
+    return status
+
+
+def enrich_entry(entry: dict) -> str:
+    """Fill the Zillow fields of *entry* in place and return its outcome status."""
+    print(f"Processing entry with CaseNumber_Foreclosure: {entry.get('CaseNumber_Foreclosure')}")
+    try:
+        return _record_attempt(entry, _lookup(entry))
+    except http_client.CircuitOpenError as e:
+        print(f"Deferring {entry.get('CaseNumber_Foreclosure')}: {e}")
+        return _set_status(entry, http_client.PENDING_UPSTREAM)
+
+
+def parse_active_states(spec: str) -> list[tuple[str, str]]:
+    """Parse ``"Status_PRISM=Active,Stage=Auction"`` into field/value pairs."""
+    states = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        field, _, value = item.partition("=")
+        states.append((field.strip(), value.strip()))
+    return states
+
+
+ACTIVE_STATES = parse_active_states(ZILLOW_ACTIVE_STATES)
+
+
+def parse_stamp(value) -> datetime | None:
+    try:
+        stamp = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    return stamp if stamp.tzinfo else stamp.replace(tzinfo=timezone.utc)
+
+
+def fetched_at(entry: dict) -> datetime | None:
+    return parse_stamp(entry.get(FETCHED_AT_FIELD))
+
+
+def attempts(entry: dict) -> int:
+    """Consecutive failed lookups of *entry*."""
+    try:
+        return int(entry.get(ATTEMPTS_FIELD) or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def retry_delay(failures: int) -> timedelta:
+    """Wait before retrying a lookup that failed *failures* times in a row."""
+    delay = timedelta(days=ZILLOW_RETRY_DAYS) * 2 ** min(max(failures - 1, 0), 16)
+    return min(delay, timedelta(days=max(ZILLOW_MAX_AGE_DAYS, ZILLOW_RETRY_DAYS)))
+
+
+def backing_off(attempted_at, failures: int, now: datetime) -> bool:
+    """Whether a lookup that last failed at *attempted_at* is too recent to retry."""
+    attempted = parse_stamp(attempted_at)
+    return failures > 0 and attempted is not None and now - attempted < retry_delay(failures)
+
+
+def is_active(entry: dict) -> bool:
+    return any(str(entry.get(field, "")) == value for field, value in ACTIVE_STATES)
+
+
+def refresh_priority(
+    entry: dict,
+    now: datetime,
+    max_age: timedelta = timedelta(days=ZILLOW_MAX_AGE_DAYS),
+    active_max_age: timedelta = timedelta(days=ZILLOW_ACTIVE_MAX_AGE_DAYS),
+) -> tuple[int, float] | None:
+    """Scheduling key of *entry*, or None while its Zillow data is fresh or its last
+    lookup failed too recently.
+
+    Cases never looked up come first, then stale active cases, then other stale
+    cases, then retries of failed lookups; within each tier the oldest goes first.
+    Data fetched before timestamps were recorded counts as the oldest.
+    """
+    if backing_off(entry.get(ATTEMPTED_AT_FIELD), attempts(entry), now):
+        return None
+    if entry.get("ZillowStatus") != "SUCCESS" and "Additional_Zillow_Data" not in entry:
+        attempted = parse_stamp(entry.get(ATTEMPTED_AT_FIELD))
+        if not attempts(entry) or attempted is None:
+            return (0, 0.0)
+        return (3, -(now - attempted).total_seconds())
+    stamp = fetched_at(entry)
+    age = (now - stamp) if stamp else timedelta.max
+    if is_active(entry) and age > active_max_age:
+        tier = 1
+    elif age > max_age:
+        tier = 2
+    else:
+        return None
+    return (tier, -age.total_seconds() if stamp else float("-inf"))
+
+
+def select_due(
+    entries: list[dict],
+    *,
+    max_age_days: float = ZILLOW_MAX_AGE_DAYS,
+    budget: int = ZILLOW_REFRESH_BUDGET,
+    now: datetime | None = None,
+) -> list[dict]:
+    """Return the entries to enrich this run, in priority order.
+
+    New cases are always included; at most *budget* stale or failed properties
+    (0 for no limit) are looked up again.
+    """
+    now = now or datetime.now(timezone.utc)
+    max_age = timedelta(days=max_age_days)
+    keyed = [(refresh_priority(entry, now, max_age), entry) for entry in entries]
+    keyed = sorted((item for item in keyed if item[0] is not None), key=lambda item: item[0])
+    new = [entry for key, entry in keyed if key[0] == 0]
+    stale = [entry for key, entry in keyed if key[0] > 0]
+
+    stale_groups = group_by_address(stale)
+    if budget and len(stale_groups) > budget:
+        print(f"Refresh budget {budget}: deferring {len(stale_groups) - budget} stale or failed properties")
+        stale_groups = stale_groups[:budget]
+    refresh = [entry for group in stale_groups for entry in group]
+    print(
+        f"{len(new)} cases never looked up, {len(refresh)} to refresh or retry, "
+        f"{len(entries) - len(new) - len(refresh)} fresh, backing off or deferred"
+    )
+    return new + refresh
+
+
+def may_be_due(
+    stamp: str | None,
+    now: datetime | None = None,
+    max_age_days: float = ZILLOW_MAX_AGE_DAYS,
+    *,
+    attempted_at: str | None = None,
+    failures: int = 0,
+) -> bool:
+    """Whether a case whose data was fetched at *stamp* could be due for a refresh.
+
+    *attempted_at* and *failures* describe its last lookup, so a failed one is
+    only due once its back-off has passed. Only the stamps are needed, so callers
+    can screen records before loading them; ``select_due`` makes the final choice.
+    """
+    now = now or datetime.now(timezone.utc)
+    if failures and parse_stamp(attempted_at) is not None:
+        return not backing_off(attempted_at, failures, now)
+    fetched = parse_stamp(stamp)
+    if fetched is None:
+        return True
+    max_age = min(timedelta(days=max_age_days), timedelta(days=ZILLOW_ACTIVE_MAX_AGE_DAYS))
+    return now - fetched > max_age
+
+
+def priority(group: list[dict], now: datetime | None = None) -> tuple[int, float]:
+    """Scheduling order of a property: its most urgent case's refresh priority."""
+    now = now or datetime.now(timezone.utc)
+    return min((refresh_priority(entry, now) or (4, 0.0)) for entry in group)
+
+
+def enrich_entries(entries: list[dict], max_workers: int = ZILLOW_MAX_WORKERS) -> list[dict]:
+    """Enrich *entries* in place, looking each distinct property up only once."""
+    outcomes: dict[int, str] = {}
+
+    def enrich_group(group: list[dict]) -> str:
+        outcome = enrich_entry(group[0])
+        share_fields(group[0], group[1:], ZILLOW_FIELDS)
+        outcomes[id(group)] = outcome
+        return outcome
+
+    now = datetime.now(timezone.utc)
+    work = sorted(group_by_address(entries), key=lambda group: priority(group, now))
+    print(f"Enriching {len(work)} unique properties for {len(entries)} cases")
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="zillow") as pool:
+
+        def run_round(groups: list[list[dict]]) -> list[list[dict]]:
+            results = pool.map(enrich_group, groups)
+            return [group for group, outcome in zip(groups, results) if outcome == http_client.PENDING_UPSTREAM]
+
+        http_client.requeue_deferred(work, run_round)
+
+    skipped = sum(1 for outcome in outcomes.values() if outcome == PENDING_QUOTA)
+    if skipped:
+        print(f"{skipped} properties left for the next run: RapidAPI quota exhausted")
+    quota = get_quota()
+    quota.save()
+    print(quota.format_report())
+    cache = get_cache()
+    if cache is not None:
+        print(cache.format_stats())
+    print(http_client.format_metrics())
+    return entries
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Enrich manual.json with Zillow data.")
+    parser.add_argument(
+        "--max-age-days",
+        type=float,
+        default=ZILLOW_MAX_AGE_DAYS,
+        help="Refresh Zillow data older than this.",
+    )
+    parser.add_argument(
+        "--refresh-budget",
+        type=int,
+        default=ZILLOW_REFRESH_BUDGET,
+        help="Most stale properties to refresh this run (0 for no limit).",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    try:
+        data = read_json(MANUAL_JSON_PATH)
+    except Exception as exc:
+        print(f"Unable to read manual.json: {exc}")
+        raise
+
+    due = select_due(data, max_age_days=args.max_age_days, budget=args.refresh_budget)
+    enrich_entries(due)
+    write_json(MANUAL_JSON_PATH, data, indent=4)
+    print("Script completed and manual.json updated with Zillow data.")
+
+
+__all__ = [
+    "ZILLOW_FIELDS",
+    "FETCHED_AT_FIELD",
+    "ATTEMPTED_AT_FIELD",
+    "ATTEMPTS_FIELD",
+    "PENDING_QUOTA",
+    "QUOTA_PATH",
+    "get_quota",
+    "get_cache",
+    "property_address",
+    "get_google_data",
+    "get_zillow_data",
+    "record_listing",
+    "select_due",
+    "may_be_due",
+    "find_listing",
+    "apply_zillow_data",
+    "enrich_entry",
+    "enrich_entries",
+    "main",
+]
+
+
+if __name__ == "__main__":
+    main()
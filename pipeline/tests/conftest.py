@@ -0,0 +1,121 @@
+"""Shared test setup: import paths, settings environment and an in-memory GCS bucket."""
+
+from __future__ import annotations
+
+import importlib.util
+import itertools
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from google.api_core.exceptions import NotFound, PreconditionFailed
+
+PIPELINE_DIR = Path(__file__).resolve().parents[1]
+SERVICES_DIR = PIPELINE_DIR / "cloud" / "services"
+for path in (PIPELINE_DIR, PIPELINE_DIR / "testing"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+# settings requires a service account file at import time; the tests never use it
+_STATE_DIR = Path(tempfile.mkdtemp(prefix="pipeline-tests-"))
+(_STATE_DIR / "service_account.json").write_text("{}")
+os.environ.setdefault("PIPELINE_SERVICE_ACCOUNT_PATH", str(_STATE_DIR / "service_account.json"))
+os.environ.setdefault("PIPELINE_ENRICHMENT_CACHE_PATH", str(_STATE_DIR / "enrichment_cache.sqlite3"))
+os.environ.setdefault("PIPELINE_RAPIDAPI_QUOTA_PATH", str(_STATE_DIR / "rapidapi_quota.json"))
+os.environ.setdefault("PROMPT_BUCKET", "prompts")
+os.environ.setdefault("OCR_BUCKET", "records")
+os.environ.setdefault("ENRICHED_BUCKET", "records")
+os.environ.setdefault("CASE_LIST_PATH", "gs://records/raw_cases/manifest.json")
+os.environ.setdefault("METRICS_PATH", str(_STATE_DIR / "llm_metrics.jsonl"))
+
+
+class FakeBlob:
+    """The parts of ``storage.Blob`` the pipeline uses, kept in memory."""
+
+    def __init__(self, bucket: "FakeBucket", name: str) -> None:
+        self.bucket = bucket
+        self.name = name
+        self.content_encoding = None
+        self.content_type = None
+        self.metadata = None
+        self.generation = None
+        self.updated = None
+
+    def exists(self) -> bool:
+        return self.name in self.bucket.objects
+
+    def upload_from_string(self, data, content_type=None, if_generation_match=None, **kwargs) -> None:
+        if if_generation_match is not None:
+            current = self.bucket.objects.get(self.name)
+            if (current.generation if current is not None else 0) != if_generation_match:
+                raise PreconditionFailed(f"gs://{self.bucket.name}/{self.name}")
+        self.bucket.store(self, data.encode("utf-8") if isinstance(data, str) else data, content_type)
+
+    def upload_from_filename(self, filename, content_type=None, **kwargs) -> None:
+        self.upload_from_string(Path(filename).read_bytes(), content_type)
+
+    def download_as_bytes(self, **kwargs) -> bytes:
+        if self.name not in self.bucket.objects:
+            raise NotFound(f"gs://{self.bucket.name}/{self.name}")
+        return self.bucket.objects[self.name].data
+
+    def download_as_text(self) -> str:
+        return self.download_as_bytes().decode("utf-8")
+
+    def download_to_filename(self, filename) -> None:
+        Path(filename).write_bytes(self.download_as_bytes())
+
+
+# One clock for every bucket, so update times compare across buckets
+_writes = itertools.count(1)
+_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class FakeBucket:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.objects: dict[str, FakeBlob] = {}
+
+    def store(self, blob: FakeBlob, data: bytes, content_type: str | None) -> None:
+        stored = FakeBlob(self, blob.name)
+        stored.data = data
+        stored.content_type = content_type
+        stored.content_encoding = blob.content_encoding
+        stored.metadata = blob.metadata
+        stored.generation = (self.objects[blob.name].generation + 1) if blob.name in self.objects else 1
+        stored.updated = _EPOCH + timedelta(seconds=next(_writes))
+        self.objects[blob.name] = stored
+        blob.generation, blob.updated = stored.generation, stored.updated
+
+    def blob(self, name: str) -> FakeBlob:
+        return self.objects.get(name) or FakeBlob(self, name)
+
+    def get_blob(self, name: str) -> FakeBlob | None:
+        return self.objects.get(name)
+
+    def list_blobs(self, prefix: str = "") -> list[FakeBlob]:
+        return [self.objects[name] for name in sorted(self.objects) if name.startswith(prefix)]
+
+
+class FakeStorageClient:
+    def __init__(self) -> None:
+        self.buckets: dict[str, FakeBucket] = {}
+
+    def bucket(self, name: str) -> FakeBucket:
+        return self.buckets.setdefault(name, FakeBucket(name))
+
+
+@pytest.fixture
+def storage_client() -> FakeStorageClient:
+    return FakeStorageClient()
+
+
+def load_service(name: str):
+    """Import ``cloud/services/<name>/main.py`` as a module."""
+    spec = importlib.util.spec_from_file_location(f"service_{name}", SERVICES_DIR / name / "main.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import pytest
+
+from addresses import canonical_key, group_by_address, normalize_address, normalize_zip, share_fields, split_street_number
+
+
+@pytest.mark.parametrize(
+    "address, expected",
+    [
+        ("123 North Main Street, Apt 4", "123 N MAIN ST #4"),
+        ("123 N MAIN ST #4", "123 N MAIN ST #4"),
+        ("123 n. main st. unit 4", "123 N MAIN ST #4"),
+        ("4500 Lake Underhill Road", "4500 LAKE UNDERHILL RD"),
+        ("123 North St", "123 NORTH ST"),
+        ("77 Oak Avenue West", "77 OAK AVE W"),
+        ("900 Park Lane Suite 210", "900 PARK LN #210"),
+        ("2000 N Lot Rd", "2000 N LOT RD"),
+        ("2000 North Lot Road Lot 12", "2000 N LOT RD #12"),
+        ("15 Unit Street Apt B", "15 UNIT ST #B"),
+        ("77 Mobile Home Ln Lot 4", "77 MOBILE HOME LN #4"),
+        ("88 Suite Way # 3", "88 SUITE WAY #3"),
+    ],
+)
+def test_normalize_address(address, expected):
+    assert normalize_address(address) == expected
+
+
+def test_split_street_number():
+    assert split_street_number("123 N MAIN ST") == ("123", "N MAIN ST")
+    assert split_street_number("N MAIN ST") == ("", "N MAIN ST")
+
+
+@pytest.mark.parametrize(
+    "zip_code, expected",
+    [("32801", "32801"), ("32801-1234", "32801"), (32801, "32801"), ("10001", None), ("3280", None), (None, None)],
+)
+def test_normalize_zip(zip_code, expected):
+    assert normalize_zip(zip_code) == expected
+
+
+def test_canonical_key_prefers_zip_over_city():
+    entry = {"Address_PRISM": "12 Elm Street", "AddressZip_PRISM": "32801", "AddressCity_PRISM": "Orlando"}
+    assert canonical_key(entry) == "12 ELM ST|32801"
+    assert canonical_key({"Address_PRISM": "12 Elm St", "AddressCity_PRISM": " winter  park"}) == "12 ELM ST|WINTER PARK"
+    assert canonical_key({"AddressZip_PRISM": "32801"}) is None
+
+
+def test_group_by_address_and_share_fields():
+    lead = {"Address_PRISM": "12 Elm Street", "AddressZip_PRISM": "32801", "ARV_PRISM": 250000}
+    follower = {"Address_PRISM": "12 ELM ST", "AddressZip_PRISM": "32801-0001"}
+    other = {"Address_PRISM": "14 Elm St", "AddressZip_PRISM": "32801"}
+    no_address = {"CaseNumber_Foreclosure": "2024-CA-1"}
+
+    groups = group_by_address([lead, other, follower, no_address])
+    assert groups == [[lead, follower], [other], [no_address]]
+
+    share_fields(lead, [follower], ["ARV_PRISM", "Rent_PRISM"])
+    assert follower["ARV_PRISM"] == 250000
+    assert "Rent_PRISM" not in follower
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import urllib.parse
+
+import appraiser
+
+
+def test_search_sends_the_address_as_written(monkeypatch):
+    urls = []
+    monkeypatch.setattr(appraiser, "get_index", lambda: None)
+    monkeypatch.setattr(appraiser, "get_cache", lambda: None)
+    monkeypatch.setattr(appraiser, "fetch_data", lambda url, headers: urls.append(url) or [])
+
+    entry = appraiser.enrich_entry({"Address_PRISM": "2000 North Lot Road, Apt 4"}, headers={})
+
+    assert entry["AppraiserStatus"] == "NO_SEARCH_RESULT"
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(urls[0]).query)
+    assert query["address"] == ["2000 North Lot Road, Apt 4"]
+
+
+class FuzzyIndex:
+    def lookup(self, address, zip_code=None, city=None):
+        return {"parcelId": "292201000000001", "ownerName": "NEIGHBOUR", "dorCode": "0100", "match": "fuzzy"}
+
+
+def test_fuzzy_index_matches_are_confirmed_or_flagged(monkeypatch):
+    monkeypatch.setattr(appraiser, "get_index", lambda: FuzzyIndex())
+    monkeypatch.setattr(appraiser, "get_cache", lambda: None)
+
+    monkeypatch.setattr(appraiser, "fetch_data", lambda url, headers: [])
+    assert appraiser.search_address("1235 Main St", {}, "32801")["match"] == "fuzzy"
+
+    search = [{"parcelId": "292201000000002", "ownerName": "OWNER"}]
+    monkeypatch.setattr(appraiser, "fetch_data", lambda url, headers: search)
+    assert appraiser.search_address("1235 Main St", {}, "32801") == {
+        "parcelId": "292201000000002",
+        "ownerName": "OWNER",
+        "match": "search",
+    }
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import base64
+import json
+
+import pytest
+
+from events import FINALIZED_EVENT_TYPE, build_event, parse_event, parse_uri
+
+
+def test_binary_cloud_event():
+    headers, body = build_event("bucket", "summaries/2024-CA-1.json")
+    assert parse_event(body, headers) == ("bucket", "summaries/2024-CA-1.json")
+
+
+def test_structured_cloud_event():
+    body = json.dumps({"type": FINALIZED_EVENT_TYPE, "data": {"bucket": "bucket", "name": "a.txt"}}).encode()
+    assert parse_event(body, {"Content-Type": "application/cloudevents+json"}) == ("bucket", "a.txt")
+
+
+def test_other_event_types_are_ignored():
+    headers, body = build_event("bucket", "a.txt")
+    headers["ce-type"] = "google.cloud.storage.object.v1.deleted"
+    assert parse_event(body, headers) is None
+
+
+def test_pubsub_push_from_attributes_and_data():
+    attributes = {"eventType": "OBJECT_FINALIZE", "bucketId": "bucket", "objectId": "a.txt"}
+    assert parse_event(json.dumps({"message": {"attributes": attributes}}).encode(), {}) == ("bucket", "a.txt")
+
+    data = base64.b64encode(json.dumps({"bucket": "bucket", "name": "b.txt"}).encode()).decode()
+    assert parse_event(json.dumps({"message": {"data": data}}).encode(), {}) == ("bucket", "b.txt")
+
+    deleted = {**attributes, "eventType": "OBJECT_DELETE"}
+    assert parse_event(json.dumps({"message": {"attributes": deleted}}).encode(), {}) is None
+
+
+def test_event_without_object_and_parse_uri():
+    assert parse_event(b"{}", {}) is None
+    assert parse_uri("gs://bucket/prompts/a/combination_text.txt") == ("bucket", "prompts/a/combination_text.txt")
+    with pytest.raises(ValueError):
+        parse_uri("bucket/a.txt")
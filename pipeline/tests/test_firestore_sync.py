@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from google.cloud import firestore
+
+from firestore_sync import HASH_FIELD, SyncIndex, plan_sync
+
+
+def record_all(index: SyncIndex, hashes: dict) -> None:
+    for doc_id, (record_hash, field_hashes) in hashes.items():
+        index.record(doc_id, record_hash, field_hashes)
+
+
+def test_plan_sync_sets_new_documents_and_skips_unchanged(tmp_path):
+    index = SyncIndex(tmp_path / "index.json")
+    records = {"2024-CA-1": {"ARV_PRISM": 1, "Beds_PRISM": 3}}
+
+    sets, updates, hashes = plan_sync(records, index)
+    assert set(sets) == {"2024-CA-1"} and updates == {}
+    assert sets["2024-CA-1"][HASH_FIELD] == hashes["2024-CA-1"][0]
+
+    record_all(index, hashes)
+    assert plan_sync(records, index) == ({}, {}, {})
+
+
+def test_plan_sync_updates_changed_and_deletes_removed_fields(tmp_path):
+    index = SyncIndex(tmp_path / "index.json")
+    _, _, hashes = plan_sync({"2024-CA-1": {"ARV_PRISM": 1, "Beds_PRISM": 3, "Zillow.Link": "x"}}, index)
+    record_all(index, hashes)
+
+    sets, updates, hashes = plan_sync({"2024-CA-1": {"ARV_PRISM": 2, "Beds_PRISM": 3}}, index)
+
+    assert sets == {}
+    update = updates["2024-CA-1"]
+    assert update["ARV_PRISM"] == 2
+    assert "Beds_PRISM" not in update
+    assert update["`Zillow.Link`"] is firestore.DELETE_FIELD
+    assert update[HASH_FIELD] == hashes["2024-CA-1"][0]
+
+
+def test_plan_sync_rewrites_documents_known_only_by_hash(tmp_path):
+    index = SyncIndex(tmp_path / "index.json")
+    index.record("2024-CA-1", "stale-hash", None)
+
+    sets, updates, _ = plan_sync({"2024-CA-1": {"ARV_PRISM": 1}}, index)
+    assert set(sets) == {"2024-CA-1"} and updates == {}
+
+
+def test_sync_index_round_trips(tmp_path):
+    index = SyncIndex(tmp_path / "index.json")
+    index.record("2024-CA-1", "abc", {"ARV_PRISM": "def"})
+    index.save()
+    assert SyncIndex(tmp_path / "index.json").get("2024-CA-1") == {"hash": "abc", "fields": {"ARV_PRISM": "def"}}
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import json
+
+from conftest import load_service
+
+
+def stored_index(bucket, service) -> dict:
+    return json.loads(bucket.get_blob(service.SYNC_INDEX_BLOB).download_as_bytes())
+
+
+def test_merge_index_keeps_concurrent_entries(storage_client, monkeypatch):
+    monkeypatch.setenv("ZILLOW_BUCKET", "records")
+    service = load_service("firestore_uploader")
+    bucket = storage_client.bucket(service.ZILLOW_BUCKET)
+    bucket.blob(service.SYNC_INDEX_BLOB).upload_from_string(json.dumps({"a": {"hash": "1"}, "b": {"hash": "1"}}))
+
+    # Another instance rewrites the index between our read and our write
+    get_blob = bucket.get_blob
+
+    def racing_get_blob(name):
+        blob = get_blob(name)
+        monkeypatch.setattr(bucket, "get_blob", get_blob)
+        bucket.blob(name).upload_from_string(json.dumps({"a": {"hash": "1"}, "b": {"hash": "1"}, "c": {"hash": "3"}}))
+        return blob
+
+    monkeypatch.setattr(bucket, "get_blob", racing_get_blob)
+    before = {"a": {"hash": "1"}, "b": {"hash": "1"}}
+    after = {"a": {"hash": "2"}, "d": {"hash": "4"}}
+    service.merge_index(storage_client, service.index_changes(before, after))
+
+    assert stored_index(bucket, service) == {"a": {"hash": "2"}, "c": {"hash": "3"}, "d": {"hash": "4"}}
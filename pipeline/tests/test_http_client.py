@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import http_client
+from settings import HTTP_MAX_RETRY_WAIT
+
+
+class Response:
+    def __init__(self, headers: dict) -> None:
+        self.headers = headers
+
+
+def test_retry_after_is_capped():
+    retry = http_client.CappedRetry(total=3, respect_retry_after_header=True)
+    assert retry.get_retry_after(Response({"Retry-After": "3600"})) == HTTP_MAX_RETRY_WAIT
+    assert retry.get_retry_after(Response({"Retry-After": "0"})) == 0
+    assert retry.get_retry_after(Response({})) is None
+    # urllib3 rebuilds the policy after each attempt; the cap must survive that
+    assert type(retry.increment(method="GET", url="/")) is http_client.CappedRetry
+
+
+def test_configure_host_keeps_an_open_circuit():
+    host = "open-circuit.example.com"
+    http_client.configure_host(host, failure_threshold=1, reset_seconds=60)
+    http_client.breaker(host).record_failure()
+
+    http_client.configure_host(host, max_concurrency=2, failure_threshold=3, reset_seconds=120)
+
+    circuit = http_client.breaker(host)
+    assert circuit.is_open
+    assert (circuit.failure_threshold, circuit.reset_seconds) == (3, 120)
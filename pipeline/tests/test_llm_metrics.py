@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from llm_metrics import build_record, format_summary, read_records, timed_generate
+
+
+class Usage:
+    prompt_token_count = 120
+    candidates_token_count = 30
+
+
+class Response:
+    usage_metadata = Usage()
+    text = "{}"
+
+
+class Model:
+    def generate_content(self, contents, **kwargs):
+        return Response()
+
+
+def test_timed_generate_records_each_call(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    seen = []
+    timed_generate(Model(), ["prompt"], case_id="2024-CA-1", model_name="gemini", metrics_path=path, on_record=seen.append)
+
+    assert read_records(path) == seen
+    assert seen[0]["prompt_tokens"] == 120 and seen[0]["output_tokens"] == 30
+
+
+def test_format_summary_reports_skipped_cases():
+    assert format_summary([], skipped=3) == "No LLM calls recorded.\n3 cases skipped with a current summary."
+    summary = format_summary([build_record("2024-CA-1", "gemini", prompt_tokens=10, output_tokens=5, latency_s=1.0)])
+    assert "gemini" in summary and "skipped" not in summary
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from ocr_compaction import compact_text, estimate_tokens, fit_to_budget, is_noise
+
+
+def test_removes_boilerplate_stamps_and_duplicate_pages():
+    page = (
+        "IN THE CIRCUIT COURT OF THE NINTH JUDICIAL CIRCUIT\n\n"
+        "The property is located at 12 Elm Street, Orlando, Florida.\n\n"
+        "Page 1 of 3\n\n"
+        "CERTIFICATE OF SERVICE\nI hereby certify that a true and correct copy was served."
+    )
+    compacted = compact_text(page + "\f" + page)
+
+    assert compacted.count("located at 12 Elm Street") == 1
+    assert "Page 1 of 3" not in compacted
+    assert "CERTIFICATE OF SERVICE" not in compacted
+
+
+def test_drop_exhibits_discards_attachments():
+    text = "Complaint body about the mortgage.\n\nEXHIBIT \"A\"\n\nNote and allonge text."
+    assert "allonge" in compact_text(text)
+    assert "allonge" not in compact_text(text, drop_exhibits=True)
+
+
+def test_is_noise():
+    assert is_noise("~~ ., ;; ..")
+    assert not is_noise("Plaintiff, BANK OF AMERICA")
+    assert not is_noise("")
+
+
+def test_fit_to_budget_keeps_leading_and_relevant_paragraphs_in_order():
+    paragraphs = ["style", "parties", "caption", "filler " * 40, "The property is located at 12 Elm St"]
+    kept = fit_to_budget(paragraphs, token_budget=30)
+
+    assert kept == ["style", "parties", "caption", "The property is located at 12 Elm St"]
+    assert sum(estimate_tokens(paragraph) + 1 for paragraph in kept) <= 30
+
+
+def test_boilerplate_phrases_inside_a_paragraph_keep_it():
+    text = (
+        "Caption\n\n"
+        "Defendant received a letter stating this is an attempt to collect a debt, and the property "
+        "at 12 Elm Street, Orlando, Florida is encumbered by the mortgage.\n\n"
+        "This is an attempt to collect a debt. Any information obtained will be used for that purpose."
+    )
+    compacted = compact_text(text)
+
+    assert "12 Elm Street" in compacted
+    assert "Any information obtained" not in compacted
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+from parcel_index import ParcelIndex
+
+COLUMNS = {
+    "parcel_column": "PARCEL_ID",
+    "address_column": "SITUS",
+    "owner_column": "OWNER",
+    "dor_column": "DOR",
+    "zip_column": "ZIP",
+    "city_column": "CITY",
+}
+
+
+def parcel(parcel_id: str, situs: str, zip_code: str, city: str) -> dict:
+    return {"PARCEL_ID": parcel_id, "SITUS": situs, "OWNER": f"Owner {parcel_id}", "DOR": "0100", "ZIP": zip_code, "CITY": city}
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ParcelIndex(tmp_path / "parcels.sqlite3")
+    index.import_rows(
+        [
+            parcel("A", "120 Main Street", "32801", "Orlando"),
+            parcel("B", "4500 Lake Underhill Rd Unit 2", "32807", "Orlando"),
+            parcel("C", "31 Oak Ave", "32789", "Winter Park"),
+            parcel("D", "131 Oak Ave", "32801", "Orlando"),
+            parcel("E", "38 Oak Ave", "32801", "Orlando"),
+            parcel("F", "39 Oak Ave", "32801", "Orlando"),
+        ],
+        **COLUMNS,
+    )
+    yield index
+    index.close()
+
+
+def test_exact_and_prefix_matches(index):
+    assert index.lookup("120 Main St")["parcelId"] == "A"
+    assert index.lookup("120 Main St")["match"] == "exact"
+    assert index.lookup("4500 Lake Underhill Road")["parcelId"] == "B"
+    assert index.lookup("4500 Lake Underhill Road")["match"] == "prefix"
+
+
+def test_fuzzy_number_needs_the_same_zip_or_city(index):
+    assert index.lookup("121 Main St") is None
+    assert index.lookup("121 Main St", zip_code="32801")["parcelId"] == "A"
+    assert index.lookup("121 Main St", zip_code="32801")["match"] == "fuzzy"
+    assert index.lookup("121 Main St", city="orlando")["parcelId"] == "A"
+    assert index.lookup("121 Main St", zip_code="32807") is None
+
+
+def test_fuzzy_number_ignores_other_localities_and_ambiguity(index):
+    # 31 Oak Ave is also one edit from 13, but it is in Winter Park
+    assert index.lookup("13 Oak Ave", zip_code="32801")["parcelId"] == "D"
+    assert index.lookup("13 Oak Ave") is None
+    assert index.lookup("3 Oak Ave", zip_code="32801") is None  # 38 and 39 are both one edit away
+
+
+def test_old_index_gains_locality_columns(tmp_path):
+    path = tmp_path / "parcels.sqlite3"
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE parcels (address TEXT NOT NULL, street TEXT NOT NULL, street_number TEXT NOT NULL, "
+            "situs TEXT NOT NULL, parcel_id TEXT NOT NULL, owner_name TEXT, dor_code TEXT)"
+        )
+        conn.execute("INSERT INTO parcels VALUES ('120 MAIN ST', 'MAIN ST', '120', '120 Main St', 'A', NULL, NULL)")
+    index = ParcelIndex(path)
+    assert index.lookup("120 Main St")["parcelId"] == "A"
+    assert index.lookup("121 Main St", zip_code="32801") is None
+    index.close()
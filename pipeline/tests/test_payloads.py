@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import pytest
+from google.cloud import storage
+
+from payloads import GcsRawStore, LocalRawStore
+
+
+def test_local_refs_carry_a_scheme_and_old_refs_still_resolve(tmp_path):
+    store = LocalRawStore(tmp_path)
+    ref = store.put("zillow", "123", {"zpid": 123})
+
+    assert ref == "file:zillow/123.json.gz"
+    assert store.get(ref) == {"zpid": 123}
+    assert store.get("zillow/123.json.gz") == {"zpid": 123}
+    with pytest.raises(ValueError):
+        store.get("gs://records/raw/zillow/123.json.gz")
+
+
+def test_gcs_refs_resolve_by_bucket_and_local_refs_are_refused(storage_client, monkeypatch):
+    monkeypatch.setattr(storage, "Client", lambda: storage_client)
+    ref = GcsRawStore("other", "raw").put("appraiser", "292201", {"parcelId": "292201"})
+    store = GcsRawStore("records", "raw")
+
+    assert ref == "gs://other/raw/appraiser/292201.json.gz"
+    assert store.get(ref) == {"parcelId": "292201"}
+    with pytest.raises(ValueError):
+        store.get("file:appraiser/292201.json.gz")
+    with pytest.raises(ValueError):
+        store.get("appraiser/292201.json.gz")
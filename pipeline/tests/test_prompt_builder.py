@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import re
+
+import ocr_compaction
+from ocr_compaction import estimate_tokens
+from prompt_builder import COMPLAINT_MIN_BUDGET_SHARE, compact_case_text, create_combination_text, prompt_fingerprint
+
+COMPLAINT = "\n\n".join(f"Paragraph {index}: the property located at 12 Elm Street is subject to the mortgage." for index in range(60))
+SHORT_VALUE = "Total Estimated Value of Claim: $150,000.00"
+LONG_VALUE = "\n\n".join(f"Line {index}: value of real property schedule entry {index * 7}." for index in range(400))
+
+
+def test_short_value_text_is_kept_whole():
+    complaint, value = compact_case_text(COMPLAINT, SHORT_VALUE, token_budget=500)
+    assert value == SHORT_VALUE
+    assert estimate_tokens(complaint) <= 500 - estimate_tokens(SHORT_VALUE)
+
+
+def test_long_value_text_does_not_starve_the_complaint():
+    complaint, value = compact_case_text(COMPLAINT, LONG_VALUE, token_budget=400)
+
+    assert estimate_tokens(complaint) >= 400 * COMPLAINT_MIN_BUDGET_SHARE * 0.8
+    assert estimate_tokens(value) <= 400 * (1 - COMPLAINT_MIN_BUDGET_SHARE)
+    assert estimate_tokens(complaint) + estimate_tokens(value) <= 400
+
+
+def test_no_budget_keeps_everything():
+    complaint, value = compact_case_text(COMPLAINT, LONG_VALUE, token_budget=0)
+    assert complaint.count("Paragraph") == 60 and value.count("Line") == 400
+
+
+def test_fingerprint_follows_the_compaction_rules(tmp_path, monkeypatch):
+    path = tmp_path / "Complaint_extracted_text.txt"
+    path.write_text(COMPLAINT)
+    before = prompt_fingerprint([path], compact=True, token_budget=0)
+    uncompacted = prompt_fingerprint([path], compact=False, token_budget=0)
+
+    patterns = [*ocr_compaction.BOILERPLATE_PATTERNS, re.compile(r"^\s*notice of lis pendens\b")]
+    monkeypatch.setattr(ocr_compaction, "BOILERPLATE_PATTERNS", patterns)
+    assert prompt_fingerprint([path], compact=True, token_budget=0) != before
+    assert prompt_fingerprint([path], compact=False, token_budget=0) == uncompacted
+
+
+def test_delta_and_compaction_report_are_returned_separately(tmp_path):
+    case_dir = tmp_path / "2024-CA-1"
+    case_dir.mkdir()
+    (case_dir / "Complaint_extracted_text.txt").write_text(COMPLAINT)
+
+    delta, report = create_combination_text(tmp_path, compact=True, token_budget=0)
+
+    assert delta == {"new": ["2024-CA-1"], "changed": [], "unchanged": []}
+    assert [row["case"] for row in report] == ["2024-CA-1"]
+    assert create_combination_text(tmp_path, compact=True, token_budget=0)[0]["unchanged"] == ["2024-CA-1"]
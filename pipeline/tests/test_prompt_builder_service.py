@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import pytest
+
+from conftest import load_service
+
+CASE = "2024-CA-000001"
+
+
+@pytest.fixture
+def service(storage_client, monkeypatch):
+    module = load_service("prompt_builder")
+    monkeypatch.setattr(module.storage, "Client", lambda: storage_client)
+    return module
+
+
+def write(storage_client, service, name: str, data: str = "text") -> str:
+    storage_client.bucket(service.OCR_BUCKET).blob(name).upload_from_string(data)
+    return name
+
+
+def prompt(storage_client, service):
+    return storage_client.bucket(service.PROMPT_BUCKET).get_blob(f"prompts/{CASE}/combination_text.txt")
+
+
+def test_prompt_waits_for_every_ocr_text(storage_client, service):
+    write(storage_client, service, f"cases/{CASE}/Complaint.pdf")
+    write(storage_client, service, f"cases/{CASE}/Value of Real Property.pdf")
+    write(storage_client, service, f"cases/{CASE}/Summons.pdf")
+    complaint = write(storage_client, service, f"ocr/{CASE}/Complaint_extracted_text.txt", "The property is at 12 Elm St.")
+
+    assert "waits for Value of Real Property_extracted_text.txt" in service.handle_event(service.OCR_BUCKET, complaint)
+    assert prompt(storage_client, service) is None
+
+    value = write(storage_client, service, f"ocr/{CASE}/Value of Real Property_extracted_text.txt", "Total $1.")
+    assert service.handle_event(service.OCR_BUCKET, value) == f"Prompt for {CASE} rebuilt"
+    assert prompt(storage_client, service) is not None
+
+
+def test_prompt_waits_for_text_of_a_replaced_pdf(storage_client, service):
+    write(storage_client, service, f"ocr/{CASE}/Complaint_extracted_text.txt", "Old complaint.")
+    write(storage_client, service, f"cases/{CASE}/Complaint.pdf")
+
+    assert service.pending_ocr(storage_client, CASE) == ["Complaint_extracted_text.txt"]
+    write(storage_client, service, f"ocr/{CASE}/Complaint_extracted_text.txt", "New complaint.")
+    assert service.pending_ocr(storage_client, CASE) == []
+
+
+def test_other_objects_are_ignored(service):
+    assert service.handle_event(service.OCR_BUCKET, f"cases/{CASE}/Complaint.pdf") is None
+    assert service.handle_event("elsewhere", f"ocr/{CASE}/Complaint_extracted_text.txt") is None
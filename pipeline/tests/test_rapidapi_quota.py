@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import time
+
+from rapidapi_quota import LIMIT_HEADER, REMAINING_HEADER, RESET_HEADER, QuotaTracker
+
+HOST = "zillow.p.rapidapi.com"
+SEARCH = "google-search.p.rapidapi.com"
+
+
+def test_reserve_is_all_or_nothing(tmp_path):
+    quota = QuotaTracker(tmp_path / "quota.json", {HOST: 2, SEARCH: 1})
+
+    assert quota.reserve({HOST: 1, SEARCH: 1})
+    assert not quota.reserve({HOST: 1, SEARCH: 1})
+    assert quota.remaining(HOST) == 1
+
+    quota.release({SEARCH: 1})
+    assert quota.reserve({HOST: 1, SEARCH: 1})
+    assert quota.remaining(HOST) == 0
+
+
+def test_unknown_limit_is_unbounded_until_reported(tmp_path):
+    quota = QuotaTracker(tmp_path / "quota.json", {})
+    assert quota.reserve({HOST: 10})
+
+    quota.observe(HOST, {LIMIT_HEADER: "100", REMAINING_HEADER: "5", RESET_HEADER: "3600"})
+    assert quota.remaining(HOST) == 5
+    assert not quota.reserve({HOST: 6})
+
+
+def test_observe_keeps_lowest_remaining(tmp_path):
+    quota = QuotaTracker(tmp_path / "quota.json", {HOST: 100})
+    quota.observe(HOST, {REMAINING_HEADER: "10"})
+    quota.observe(HOST, {REMAINING_HEADER: "12"})
+    assert quota.remaining(HOST) == 10
+    quota.observe(HOST, {"content-type": "application/json"})
+    assert quota.remaining(HOST) == 10
+
+
+def test_state_persists_and_resets_after_reset_time(tmp_path):
+    path = tmp_path / "quota.json"
+    quota = QuotaTracker(path, {HOST: 10})
+    quota.reserve({HOST: 4})
+    quota.save()
+    assert QuotaTracker(path, {HOST: 10}).remaining(HOST) == 6
+
+    quota.observe(HOST, {LIMIT_HEADER: "10", REMAINING_HEADER: "6", RESET_HEADER: "0"})
+    time.sleep(0.01)
+    assert quota.remaining(HOST) == 10
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import pytest
+
+from sharding import current_shard, shard_of, shard_state_name, take_shard
+
+CASES = [f"2024-CA-{number:06d}" for number in range(200)]
+
+
+def test_shard_of_is_stable_and_in_range():
+    assert shard_of("2024-CA-000123", 4) == shard_of("2024-CA-000123", 4)
+    assert all(0 <= shard_of(case, 4) < 4 for case in CASES)
+    assert len({shard_of(case, 4) for case in CASES}) == 4
+
+
+def test_take_shard_partitions_cases():
+    shards = [take_shard(CASES, key=str, shard=(index, 3)) for index in range(3)]
+    assert sorted(case for shard in shards for case in shard) == CASES
+    assert take_shard(CASES, key=str, shard=(0, 1)) == CASES
+
+
+def test_shard_state_name():
+    assert shard_state_name("state/quota.json", (0, 1)) == "state/quota.json"
+    assert shard_state_name("state/quota.json", (1, 4)) == "state/quota.shard-1-of-4.json"
+
+
+def test_current_shard_reads_cloud_run_environment(monkeypatch):
+    monkeypatch.delenv("CLOUD_RUN_TASK_INDEX", raising=False)
+    monkeypatch.delenv("CLOUD_RUN_TASK_COUNT", raising=False)
+    assert current_shard() == (0, 1)
+
+    monkeypatch.setenv("CLOUD_RUN_TASK_INDEX", "2")
+    monkeypatch.setenv("CLOUD_RUN_TASK_COUNT", "3")
+    assert current_shard() == (2, 3)
+
+    monkeypatch.setenv("CLOUD_RUN_TASK_INDEX", "3")
+    with pytest.raises(ValueError):
+        current_shard()
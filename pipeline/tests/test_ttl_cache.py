@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import sqlite3
+
+import ttl_cache
+from ttl_cache import DAY, TTLCache
+
+
+def stored_stats(path) -> dict[str, tuple[int, int]]:
+    with sqlite3.connect(path) as conn:
+        return {ns: (hits, misses) for ns, hits, misses in conn.execute("SELECT namespace, hits, misses FROM stats")}
+
+
+def test_lookup_store_and_expiry(tmp_path):
+    cache = TTLCache(tmp_path / "cache.sqlite3", {"Short": -1})
+    cache.store("Search", "12 ELM ST", ["url", "1"])
+    cache.store("Short", "12 ELM ST", "gone")
+
+    assert cache.lookup("Search", "12 ELM ST") == (True, ["url", "1"])
+    assert cache.lookup("Short", "12 ELM ST") == (False, None)
+    assert cache.get_or_fetch("Search", "14 ELM ST", lambda: (True, None), negative_ttl=DAY) is None
+    assert cache.lookup("Search", "14 ELM ST") == (True, None)
+    cache.close()
+
+
+def test_lookups_count_in_memory_until_flushed(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = TTLCache(path)
+    cache.store("Search", "a", 1)
+    for _ in range(3):
+        cache.lookup("Search", "a")
+    cache.lookup("Search", "b")
+
+    assert stored_stats(path) == {}
+    assert cache.hits["Search"] == 3 and cache.misses["Search"] == 1
+    assert cache.cumulative_stats() == {"Search": (3, 1)}
+
+    cache.lookup("Search", "a")
+    cache.close()
+    cache.close()
+    assert stored_stats(path) == {"Search": (4, 1)}
+
+
+def test_stats_flush_after_interval(tmp_path, monkeypatch):
+    path = tmp_path / "cache.sqlite3"
+    cache = TTLCache(path)
+    monkeypatch.setattr(ttl_cache, "STATS_FLUSH_SECONDS", 0)
+    cache.lookup("Search", "a")
+    assert stored_stats(path) == {"Search": (0, 1)}
+    cache.close()
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+import os
+import stat
+
+import utils
+from utils import read_json, write_json
+
+
+def test_write_json_keeps_the_replaced_file_mode(tmp_path):
+    path = tmp_path / "manual.json"
+    path.write_text("[]")
+    os.chmod(path, 0o640)
+
+    write_json(path, [{"CaseNumber_Foreclosure": "2024-CA-1"}])
+
+    assert stat.S_IMODE(path.stat().st_mode) == 0o640
+    assert read_json(path) == [{"CaseNumber_Foreclosure": "2024-CA-1"}]
+
+
+def test_write_json_creates_files_with_the_umask_default(tmp_path):
+    write_json(tmp_path / "summary.json", {})
+    assert stat.S_IMODE((tmp_path / "summary.json").stat().st_mode) == 0o666 & ~utils._UMASK
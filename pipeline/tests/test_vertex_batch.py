@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from conftest import load_service
+from gcs_io import decode_json, decode_text
+from llm_metrics import read_records
+
+
+@pytest.fixture(scope="module")
+def vertex():
+    return load_service("vertex_processor")
+
+
+def add_prompt(storage_client, vertex, case_id: str, text: str) -> None:
+    bucket = storage_client.bucket(vertex.PROMPT_BUCKET)
+    bucket.blob(f"prompts/{case_id}/combination_text.txt").upload_from_string(text)
+
+
+def summary(storage_client, vertex, case_id: str):
+    blob = storage_client.bucket(vertex.SUMMARY_BUCKET).blob(f"summaries/{case_id}.json")
+    return decode_json(blob.download_as_bytes()) if blob.exists() else None
+
+
+def test_batch_round_trip_routes_results_by_key(storage_client, vertex):
+    add_prompt(storage_client, vertex, "2024-CA-000001", "first")
+    add_prompt(storage_client, vertex, "2024-CA-000002", "second")
+    executor = vertex.LocalBatchExecutor(lambda prompt: json.dumps({"Prompt": prompt}))
+
+    vertex.run_batch(storage_client, executor)
+
+    assert summary(storage_client, vertex, "2024-CA-000001") == {"Prompt": "first"}
+    assert summary(storage_client, vertex, "2024-CA-000002") == {"Prompt": "second"}
+
+
+def test_batch_skips_summarised_prompts(storage_client, vertex):
+    add_prompt(storage_client, vertex, "2024-CA-000001", "first")
+    vertex.run_batch(storage_client, vertex.LocalBatchExecutor(lambda prompt: "{}"))
+    calls = []
+    vertex.run_batch(storage_client, vertex.LocalBatchExecutor(lambda prompt: calls.append(prompt) or "{}"))
+    assert calls == []
+
+    add_prompt(storage_client, vertex, "2024-CA-000001", "rebuilt")
+    vertex.run_batch(storage_client, vertex.LocalBatchExecutor(lambda prompt: calls.append(prompt) or "{}"))
+    assert calls == ["rebuilt"]
+
+
+def test_store_batch_results_skips_lines_without_response(storage_client, vertex):
+    request = vertex.build_batch_request("2024-CA-000003", "prompt")
+    results = [
+        {**request, "status": "Error: quota exceeded"},
+        {"request": request["request"], "response": {"candidates": [{"content": {"parts": [{"text": "{}"}]}}]}},
+        *vertex.LocalBatchExecutor(lambda prompt: '{"ok": true}').execute([request]),
+    ]
+    metrics_before = len(read_records(vertex.METRICS_PATH))
+
+    assert vertex.store_batch_results(storage_client, results) == 1
+    assert summary(storage_client, vertex, "2024-CA-000003") == {"ok": True}
+    assert len(read_records(vertex.METRICS_PATH)) == metrics_before + 1
+
+
+def test_response_text_joins_parts_and_rejects_malformed_lines(vertex):
+    result = {"response": {"candidates": [{"content": {"parts": [{"text": '{"a": '}, {"text": "1}"}]}}]}}
+    assert vertex.response_text(result) == '{"a": 1}'
+    assert vertex.response_text({"status": "failed"}) is None
+    assert vertex.response_text({"response": {"candidates": []}}) is None
+    assert vertex.response_text({"response": None}) is None
+
+
+def test_batch_calls_are_logged_and_uploaded(storage_client, vertex, capsys):
+    request = vertex.build_batch_request("2024-CA-000004", "prompt")
+    vertex.store_batch_results(storage_client, vertex.LocalBatchExecutor(lambda prompt: "{}").execute([request]))
+
+    logged = [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith("{")]
+    assert [entry["llm_call"]["case_id"] for entry in logged] == ["2024-CA-000004"]
+
+    records = read_records(vertex.METRICS_PATH)[-1:]
+    name = vertex.upload_metrics(storage_client, records)
+    blob = storage_client.bucket(vertex.METRICS_BUCKET).blob(name)
+    assert name.startswith(vertex.METRICS_PREFIX)
+    assert decode_text(blob.download_as_bytes()).splitlines() == [json.dumps(records[0])]
+    assert vertex.upload_metrics(storage_client, []) is None
+
+
+def test_redelivered_prompt_event_makes_no_call(storage_client, vertex, monkeypatch):
+    calls = []
+    monkeypatch.setattr(vertex.storage, "Client", lambda: storage_client)
+    monkeypatch.setattr(vertex, "_event_model", object())
+    monkeypatch.setattr(vertex, "summarize", lambda model, case_id, prompt_text: calls.append(prompt_text) or "{}")
+    name = "prompts/2024-CA-000005/combination_text.txt"
+    add_prompt(storage_client, vertex, "2024-CA-000005", "prompt")
+
+    assert vertex.handle_event(vertex.PROMPT_BUCKET, name) == "Wrote summary for 2024-CA-000005"
+    assert vertex.handle_event(vertex.PROMPT_BUCKET, name) == "Summary for 2024-CA-000005 is current"
+    assert calls == ["prompt"]
+
+    add_prompt(storage_client, vertex, "2024-CA-000005", "rebuilt")
+    vertex.handle_event(vertex.PROMPT_BUCKET, name)
+    assert calls == ["prompt", "rebuilt"]
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import pytest
+
+vertex_processor = pytest.importorskip("vertex_processor")
+
+
+def summary(case: str, address: str = "12 Elm Street", **fields) -> dict:
+    return {
+        "CaseNumber_Foreclosure": case,
+        "Address_PRISM": address,
+        "AddressZip_PRISM": "32801",
+        "CountyDBName_PRISM": "",
+        "TaxID_PRISM": "",
+        **fields,
+    }
+
+
+def test_rebuild_keeps_enrichment_of_unchanged_properties():
+    enriched = {
+        **summary("2024-CA-1", ARV_PRISM=250000, ZillowStatus="SUCCESS", ZillowFetchedAt="2024-05-01T00:00:00+00:00"),
+        "CountyDBName_PRISM": "DOE JOHN",
+        "TaxID_PRISM": "01-23-45",
+        "AppraiserStatus": "SUCCESS",
+    }
+    rebuilt = vertex_processor.merge_enrichment(
+        [summary("2024-CA-1", "12 ELM ST", FirstName_Contacts="John"), summary("2024-CA-2")], [enriched]
+    )
+
+    assert rebuilt[0]["ZillowFetchedAt"] == "2024-05-01T00:00:00+00:00"
+    assert rebuilt[0]["ARV_PRISM"] == 250000
+    assert rebuilt[0]["CountyDBName_PRISM"] == "DOE JOHN" and rebuilt[0]["TaxID_PRISM"] == "01-23-45"
+    assert rebuilt[0]["FirstName_Contacts"] == "John" and rebuilt[0]["Address_PRISM"] == "12 ELM ST"
+    assert rebuilt[1] == summary("2024-CA-2")
+
+
+def test_rebuild_drops_enrichment_when_the_property_changed():
+    enriched = {**summary("2024-CA-1"), "ZillowStatus": "SUCCESS", "CountyDBName_PRISM": "DOE JOHN"}
+    rebuilt = vertex_processor.merge_enrichment([summary("2024-CA-1", "14 Elm Street")], [enriched])
+    assert rebuilt == [summary("2024-CA-1", "14 Elm Street")]
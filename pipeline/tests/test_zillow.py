@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import zillow
+
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+def case(number: int, address: str | None = None, fetched_days_ago: float | None = None) -> dict:
+    entry = {"CaseNumber_Foreclosure": f"2024-CA-{number:06d}"}
+    if address:
+        entry.update({"Address_PRISM": address, "AddressZip_PRISM": "32801"})
+    if fetched_days_ago is not None:
+        entry["ZillowStatus"] = "SUCCESS"
+        entry[zillow.FETCHED_AT_FIELD] = (NOW - timedelta(days=fetched_days_ago)).isoformat()
+    return entry
+
+
+def test_select_due_orders_new_then_oldest_stale_and_skips_fresh():
+    new = case(1, "1 Oak St")
+    fresh = case(2, "2 Oak St", fetched_days_ago=1)
+    stale = case(3, "3 Oak St", fetched_days_ago=40)
+    staler = case(4, "4 Oak St", fetched_days_ago=90)
+
+    due = zillow.select_due([fresh, stale, new, staler], max_age_days=30, budget=0, now=NOW)
+    assert due == [new, staler, stale]
+
+
+def test_select_due_budget_counts_properties_not_cases():
+    same_a = case(1, "5 Elm St", fetched_days_ago=90)
+    same_b = case(2, "5 Elm Street", fetched_days_ago=60)
+    other = case(3, "6 Elm St", fetched_days_ago=50)
+    new = case(4, "7 Elm St")
+
+    due = zillow.select_due([same_a, same_b, other, new], max_age_days=30, budget=1, now=NOW)
+    assert due == [new, same_a, same_b]
+
+
+def test_select_due_treats_unstamped_data_as_oldest():
+    unstamped = {**case(1, "8 Elm St"), "ZillowStatus": "SUCCESS"}
+    stale = case(2, "9 Elm St", fetched_days_ago=40)
+    assert zillow.select_due([stale, unstamped], max_age_days=30, budget=1, now=NOW) == [unstamped]
+
+
+def test_may_be_due():
+    assert zillow.may_be_due(None, NOW)
+    assert not zillow.may_be_due((NOW - timedelta(hours=1)).isoformat(), NOW, max_age_days=30)
+    assert zillow.may_be_due((NOW - timedelta(days=400)).isoformat(), NOW, max_age_days=30)
+
+
+def failed(number, address, *, attempted_days_ago, failures):
+    attempted = (NOW - timedelta(days=attempted_days_ago)).isoformat()
+    return {
+        **case(number, address),
+        "ZillowStatus": "NO_GOOGLE_RESULT",
+        zillow.ATTEMPTED_AT_FIELD: attempted,
+        zillow.ATTEMPTS_FIELD: failures,
+    }
+
+
+def test_select_due_backs_off_failed_lookups_within_the_budget(monkeypatch):
+    monkeypatch.setattr(zillow, "ZILLOW_RETRY_DAYS", 7)
+    recent = failed(1, "1 Ash St", attempted_days_ago=10, failures=2)
+    retry = failed(2, "2 Ash St", attempted_days_ago=10, failures=1)
+    stale = case(3, "3 Ash St", fetched_days_ago=40)
+
+    assert zillow.select_due([recent, retry, stale], max_age_days=30, budget=0, now=NOW) == [stale, retry]
+    assert zillow.select_due([recent, retry, stale], max_age_days=30, budget=1, now=NOW) == [stale]
+
+
+def test_failed_attempts_are_stamped_and_success_resets_them(monkeypatch):
+    entry = case(1, "1 Ash St")
+    monkeypatch.setattr(zillow, "_lookup", lambda entry: "NO_GOOGLE_RESULT")
+    zillow.enrich_entry(entry)
+    zillow.enrich_entry(entry)
+    assert entry[zillow.ATTEMPTS_FIELD] == 2
+    assert zillow.ATTEMPTED_AT_FIELD in entry
+
+    monkeypatch.setattr(zillow, "_lookup", lambda entry: zillow.PENDING_QUOTA)
+    zillow.enrich_entry(entry)
+    assert entry[zillow.ATTEMPTS_FIELD] == 2
+
+    monkeypatch.setattr(zillow, "_lookup", lambda entry: "SUCCESS")
+    zillow.enrich_entry(entry)
+    assert entry[zillow.ATTEMPTS_FIELD] == 0
+
+
+def test_may_be_due_waits_out_the_retry_delay(monkeypatch):
+    monkeypatch.setattr(zillow, "ZILLOW_RETRY_DAYS", 7)
+    attempted = (NOW - timedelta(days=10)).isoformat()
+    assert zillow.may_be_due(None, NOW, attempted_at=attempted, failures=1)
+    assert not zillow.may_be_due(None, NOW, attempted_at=attempted, failures=2)
+
+
+def test_zpid_from_url():
+    assert zillow.zpid_from_url("https://www.zillow.com/homedetails/1-Oak-St/12345_zpid/") == "12345"
+    assert zillow.zpid_from_url("https://www.zillow.com/homes/1-Oak-St_rb/") is None
+    assert zillow.zpid_from_url(None) is None
+
+
+class SearchResponse:
+    status_code = 200
+    headers: dict = {}
+
+    def __init__(self, urls: list[str]) -> None:
+        self.urls = urls
+
+    def json(self) -> dict:
+        return {"results": [{"url": url} for url in self.urls]}
+
+
+def search_returning(monkeypatch, urls: list[str]) -> None:
+    monkeypatch.setattr(zillow, "RAPIDAPI_KEY", "key")
+    monkeypatch.setattr(zillow, "_rapidapi_get", lambda url, host, params: SearchResponse(urls))
+
+
+def test_search_skips_zillow_pages_without_zpid(monkeypatch):
+    listing = "https://www.zillow.com/homedetails/1-Oak-St/12345_zpid/"
+    search_returning(monkeypatch, ["https://www.zillow.com/orlando-fl/", listing])
+    assert zillow._search_listing("1 OAK ST, Orlando, FL 32801") == (True, (listing, "12345"))
+
+    search_returning(monkeypatch, ["https://example.com/", "https://www.zillow.com/homes/1-Oak-St_rb/"])
+    assert zillow._search_listing("1 OAK ST, Orlando, FL 32801") == (True, None)
+
+
+def test_zpid_less_listings_are_not_cached_hits(monkeypatch, tmp_path):
+    cache = zillow.TTLCache(tmp_path / "cache.sqlite3")
+    monkeypatch.setattr(zillow, "get_cache", lambda: cache)
+
+    cache.store(zillow.SEARCH_NAMESPACE, "1 OAK ST", ["https://www.zillow.com/homes/1-Oak-St_rb/", None])
+    assert zillow.find_listing("1 OAK ST") == (False, None)
+
+    zillow.store_listing("2 OAK ST", None)
+    assert zillow.find_listing("2 OAK ST") == (True, None)
+    lifetime = cache._conn.execute("SELECT expires_at - stored_at FROM entries WHERE key = '2 OAK ST'").fetchone()[0]
+    assert lifetime == zillow.ZILLOW_SEARCH_MISS_TTL_DAYS * zillow.DAY
+    cache.close()
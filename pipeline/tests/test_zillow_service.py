@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import json
+
+from conftest import load_service
+from gcs_io import decode_json
+
+
+def test_event_reads_but_never_writes_the_shared_quota(storage_client, monkeypatch):
+    service = load_service("zillow_enrichment")
+    monkeypatch.setattr(service.storage, "Client", lambda: storage_client)
+    monkeypatch.setattr(service, "enrich_entries", lambda entries: [entry.update(ZillowStatus="SUCCESS") for entry in entries])
+    bucket = storage_client.bucket(service.ZILLOW_BUCKET)
+    quota = {"zillow.p.rapidapi.com": {"period": "2024-06", "used": 7, "limit": 100, "remaining": None, "reset_at": None}}
+    bucket.blob(service.QUOTA_BLOB).upload_from_string(json.dumps(quota))
+    generation = bucket.get_blob(service.QUOTA_BLOB).generation
+    storage_client.bucket(service.ENRICHED_BUCKET).blob("enriched/2024-CA-1.json").upload_from_string(
+        json.dumps({"CaseNumber_Foreclosure": "2024-CA-1"})
+    )
+
+    result = service.handle_event(service.ENRICHED_BUCKET, "enriched/2024-CA-1.json")
+
+    assert result == "Zillow enrichment of 2024-CA-1: SUCCESS"
+    assert bucket.get_blob(service.QUOTA_BLOB).generation == generation
+    assert json.loads(service.QUOTA_PATH.read_text()) == quota
+    output = bucket.get_blob(f"{service.OUTPUT_PREFIX}/2024-CA-1.json")
+    assert decode_json(output.download_as_bytes())["ZillowStatus"] == "SUCCESS"
+
+
+def test_failed_lookups_are_stamped_and_not_retried_or_rewritten_while_backing_off(storage_client, monkeypatch):
+    import zillow
+
+    service = load_service("zillow_enrichment")
+    monkeypatch.setattr(service.storage, "Client", lambda: storage_client)
+    lookups = []
+    monkeypatch.setattr(zillow, "_lookup", lambda entry: lookups.append(entry) or "NO_GOOGLE_RESULT")
+    storage_client.bucket(service.ENRICHED_BUCKET).blob("enriched/2024-CA-2.json").upload_from_string(
+        json.dumps({"CaseNumber_Foreclosure": "2024-CA-2", "Address": "2 Oak St"})
+    )
+    bucket = storage_client.bucket(service.ZILLOW_BUCKET)
+
+    service.run([])
+    output = bucket.get_blob(f"{service.OUTPUT_PREFIX}/2024-CA-2.json")
+    assert len(lookups) == 1
+    assert output.metadata[service.ATTEMPTS_METADATA] == "1"
+    assert service.ATTEMPTED_AT_METADATA in output.metadata
+    generation = output.generation
+
+    service.run([])
+    assert len(lookups) == 1
+    assert bucket.get_blob(f"{service.OUTPUT_PREFIX}/2024-CA-2.json").generation == generation
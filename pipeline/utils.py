@@ -3,9 +3,16 @@
 from __future__ import annotations
 
 import json
+import os
+import stat
+import tempfile
 from pathlib import Path
 from typing import Any, Iterable
 
+# The process umask, read once: os.umask can only be queried by setting it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
 
 def read_json(path: Path) -> Any:
     """Load JSON data from *path*.
@@ -19,11 +26,30 @@ def read_json(path: Path) -> Any:
 
 
 def write_json(path: Path, data: Any, *, indent: int = 4) -> None:
-    """Write JSON *data* to *path* with the given *indent*."""
+    """Write JSON *data* to *path* with the given *indent*.
+
+    The data is written to a temporary file in the same directory and renamed over
+    *path*, so readers never observe a partially written file. The file keeps the
+    permissions of the one it replaces; a new file gets the umask's default.
+    """
 
     path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as fh:
-        json.dump(data, fh, indent=indent)
+    try:
+        mode = stat.S_IMODE(path.stat().st_mode)
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, indent=indent)
+            fh.flush()
+            os.fsync(fh.fileno())
+        # mkstemp creates the file 0600
+        os.chmod(tmp_name, mode)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
 
 
 def append_text(path: Path, lines: Iterable[str]) -> None: